@@ -1,3 +1,5 @@
+import os
+
 import nibabel as nib
 from nibabel.nifti1 import Nifti1Header
 import nrrd
@@ -5,6 +7,8 @@ from nrrd.types import NRRDHeader
 import numpy as np
 from typing import List, Tuple
 
+from avnirpy.io.segments import SegmentMetadata
+
 SPACE_CONVERTER = {
     "L": "left",
     "R": "right",
@@ -14,6 +18,45 @@ SPACE_CONVERTER = {
     "S": "superior",
 }
 
+# NRRD "type" field and its aliases, see http://teem.sourceforge.net/nrrd/format.html
+NRRD_TYPES = {
+    **dict.fromkeys(["signed char", "int8", "int8_t"], "i1"),
+    **dict.fromkeys(["uchar", "unsigned char", "uint8", "uint8_t"], "u1"),
+    **dict.fromkeys(
+        ["short", "short int", "signed short", "signed short int", "int16", "int16_t"],
+        "i2",
+    ),
+    **dict.fromkeys(
+        ["ushort", "unsigned short", "unsigned short int", "uint16", "uint16_t"], "u2"
+    ),
+    **dict.fromkeys(["int", "signed int", "int32", "int32_t"], "i4"),
+    **dict.fromkeys(["uint", "unsigned int", "uint32", "uint32_t"], "u4"),
+    **dict.fromkeys(
+        [
+            "longlong",
+            "long long",
+            "long long int",
+            "signed long long",
+            "signed long long int",
+            "int64",
+            "int64_t",
+        ],
+        "i8",
+    ),
+    **dict.fromkeys(
+        [
+            "ulonglong",
+            "unsigned long long",
+            "unsigned long long int",
+            "uint64",
+            "uint64_t",
+        ],
+        "u8",
+    ),
+    "float": "f4",
+    "double": "f8",
+}
+
 
 def axcode_vector(axcode: List[str]) -> np.ndarray:
     """
@@ -35,24 +78,86 @@ def axcode_vector(axcode: List[str]) -> np.ndarray:
     return np.diag(xfrm)
 
 
-def load_nrrd(
-    nrrd_image: str,
-) -> Tuple[np.ndarray, Nifti1Header, NRRDHeader, np.ndarray]:
+def get_nrrd_dtype(nrrd_header: NRRDHeader) -> np.dtype:
     """
-    Load a NRRD image file.
+    Get the dtype of the data of a NRRD image from the "type" and "endian" fields of
+    its header.
+
+    Parameters:
+        nrrd_header (NRRDHeader): The NRRD header.
+
+    Returns:
+        numpy.dtype: The dtype of the data, with its byte order.
+    """
+    if nrrd_header["type"] not in NRRD_TYPES:
+        raise ValueError(f"Invalid NRRD type: {nrrd_header['type']}.")
+    dtype = np.dtype(NRRD_TYPES[nrrd_header["type"]])
+
+    # The byte order of text encodings and single byte types is not given
+    text = nrrd_header["encoding"].lower() in ["ascii", "text", "txt"]
+    if dtype.itemsize == 1 or text:
+        return dtype
+    endian = nrrd_header.get("endian")
+    if endian not in ["little", "big"]:
+        raise ValueError(f"Invalid NRRD endian: {endian}. Must be little or big.")
+    return dtype.newbyteorder("<" if endian == "little" else ">")
+
+
+def _memmap_nrrd(nrrd_image: str) -> Tuple[np.ndarray, NRRDHeader]:
+    """
+    Read a NRRD image file, memory-mapping the voxel data when it is stored raw in the
+    same file as the header. Other encodings are read with pynrrd.
 
     Parameters:
         nrrd_image (str): The path to the NRRD image file.
 
     Returns:
-        numpy.ndarray: The image data.
-        Nifti1Header: The NIfTI header.
+        numpy.ndarray: The image data, in Fortran index order.
         NRRDHeader: The NRRD header.
-        numpy.ndarray: The affine transformation matrix.
     """
-    img = nrrd.read(nrrd_image)
-    nrrd_header = img[1]
+    with open(nrrd_image, "rb") as fh:
+        nrrd_header = nrrd.read_header(fh)
+        header_size = fh.tell()
+
+    byte_skip = nrrd_header.get("byteskip", nrrd_header.get("byte skip", 0))
+    if (
+        nrrd_header["encoding"] != "raw"
+        or "data file" in nrrd_header
+        or "datafile" in nrrd_header
+        or nrrd_header.get("lineskip", nrrd_header.get("line skip", 0)) != 0
+        or byte_skip < -1
+    ):
+        return nrrd.read(nrrd_image)
+
+    dtype = get_nrrd_dtype(nrrd_header)
+    shape = tuple(nrrd_header["sizes"])
+    if byte_skip == -1:
+        offset = os.path.getsize(nrrd_image) - dtype.itemsize * int(np.prod(shape))
+    else:
+        offset = header_size + byte_skip
+
+    # Copy-on-write so that in-place edits never reach the file on disk
+    data = np.memmap(
+        nrrd_image, dtype=dtype, mode="c", offset=offset, shape=shape[::-1]
+    )
+    return data.T, nrrd_header
+
+
+def _nrrd_header_to_nifti(
+    nrrd_header: NRRDHeader, shape: Tuple[int, ...]
+) -> Tuple[Nifti1Header, np.ndarray]:
+    """
+    Build the NIfTI header and the affine transformation matrix of a NRRD image.
 
+    Parameters:
+        nrrd_header (NRRDHeader): The NRRD header. Non-spatial rows of the space
+            directions are removed in place.
+        shape (Tuple[int, ...]): The shape of the image data.
+
+    Returns:
+        Nifti1Header: The NIfTI header.
+        numpy.ndarray: The affine transformation matrix.
+    """
     translation = nrrd_header["space origin"]
     rotation = nrrd_header["space directions"]
     if rotation.shape != (3, 3):
@@ -70,13 +175,116 @@ def load_nrrd(
     affine = np.dot(transform, affine_nhdr)
 
     nii_header = Nifti1Header()
+    nii_header.set_data_shape(shape)
+    nii_header.set_zooms(
+        tuple(np.linalg.norm(rotation, axis=1)) + (1.0,) * (len(shape) - 3)
+    )
     nii_header.set_xyzt_units(xyz=2, t=0)
     nii_header["qform_code"] = 1
     nii_header["sform_code"] = 1
 
+    return nii_header, affine
+
+
+def load_nrrd(
+    nrrd_image: str,
+    keep_dtype: bool = False,
+) -> Tuple[np.ndarray, Nifti1Header, NRRDHeader, np.ndarray]:
+    """
+    Load a NRRD image file.
+
+    Parameters:
+        nrrd_image (str): The path to the NRRD image file.
+        keep_dtype (bool): Memory-map the data when it is stored uncompressed and set the
+            on-disk dtype in the NIfTI header.
+
+    Returns:
+        numpy.ndarray: The image data.
+        Nifti1Header: The NIfTI header.
+        NRRDHeader: The NRRD header.
+        numpy.ndarray: The affine transformation matrix.
+    """
+    img = _memmap_nrrd(nrrd_image) if keep_dtype else nrrd.read(nrrd_image)
+    nrrd_header = img[1]
+
+    nii_header, affine = _nrrd_header_to_nifti(nrrd_header, img[0].shape)
+    if keep_dtype:
+        nii_header.set_data_dtype(img[0].dtype)
+
     return img[0], nii_header, nrrd_header, affine
 
 
+def load_nrrd_header(
+    nrrd_image: str,
+) -> Tuple[Nifti1Header, NRRDHeader, np.ndarray]:
+    """
+    Load the header of a NRRD image file without reading the image data.
+
+    Parameters:
+        nrrd_image (str): The path to the NRRD image file.
+
+    Returns:
+        Nifti1Header: The NIfTI header.
+        NRRDHeader: The NRRD header.
+        numpy.ndarray: The affine transformation matrix.
+    """
+    nrrd_header = nrrd.read_header(nrrd_image)
+    nii_header, affine = _nrrd_header_to_nifti(nrrd_header, tuple(nrrd_header["sizes"]))
+    nii_header.set_data_dtype(get_nrrd_dtype(nrrd_header))
+
+    return nii_header, nrrd_header, affine
+
+
+def get_nrrd_space(affine: np.ndarray) -> dict:
+    """
+    Get the NRRD space fields written by write_nrrd for an affine transformation.
+
+    Parameters:
+        affine (numpy.ndarray): The affine transformation matrix.
+
+    Returns:
+        dict: The "space origin", "space directions" and "space" of the NRRD header.
+    """
+    axcode = nib.orientations.aff2axcodes(affine)
+    transform = axcode_vector(axcode)
+    affine = np.dot(transform, affine)
+
+    return {
+        "space origin": affine[:3, 3],
+        "space directions": affine[:3, :3].T,
+        "space": "-".join(SPACE_CONVERTER[code] for code in axcode),
+    }
+
+
+def is_nrrd_unchanged(nrrd_header: NRRDHeader, affine: np.ndarray, dtype) -> bool:
+    """
+    Check if writing a NRRD image with write_nrrd, in the given dtype and with its own
+    header, would store the same image as its file.
+
+    The image is unchanged when its data is in the same file as its header, already
+    has the dtype and its space fields are the ones written by write_nrrd.
+
+    Parameters:
+        nrrd_header (NRRDHeader): The NRRD header of the image.
+        affine (numpy.ndarray): The affine transformation matrix of the image.
+        dtype (numpy.dtype): The dtype of the written data.
+
+    Returns:
+        bool: True if the file can be copied instead of being written.
+    """
+    if "data file" in nrrd_header or "datafile" in nrrd_header:
+        return False
+    if get_nrrd_dtype(nrrd_header) != np.dtype(dtype):
+        return False
+
+    space = get_nrrd_space(affine)
+    return (
+        nrrd_header.get("space") == space["space"]
+        and np.allclose(nrrd_header["space origin"], space["space origin"])
+        and np.allclose(nrrd_header["space directions"], space["space directions"])
+    )
+
+
 def write_nrrd(
     nrrd_image: str, data: np.ndarray, affine: np.ndarray, header: dict = {}
 ) -> None:
@@ -89,25 +297,21 @@ def write_nrrd(
         affine (numpy.ndarray): The affine transformation matrix.
         header (dict): The NRRD header.
     """
-    axcode = nib.orientations.aff2axcodes(affine)
-    transform = axcode_vector(axcode)
-    affine = np.dot(transform, affine)
-
-    header["space origin"] = affine[:3, 3]
-    header["space directions"] = affine[:3, :3].T
-    header["space"] = (
-        f"{SPACE_CONVERTER[axcode[0]]}-{SPACE_CONVERTER[axcode[1]]}-{SPACE_CONVERTER[axcode[2]]}"
-    )
+    header.update(get_nrrd_space(affine))
 
     nrrd.write(nrrd_image, data, header)
 
 
-def load_nifti(nifti_image: str) -> Tuple[np.ndarray, Nifti1Header, np.ndarray]:
+def load_nifti(
+    nifti_image: str, keep_dtype: bool = False
+) -> Tuple[np.ndarray, Nifti1Header, np.ndarray]:
     """
     Load a NIfTI image file.
 
     Parameters:
         nifti_image (str): The path to the NIfTI image file.
+        keep_dtype (bool): Return the data in its on-disk dtype instead of float64. The
+            data is memory-mapped when the file is uncompressed and not scaled.
 
     Returns:
         numpy.ndarray: The image data.
@@ -118,9 +322,28 @@ def load_nifti(nifti_image: str) -> Tuple[np.ndarray, Nifti1Header, np.ndarray]:
     affine = img.affine
     nii_header = img.header
 
+    if keep_dtype:
+        return np.asanyarray(img.dataobj), nii_header, affine
+
     return img.get_fdata(), nii_header, affine
 
 
+def load_nifti_header(nifti_image: str) -> Tuple[Nifti1Header, np.ndarray]:
+    """
+    Load the header of a NIfTI image file without reading the image data.
+
+    Parameters:
+        nifti_image (str): The path to the NIfTI image file.
+
+    Returns:
+        Nifti1Header: The NIfTI header.
+        numpy.ndarray: The affine transformation matrix.
+    """
+    img = nib.load(nifti_image)
+
+    return img.header, img.affine
+
+
 def get_labels_from_nrrd_header(nrrd_header: NRRDHeader) -> Tuple[dict, dict]:
     """
     Extract the labels from the NRRD header.
@@ -132,28 +355,20 @@ def get_labels_from_nrrd_header(nrrd_header: NRRDHeader) -> Tuple[dict, dict]:
         dict: A dictionary mapping the label name to the label ID.
         dict: A dictionary mapping the label name to the segment ID.
     """
-    label_in_file = {}
-    segment_match = {}
-    segments = []
-    for key in nrrd_header:
-        if "Segment" in key and "_ID" in key:
-            segments.append(key.split("_")[0])
-
-    for segment in segments:
-        label_in_file[nrrd_header[f"{segment}_Name"]] = int(
-            nrrd_header[f"{segment}_LabelValue"]
-        )
-        segment_match[nrrd_header[f"{segment}_Name"]] = segment
+    segments = SegmentMetadata(nrrd_header)
+    return segments.labels, segments.segment_match
 
-    return label_in_file, segment_match
 
-
-def load_image(image: str) -> Tuple[np.ndarray, Nifti1Header, np.ndarray]:
+def load_image(
+    image: str, keep_dtype: bool = False
+) -> Tuple[np.ndarray, Nifti1Header, np.ndarray]:
     """
     Load an image file.
 
     Parameters:
         image (str): The path to the image file.
+        keep_dtype (bool): Return the data in its on-disk dtype, memory-mapped when the
+            file is uncompressed.
 
     Returns:
         numpy.ndarray: The image data.
@@ -161,9 +376,29 @@ def load_image(image: str) -> Tuple[np.ndarray, Nifti1Header, np.ndarray]:
         numpy.ndarray: The affine transformation matrix.
     """
     if image.endswith(".nii") or image.endswith(".nii.gz"):
-        return load_nifti(image)
+        return load_nifti(image, keep_dtype=keep_dtype)
     elif image.endswith(".nrrd"):
-        data, nii_header, _, affine = load_nrrd(image)
+        data, nii_header, _, affine = load_nrrd(image, keep_dtype=keep_dtype)
         return data, nii_header, affine
     else:
         raise ValueError("Invalid image format. Must be NIfTI or NRRD.")
+
+
+def load_image_header(image: str) -> Tuple[Nifti1Header, np.ndarray]:
+    """
+    Load the header of an image file without reading the image data.
+
+    Parameters:
+        image (str): The path to the image file.
+
+    Returns:
+        Nifti1Header: The NIfTI header.
+        numpy.ndarray: The affine transformation matrix.
+    """
+    if image.endswith(".nii") or image.endswith(".nii.gz"):
+        return load_nifti_header(image)
+    elif image.endswith(".nrrd"):
+        nii_header, _, affine = load_nrrd_header(image)
+        return nii_header, affine
+    else:
+        raise ValueError("Invalid image format. Must be NIfTI or NRRD.")
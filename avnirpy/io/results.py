@@ -0,0 +1,168 @@
+import csv
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+
+def is_parquet(filename: str) -> bool:
+    """
+    Check if a results file is in Parquet format.
+
+    Args:
+        filename (str): The path to the results file.
+
+    Returns:
+        bool: True if the file has a .parquet extension.
+    """
+    return os.path.splitext(filename)[1] == ".parquet"
+
+
+class ResultsWriter:
+    """
+    Append rows of results to a .csv or .parquet file as they are produced, so that
+    nothing has to be kept in memory.
+
+    Rows written to a .csv file are flushed at each write and survive a crash. A
+    .parquet file is only readable once the writer is closed: its footer is written
+    last, so the rows of a crashed run are lost.
+    """
+
+    def __init__(
+        self, filename: str, columns: Optional[List[str]] = None, append: bool = False
+    ):
+        """
+        Args:
+            filename (str): The path to the .csv or .parquet file.
+            columns (List[str], optional): The columns of the file. Defaults to the
+                keys of the first written row, or to the header of the file when
+                appending to it.
+            append (bool, optional): Append the rows to an existing .csv file instead
+                of replacing it. Defaults to False.
+
+        Raises:
+            ImportError: If a .parquet file is requested and pyarrow is not installed.
+            ValueError: If appending to a .parquet file, or to a .csv file with other
+                columns.
+        """
+        self.filename = filename
+        self.columns = columns
+        self.nb_rows = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+        self._append = append and os.path.isfile(filename)
+        if self._append:
+            if is_parquet(filename):
+                raise ValueError("Rows cannot be appended to a .parquet file.")
+            with open(filename, "r", newline="") as f:
+                header = next(csv.reader(f), None)
+            if header is None:
+                self._append = False
+            elif columns is not None and header != list(columns):
+                raise ValueError(
+                    f"The columns of {filename} differ from the written columns."
+                )
+            else:
+                self.columns = header
+        if is_parquet(filename):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError(
+                    "pyarrow is required to write .parquet files. "
+                    "Install it with: pip install pyarrow"
+                ) from e
+
+    def write(self, rows: List[dict]) -> None:
+        """
+        Append rows to the file.
+
+        Args:
+            rows (List[dict]): The rows to append. Missing columns are left empty.
+        """
+        if not rows:
+            return
+        if self.columns is None:
+            self.columns = list(rows[0].keys())
+
+        if is_parquet(self.filename):
+            self._write_parquet(rows)
+        else:
+            self._write_csv(rows)
+        self.nb_rows += len(rows)
+
+    def _write_csv(self, rows: List[dict]) -> None:
+        if self._writer is None:
+            self._file = open(self.filename, "a" if self._append else "w", newline="")
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=self.columns, extrasaction="ignore"
+            )
+            if not self._append:
+                self._writer.writeheader()
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _write_parquet(self, rows: List[dict]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = [{column: row.get(column) for column in self.columns} for row in rows]
+        if self._writer is None:
+            # Columns that are empty in the first batch are stored as floats so
+            # that later batches holding numbers share its schema
+            schema = pa.Table.from_pylist(rows).schema
+            self._schema = pa.schema(
+                [
+                    (
+                        pa.field(field.name, pa.float64())
+                        if pa.types.is_null(field.type)
+                        else field
+                    )
+                    for field in schema
+                ]
+            )
+            table = pa.Table.from_pylist(rows, schema=self._schema)
+            self._writer = pq.ParquetWriter(self.filename, self._schema)
+        else:
+            table = pa.Table.from_pylist(rows, schema=self._schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        """
+        Close the file. A .csv file with only the header is created if no row was
+        written and the columns are known.
+        """
+        if (
+            self._writer is None
+            and self.columns is not None
+            and not is_parquet(self.filename)
+        ):
+            self._write_csv([])
+        if self._writer is not None and is_parquet(self.filename):
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        self._writer = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_results(filename: str) -> pd.DataFrame:
+    """
+    Read a results file written by ResultsWriter.
+
+    Args:
+        filename (str): The path to the .csv or .parquet file.
+
+    Returns:
+        pd.DataFrame: The results.
+    """
+    if is_parquet(filename):
+        return pd.read_parquet(filename)
+    return pd.read_csv(filename)
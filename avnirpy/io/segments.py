@@ -0,0 +1,148 @@
+import re
+from typing import Dict, List, Optional
+
+SEGMENT_KEY = re.compile(r"^(Segment\d+)_(.+)$")
+
+
+class SegmentMetadata:
+    """
+    The segments of a 3DSlicer segmentation, parsed once from the SegmentN_<Field>
+    keys of its NRRD header and indexed by segment, name and label value.
+    """
+
+    def __init__(self, nrrd_header: dict):
+        """
+        Args:
+            nrrd_header (dict): The NRRD header of the segmentation.
+        """
+        self.segments: Dict[str, Dict[str, str]] = {}
+        for key, value in nrrd_header.items():
+            match = SEGMENT_KEY.match(key)
+            if match:
+                segment, field = match.groups()
+                self.segments.setdefault(segment, {})[field] = value
+
+        self._by_name = {}
+        self._by_label = {}
+        for segment in self.labeled_segments():
+            self._index(segment)
+
+    def labeled_segments(self) -> List[str]:
+        """
+        Returns:
+            List[str]: The segments with an ID, a name and a label value.
+        """
+        return [
+            segment
+            for segment, fields in self.segments.items()
+            if "ID" in fields and "Name" in fields and "LabelValue" in fields
+        ]
+
+    def _index(self, segment: str) -> None:
+        fields = self.segments[segment]
+        self._by_name[fields["Name"]] = segment
+        self._by_label.setdefault(int(fields["LabelValue"]), []).append(segment)
+
+    def _unindex(self, segment: str) -> None:
+        fields = self.segments[segment]
+        if self._by_name.get(fields["Name"]) == segment:
+            del self._by_name[fields["Name"]]
+        self._by_label[int(fields["LabelValue"])].remove(segment)
+
+    def get_segment(self, name: str) -> Optional[str]:
+        """
+        Args:
+            name (str): The name of a segment.
+
+        Returns:
+            str: The segment with this name (e.g. "Segment0"), or None.
+        """
+        return self._by_name.get(name)
+
+    def get_segments_with_label(self, label: int) -> List[str]:
+        """
+        Args:
+            label (int): A label value.
+
+        Returns:
+            List[str]: The segments with this label value.
+        """
+        return list(self._by_label.get(label, []))
+
+    @property
+    def labels(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: A dictionary mapping the segment name to the label value.
+        """
+        return {
+            name: int(self.segments[segment]["LabelValue"])
+            for name, segment in self._by_name.items()
+        }
+
+    @property
+    def segment_match(self) -> Dict[str, str]:
+        """
+        Returns:
+            Dict[str, str]: A dictionary mapping the segment name to the segment.
+        """
+        return dict(self._by_name)
+
+    @property
+    def extents(self) -> set:
+        """
+        Returns:
+            set: The distinct extents of the segments.
+        """
+        return {
+            fields["Extent"] for fields in self.segments.values() if "Extent" in fields
+        }
+
+    def rename(self, name: str, new_name: str) -> None:
+        """
+        Rename a segment.
+
+        Args:
+            name (str): The name of the segment.
+            new_name (str): The new name of the segment.
+        """
+        segment = self._by_name[name]
+        self._unindex(segment)
+        self.segments[segment]["Name"] = new_name
+        self._index(segment)
+
+    def set_label(self, name: str, label: int) -> None:
+        """
+        Change the label value of a segment.
+
+        Args:
+            name (str): The name of the segment.
+            label (int): The new label value of the segment.
+        """
+        segment = self._by_name[name]
+        self._unindex(segment)
+        self.segments[segment]["LabelValue"] = str(label)
+        self._index(segment)
+
+    def to_header(self) -> Dict[str, str]:
+        """
+        Returns:
+            Dict[str, str]: The SegmentN_<Field> keys of the NRRD header.
+        """
+        return {
+            f"{segment}_{field}": value
+            for segment, fields in self.segments.items()
+            for field, value in fields.items()
+        }
+
+    def update_header(self, nrrd_header: dict) -> dict:
+        """
+        Write the segments to a NRRD header.
+
+        Args:
+            nrrd_header (dict): The NRRD header of the segmentation.
+
+        Returns:
+            dict: A copy of the header with the SegmentN_<Field> keys of the segments.
+        """
+        return {**nrrd_header, **self.to_header()}
@@ -1,10 +1,12 @@
+import nrrd
 import numpy as np
 from unittest import mock
 import nibabel as nib
 from avnirpy.io.image import axcode_vector, load_nrrd, write_nrrd, load_nifti
 from avnirpy.io.image import get_labels_from_nrrd_header
 import pytest
-from avnirpy.io.image import load_image
+from avnirpy.io.image import load_image, load_image_header, load_nrrd_header
+from avnirpy.io.image import get_nrrd_dtype, is_nrrd_unchanged
 
 
 def test_axcode_transform():
@@ -169,7 +171,7 @@ def test_load_image_nifti(mock_load_nifti):
     assert data.shape == (10, 10, 10)
     assert isinstance(header, nib.Nifti1Header)
     assert affine.shape == (4, 4)
-    mock_load_nifti.assert_called_once_with("dummy_path.nii")
+    mock_load_nifti.assert_called_once_with("dummy_path.nii", keep_dtype=False)
 
 
 @mock.patch("avnirpy.io.image.load_nrrd")
@@ -186,7 +188,7 @@ def test_load_image_nrrd(mock_load_nrrd):
     assert data.shape == (10, 10, 10)
     assert isinstance(header, nib.Nifti1Header)
     assert affine.shape == (4, 4)
-    mock_load_nrrd.assert_called_once_with("dummy_path.nrrd")
+    mock_load_nrrd.assert_called_once_with("dummy_path.nrrd", keep_dtype=False)
 
 
 def test_load_image_invalid_format():
@@ -194,3 +196,123 @@ def test_load_image_invalid_format():
         ValueError, match="Invalid image format. Must be NIfTI or NRRD."
     ):
         load_image("dummy_path.txt")
+
+
+@pytest.mark.parametrize(
+    "dtype", [np.uint8, np.int16, ">i2", np.uint32, ">i8", np.float32, ">f8"]
+)
+@pytest.mark.parametrize("encoding", ["raw", "gzip", "ascii"])
+def test_get_nrrd_dtype(tmp_path, dtype, encoding):
+    filename = str(tmp_path / "volume.nrrd")
+    nrrd.write(filename, np.zeros((3, 4, 5), dtype=dtype), {"encoding": encoding})
+
+    data, nrrd_header = nrrd.read(filename)
+
+    assert get_nrrd_dtype(nrrd_header) == data.dtype
+    assert get_nrrd_dtype(nrrd_header).itemsize == np.dtype(dtype).itemsize
+
+
+def test_get_nrrd_dtype_invalid():
+    header = {"type": "short", "encoding": "raw", "endian": "little"}
+    assert get_nrrd_dtype(header) == np.dtype("<i2")
+    assert get_nrrd_dtype(dict(header, type="uchar", endian=None)) == np.uint8
+
+    with pytest.raises(ValueError, match="Invalid NRRD type"):
+        get_nrrd_dtype(dict(header, type="block"))
+    with pytest.raises(ValueError, match="Invalid NRRD endian"):
+        get_nrrd_dtype(dict(header, endian="middle"))
+
+
+@pytest.mark.parametrize("extension", [".nii", ".nii.gz"])
+def test_load_nifti_keep_dtype(tmp_path, extension):
+    data = np.arange(60, dtype=np.uint8).reshape((3, 4, 5))
+    filename = str(tmp_path / f"labels{extension}")
+    nib.save(nib.Nifti1Image(data, np.eye(4)), filename)
+
+    result, header, affine = load_nifti(filename, keep_dtype=True)
+
+    assert result.dtype == np.uint8
+    assert isinstance(result, np.memmap) == (extension == ".nii")
+    np.testing.assert_array_equal(result, data)
+
+
+@pytest.mark.parametrize("encoding", ["raw", "gzip"])
+def test_load_nrrd_keep_dtype(tmp_path, encoding):
+    data = np.arange(60, dtype=np.int16).reshape((3, 4, 5))
+    filename = str(tmp_path / "volume.nrrd")
+    write_nrrd(filename, data, np.eye(4), {"encoding": encoding})
+
+    result, nii_header, _, affine = load_nrrd(filename, keep_dtype=True)
+
+    assert result.dtype == np.int16
+    assert nii_header.get_data_dtype() == np.int16
+    assert isinstance(result, np.memmap) == (encoding == "raw")
+    np.testing.assert_array_equal(result, data)
+    np.testing.assert_array_equal(affine, np.eye(4))
+
+
+def test_load_nrrd_header(tmp_path):
+    data = np.zeros((3, 4, 5), dtype=np.uint8)
+    affine = np.diag([0.5, 0.5, 2.0, 1.0])
+    filename = str(tmp_path / "labels.nrrd")
+    write_nrrd(filename, data, affine, {"encoding": "gzip"})
+
+    nii_header, nrrd_header, result_affine = load_nrrd_header(filename)
+
+    assert nii_header.get_data_shape() == (3, 4, 5)
+    assert nii_header.get_zooms() == (0.5, 0.5, 2.0)
+    assert nii_header.get_data_dtype() == np.uint8
+    assert nrrd_header["encoding"] == "gzip"
+    np.testing.assert_array_equal(result_affine, affine)
+
+
+def test_load_nifti_header(tmp_path):
+    affine = np.diag([0.5, 0.5, 2.0, 1.0])
+    filename = str(tmp_path / "labels.nii.gz")
+    nib.save(nib.Nifti1Image(np.zeros((3, 4, 5), dtype=np.uint8), affine), filename)
+
+    with mock.patch.object(nib.arrayproxy.ArrayProxy, "__array__") as mock_array:
+        header, result_affine = load_image_header(filename)
+        mock_array.assert_not_called()
+
+    assert header.get_data_shape() == (3, 4, 5)
+    assert header.get_zooms() == (0.5, 0.5, 2.0)
+    np.testing.assert_array_equal(result_affine, affine)
+
+
+def test_load_image_header_invalid_format():
+    with pytest.raises(
+        ValueError, match="Invalid image format. Must be NIfTI or NRRD."
+    ):
+        load_image_header("dummy_path.txt")
+
+
+def test_is_nrrd_unchanged(tmp_path):
+    affine = np.diag([0.5, 0.5, 2.0, 1.0])
+    filename = str(tmp_path / "volume.nrrd")
+    write_nrrd(filename, np.zeros((3, 4, 5), dtype=np.int16), affine)
+
+    _, nrrd_header, result_affine = load_nrrd_header(filename)
+
+    assert is_nrrd_unchanged(nrrd_header, result_affine, np.int16)
+    assert not is_nrrd_unchanged(nrrd_header, result_affine, np.uint8)
+    assert not is_nrrd_unchanged(
+        dict(nrrd_header, **{"data file": "volume.raw"}), result_affine, np.int16
+    )
+
+
+def test_is_nrrd_unchanged_space(tmp_path):
+    filename = str(tmp_path / "volume.nrrd")
+    nrrd.write(
+        filename,
+        np.zeros((3, 4, 5), dtype=np.int16),
+        {
+            "space": "left-posterior-superior",
+            "space directions": np.diag([-1.0, 1.0, 1.0]),
+            "space origin": np.zeros(3),
+        },
+    )
+
+    _, nrrd_header, affine = load_nrrd_header(filename)
+
+    assert not is_nrrd_unchanged(nrrd_header, affine, np.int16)
@@ -0,0 +1,94 @@
+import pytest
+from avnirpy.io.results import ResultsWriter, is_parquet, read_results
+
+
+def test_is_parquet():
+    assert is_parquet("results.parquet")
+    assert not is_parquet("results.csv")
+
+
+def test_results_writer_csv(tmp_path):
+    filename = str(tmp_path / "results.csv")
+
+    with ResultsWriter(filename, ["image", "label", "dsc"]) as writer:
+        writer.write([{"image": "a.nii.gz", "label": "all", "dsc": 0.5}])
+        writer.write(
+            [
+                {"image": "b.nii.gz", "label": 1, "dsc": 0.25, "extra": 1},
+                {"image": "b.nii.gz", "label": 2},
+            ]
+        )
+
+    df = read_results(filename)
+    assert writer.nb_rows == 3
+    assert list(df.columns) == ["image", "label", "dsc"]
+    assert list(df["image"]) == ["a.nii.gz", "b.nii.gz", "b.nii.gz"]
+    assert df["dsc"].iloc[1] == 0.25
+    assert df["dsc"].isna().iloc[2]
+
+
+def test_results_writer_csv_empty(tmp_path):
+    filename = str(tmp_path / "results.csv")
+
+    ResultsWriter(filename, ["image", "label"]).close()
+
+    df = read_results(filename)
+    assert df.empty
+    assert list(df.columns) == ["image", "label"]
+
+
+def test_results_writer_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    filename = str(tmp_path / "results.parquet")
+
+    with ResultsWriter(filename) as writer:
+        writer.write([{"image": "a.nii.gz", "dsc": 0.5, "hd": None}])
+        writer.write([{"image": "b.nii.gz", "dsc": 0.75, "hd": 2.5}])
+
+    df = read_results(filename)
+    assert list(df.columns) == ["image", "dsc", "hd"]
+    assert list(df["dsc"]) == [0.5, 0.75]
+    assert df["hd"].isna().iloc[0]
+    assert df["hd"].iloc[1] == 2.5
+
+
+def test_results_writer_csv_append(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    with ResultsWriter(filename, ["image", "dsc"]) as writer:
+        writer.write([{"image": "a.nii.gz", "dsc": 0.5}])
+
+    with ResultsWriter(filename, append=True) as writer:
+        writer.write([{"image": "b.nii.gz", "dsc": 0.75}])
+
+    df = read_results(filename)
+    assert list(df["image"]) == ["a.nii.gz", "b.nii.gz"]
+    assert writer.columns == ["image", "dsc"]
+
+
+def test_results_writer_csv_append_other_columns(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    ResultsWriter(filename, ["image", "dsc"]).close()
+
+    with pytest.raises(ValueError):
+        ResultsWriter(filename, ["image", "hd"], append=True)
+
+
+def test_results_writer_csv_crash(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    writer = ResultsWriter(filename, ["image", "dsc"])
+
+    writer.write([{"image": "a.nii.gz", "dsc": 0.5}])
+
+    # The rows are readable before the writer is closed
+    assert list(read_results(filename)["image"]) == ["a.nii.gz"]
+    writer.close()
+
+
+def test_results_writer_parquet_append(tmp_path):
+    pytest.importorskip("pyarrow")
+    filename = str(tmp_path / "results.parquet")
+    with ResultsWriter(filename) as writer:
+        writer.write([{"image": "a.nii.gz"}])
+
+    with pytest.raises(ValueError):
+        ResultsWriter(filename, append=True)
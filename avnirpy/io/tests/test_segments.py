@@ -0,0 +1,63 @@
+import pytest
+from avnirpy.io.segments import SegmentMetadata
+
+
+@pytest.fixture
+def nrrd_header():
+    return {
+        "type": "unsigned char",
+        "Segment0_ID": "Segment_1",
+        "Segment0_Name": "ich_1",
+        "Segment0_LabelValue": "1",
+        "Segment0_Extent": "0 9 0 9 0 4",
+        "Segment1_ID": "Segment_2",
+        "Segment1_Name": "IVH",
+        "Segment1_LabelValue": "2",
+        "Segment1_Extent": "0 9 0 9 0 4",
+        "Segment2_ID": "Segment_3",
+        "Segment2_Name": "PHE",
+        "Segment2_LabelValue": "2",
+        "Segment2_Extent": "0 9 0 9 0 2",
+        "Segmentation_MasterRepresentation": "Binary labelmap",
+    }
+
+
+def test_segment_metadata(nrrd_header):
+    segments = SegmentMetadata(nrrd_header)
+
+    assert segments.labels == {"ich_1": 1, "IVH": 2, "PHE": 2}
+    assert segments.segment_match == {
+        "ich_1": "Segment0",
+        "IVH": "Segment1",
+        "PHE": "Segment2",
+    }
+    assert segments.get_segment("PHE") == "Segment2"
+    assert segments.get_segment("ICH") is None
+    assert segments.get_segments_with_label(2) == ["Segment1", "Segment2"]
+    assert segments.extents == {"0 9 0 9 0 4", "0 9 0 9 0 2"}
+
+
+def test_segment_metadata_rename(nrrd_header):
+    segments = SegmentMetadata(nrrd_header)
+
+    segments.rename("ich_1", "ICH")
+    segments.set_label("PHE", 3)
+
+    assert segments.labels == {"ICH": 1, "IVH": 2, "PHE": 3}
+    assert segments.get_segment("ich_1") is None
+    assert segments.get_segments_with_label(2) == ["Segment1"]
+    header = segments.update_header(nrrd_header)
+    assert list(header) == list(nrrd_header)
+    assert header["Segment0_Name"] == "ICH"
+    assert header["Segment2_LabelValue"] == "3"
+    assert nrrd_header["Segment0_Name"] == "ich_1"
+
+
+def test_segment_metadata_to_header(nrrd_header):
+    segments = SegmentMetadata(nrrd_header)
+
+    assert segments.to_header() == {
+        key: value
+        for key, value in nrrd_header.items()
+        if key.startswith("Segment") and not key.startswith("Segmentation")
+    }
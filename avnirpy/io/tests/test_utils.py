@@ -12,6 +12,8 @@ from avnirpy.io.utils import (
     add_overwrite_arg,
     check_images_space,
     check_segment_extent,
+    compute_file_fingerprint,
+    copy_file,
     add_version_arg,
 )
 
@@ -254,3 +256,49 @@ def test_version_arg(parser, capsys):
 
     captured = capsys.readouterr()
     assert __version__ == captured.out.strip()
+
+
+@pytest.mark.parametrize("method", ["mtime", "hash"])
+def test_compute_file_fingerprint(tmp_path, method):
+    filename = tmp_path / "image.nii"
+    filename.write_bytes(b"abc")
+    fingerprint = compute_file_fingerprint(str(filename), method)
+
+    assert compute_file_fingerprint(str(filename), method) == fingerprint
+
+    filename.write_bytes(b"abcd")
+    assert compute_file_fingerprint(str(filename), method) != fingerprint
+
+
+def test_compute_file_fingerprint_invalid_method(tmp_path):
+    filename = tmp_path / "image.nii"
+    filename.write_bytes(b"abc")
+
+    with pytest.raises(ValueError):
+        compute_file_fingerprint(str(filename), "md5")
+
+
+@pytest.mark.parametrize("link", [False, True])
+def test_copy_file(tmp_path, link):
+    src = tmp_path / "volume.nrrd"
+    dst = tmp_path / "copy.nrrd"
+    src.write_bytes(b"volume")
+
+    copy_file(str(src), str(dst), link)
+
+    assert dst.read_bytes() == b"volume"
+    assert (src.stat().st_ino == dst.stat().st_ino) == link
+
+
+def test_copy_file_replaces_link(tmp_path):
+    src = tmp_path / "volume.nrrd"
+    other = tmp_path / "other.nrrd"
+    dst = tmp_path / "copy.nrrd"
+    src.write_bytes(b"volume")
+    other.write_bytes(b"other")
+    copy_file(str(other), str(dst), link=True)
+
+    copy_file(str(src), str(dst))
+
+    assert dst.read_bytes() == b"volume"
+    assert other.read_bytes() == b"other"
@@ -1,10 +1,17 @@
+import hashlib
 import importlib.metadata
 import os
-from typing import Union, List
+import shutil
+from typing import TYPE_CHECKING, Union, List
 
 from argparse import ArgumentParser, Namespace
-from nrrd.types import NRRDHeader
-import numpy as np
+
+from avnirpy.io.segments import SegmentMetadata
+
+if TYPE_CHECKING:
+    # Only used in annotations: importing nrrd also imports pandas, which would
+    # slow down the startup of every script
+    from nrrd.types import NRRDHeader
 
 __version__ = importlib.metadata.version("avnirpy")
 
@@ -141,7 +148,7 @@ def assert_outputs_exist(
         check(optional_file)
 
 
-def check_segment_extent(nrrd_header: NRRDHeader) -> bool:
+def check_segment_extent(nrrd_header: "NRRDHeader") -> bool:
     """
     Checks if all segment extent values in the NRRD header are consistent.
 
@@ -154,17 +161,10 @@ def check_segment_extent(nrrd_header: NRRDHeader) -> bool:
     Returns:
         bool: True if all segment extent values are consistent, False otherwise.
     """
-    extent = ""
-    for key in nrrd_header:
-        if "Segment" in key and "_Extent" in key:
-            if extent == "":
-                extent = nrrd_header[key]
-            elif extent != nrrd_header[key]:
-                return False
-    return True
+    return len(SegmentMetadata(nrrd_header).extents) <= 1
 
 
-def check_images_space(vol_header: NRRDHeader, labels_header: NRRDHeader) -> bool:
+def check_images_space(vol_header: "NRRDHeader", labels_header: "NRRDHeader") -> bool:
     """
     Check if the space of the volume and the labels are the same.
 
@@ -175,6 +175,8 @@ def check_images_space(vol_header: NRRDHeader, labels_header: NRRDHeader) -> boo
     Returns:
         bool: True if the space of the volume and the labels are the same, False otherwise.
     """
+    import numpy as np
+
     return (
         np.allclose(vol_header["space origin"], labels_header["space origin"])
         and np.allclose(
@@ -184,6 +186,59 @@ def check_images_space(vol_header: NRRDHeader, labels_header: NRRDHeader) -> boo
     )
 
 
+def compute_file_fingerprint(filename: str, method: str = "mtime") -> str:
+    """
+    Compute a fingerprint of a file that changes when its content changes.
+
+    Args:
+        filename (str): The path to the file.
+        method (str, optional): "mtime" to use the size and modification time of the
+            file, or "hash" to use the SHA-256 of its content. Defaults to "mtime".
+
+    Returns:
+        str: The fingerprint of the file.
+
+    Raises:
+        ValueError: If the method is not supported.
+    """
+    if method == "mtime":
+        stat = os.stat(filename)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    if method == "hash":
+        sha256 = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+    raise ValueError("Invalid fingerprint method. Must be 'mtime' or 'hash'.")
+
+
+def copy_file(src: str, dst: str, link: bool = False) -> None:
+    """
+    Copy a file without decoding it, replacing the destination if it exists.
+
+    Args:
+        src (str): The path to the file to copy.
+        dst (str): The path to the copy.
+        link (bool, optional): Create a hard link to the file when possible, which
+            is instantaneous but shares the content of both paths: an in-place edit
+            of one modifies the other. Defaults to False.
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    # Never write through an existing link to another file
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            # Different file systems or links not supported
+            pass
+    shutil.copyfile(src, dst)
+
+
 def add_version_arg(parser: ArgumentParser) -> None:
     """
     Adds a version argument to the given argument parser.
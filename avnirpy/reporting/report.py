@@ -4,7 +4,114 @@ import tempfile
 
 
 from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
+
+TEMPLATES_DIR = abspath(join(dirname(__file__), "../templates"))
+TEMPLATES = ["stroke_report.html", "volumetric_report.html"]
+
+
+def asset_url(path):
+    """
+    Jinja2 filter returning the URL of an image of a report.
+
+    Args:
+        path (str): A data URI, a URL or a file path.
+
+    Returns:
+        str: The data URI or URL unchanged, or the file path as a file:// URL.
+    """
+    if path.startswith("data:") or "://" in path:
+        return path
+    return "file://" + path
+
+
+class ReportRenderer:
+    def __init__(self, templates_dir=TEMPLATES_DIR, templates=TEMPLATES):
+        """
+        Initializes a renderer meant to be shared by all the reports of a process. The
+        templates are compiled once, and the fonts and remote assets (e.g. the logo)
+        are loaded once and reused by every PDF. WeasyPrint is only imported when the
+        first PDF is written.
+
+        Args:
+            templates_dir (str): The directory containing the templates.
+            templates (list): The templates to compile.
+
+        Attributes:
+            env (Environment): The Jinja2 environment holding the compiled templates.
+            assets (dict): The remote assets already fetched, by URL.
+        """
+        self.env = Environment(
+            loader=FileSystemLoader(templates_dir), auto_reload=False
+        )
+        self.env.filters["asset_url"] = asset_url
+        for template in templates:
+            self.env.get_template(template)
+        self.assets = {}
+        self._font_config = None
+
+    @property
+    def font_config(self):
+        """
+        The WeasyPrint font configuration, created on the first use.
+        """
+        if self._font_config is None:
+            from weasyprint.text.fonts import FontConfiguration
+
+            self._font_config = FontConfiguration()
+        return self._font_config
+
+    def url_fetcher(self, url):
+        """
+        Fetches a resource of a report. Remote resources are only fetched once.
+
+        Args:
+            url (str): The URL of the resource.
+
+        Returns:
+            dict: The resource, as returned by weasyprint.default_url_fetcher.
+        """
+        from weasyprint import default_url_fetcher
+
+        if not url.startswith(("http://", "https://")):
+            return default_url_fetcher(url)
+        if url not in self.assets:
+            result = default_url_fetcher(url)
+            if "file_obj" in result:
+                file_obj = result.pop("file_obj")
+                result["string"] = file_obj.read()
+                file_obj.close()
+            self.assets[url] = result
+        return dict(self.assets[url])
+
+    def write_pdf(self, html_content, output_path):
+        """
+        Converts HTML content to a PDF file.
+
+        Args:
+            html_content (str): The HTML content.
+            output_path (str): The file path where the PDF will be saved.
+        """
+        from weasyprint import HTML
+
+        HTML(string=html_content, url_fetcher=self.url_fetcher).write_pdf(
+            output_path, font_config=self.font_config
+        )
+
+
+_renderer = None
+
+
+def get_renderer():
+    """
+    Returns the renderer shared by the reports, creating it on the first call.
+
+    Returns:
+        ReportRenderer: The shared renderer.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = ReportRenderer()
+    return _renderer
 
 
 class Report:
@@ -19,21 +126,40 @@ class Report:
             date (str): The date associated with the report.
 
         Attributes:
+            renderer (ReportRenderer): The renderer shared by all the reports.
             env (Environment): The Jinja2 environment for loading templates.
             patient_name (str): The name of the patient.
             patient_id (str): The unique identifier for the patient.
             date (str): The date associated with the report.
             html_content (str or None): The HTML content of the report, initially set to None.
-            temp_dir (str): The path to a temporary directory for storing files.
+            temp_dir (str): The path to a temporary directory for storing files, created
+                on the first access.
         """
-        self.env = Environment(
-            loader=FileSystemLoader(abspath(join(dirname(__file__), "../templates")))
-        )
+        self.renderer = get_renderer()
+        self.env = self.renderer.env
         self.patient_name = patient_name
         self.patient_id = patient_id
         self.date = date
         self.html_content = None
-        self.temp_dir = tempfile.mkdtemp()
+        self._temp_dir = None
+
+    @property
+    def temp_dir(self):
+        """
+        The path to a temporary directory for storing files. Reports whose images are
+        passed as data URIs never create it.
+        """
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp()
+        return self._temp_dir
+
+    def cleanup(self):
+        """
+        Removes the temporary directory, if it was created.
+        """
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir)
+            self._temp_dir = None
 
     def render(self):
         """
@@ -47,6 +173,7 @@ class Report:
     def to_pdf(self, output_path):
         """
         Converts the HTML content to a PDF file and saves it to the specified output path.
+        The temporary directory is removed, even if the conversion fails.
 
         Args:
             output_path (str): The file path where the PDF will be saved.
@@ -54,8 +181,10 @@ class Report:
         Raises:
             OSError: If there is an issue removing the temporary directory.
         """
-        HTML(string=self.html_content).write_pdf(output_path)
-        shutil.rmtree(self.temp_dir)
+        try:
+            self.renderer.write_pdf(self.html_content, output_path)
+        finally:
+            self.cleanup()
 
 
 class StrokeReport(Report):
@@ -68,7 +197,8 @@ class StrokeReport(Report):
 
         Args:
             volumetry_data (dict): The volumetry data to be included in the report.
-            screenshot_path (str): The file path to the screenshot image.
+            screenshot_path (str): The file path or data URI of the screenshot image.
+            timepoints (list, optional): A list of timepoint image paths or data URIs.
 
         Returns:
             None
@@ -103,9 +233,10 @@ class VolumetryReport(Report):
 
         Args:
             volumetry_data (dict): The volumetry data to be included in the report.
-            screenshot_path (str): The file path to the screenshot image.
-            timepoints (list, optional): A list of timepoint image paths.
-            other_screenshots (dict, optional): A dictionary of other screenshot paths.
+            screenshot_path (str): The file path or data URI of the screenshot image.
+            timepoints (list, optional): A list of timepoint image paths or data URIs.
+            other_screenshots (dict, optional): A dictionary of other screenshot paths
+                or data URIs.
 
         Returns:
             None
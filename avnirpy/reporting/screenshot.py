@@ -1,9 +1,15 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import io
 import os
 
 from PIL import Image, ImageDraw, ImageFont
 import nibabel as nib
 import numpy as np
 
+from avnirpy.io.utils import compute_file_fingerprint
+from avnirpy.segmentation.utils import as_integer_labels
+
 colors = {
     "blue": (0.0, 0.0, 1.0),
     "red": (1.0, 0.0, 0.0),
@@ -17,6 +23,181 @@ colors = {
     "grey": (0.7529, 0.7529, 0.7529),
 }
 
+# Axis of the volume along which the slices of each plane are taken
+planes = {"axial": 2, "coronal": 1, "sagittal": 0}
+
+# Intensity statistics of the images already displayed, see get_intensity_stats.
+# The cache lives in memory, so it only helps when several reports are rendered in
+# the same process (e.g. avnir_create_volumetric_report in batch mode): a CLI run
+# that renders a single report always computes the statistics.
+_intensity_stats_cache = {}
+_intensity_stats_cache_size = 128
+
+
+def png_to_data_uri(png):
+    """
+    Convert an encoded PNG to a data URI
+
+    Parameters
+    ----------
+    png : bytes
+        Encoded PNG.
+
+    Returns
+    -------
+    uri : string
+        data:image/png;base64 URI of the PNG.
+    """
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def image_to_data_uri(image, compress_level=6):
+    """
+    Encode an image as a PNG data URI, without writing it to disk
+
+    Parameters
+    ----------
+    image : PIL.Image
+        Image to encode.
+    compress_level : int
+        PNG compression level, from 0 (fastest) to 9 (smallest).
+
+    Returns
+    -------
+    uri : string
+        data:image/png;base64 URI of the image.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    return png_to_data_uri(buffer.getvalue())
+
+
+def get_labels_lut(nb_labels):
+    """
+    Build a colormap for a label image
+
+    Label 0 is black and the other labels cycle through the colors.
+
+    Parameters
+    ----------
+    nb_labels : int
+        Number of labels, including the background.
+
+    Returns
+    -------
+    lut : array 2D
+        uint8 array of shape (nb_labels, 3), the RGB color of each label.
+    """
+    palette = (np.array(list(colors.values())) * 255).astype(np.uint8)
+    lut = palette[np.arange(max(nb_labels, 1)) % len(palette)]
+    lut[0] = 0
+    return lut
+
+
+def labels_to_rgb(data, lut=None):
+    """
+    Convert a label image to RGB
+
+    Parameters
+    ----------
+    data : array
+        Label image. Float images are accepted if all their values are
+        integers.
+    lut : array 2D
+        Colormap from get_labels_lut. Built from the labels of data if None.
+
+    Returns
+    -------
+    rgb : array
+        uint8 array with the shape of data plus a last axis of size 3.
+
+    Raises
+    ------
+    ValueError
+        If a label is not an integer or is negative.
+    """
+    labels = as_integer_labels(data)
+    if labels.min(initial=0) < 0:
+        raise ValueError("Labels must be non-negative to be displayed.")
+    if lut is None or labels.max(initial=0) >= len(lut):
+        lut = get_labels_lut(int(labels.max(initial=0)) + 1)
+    return lut[labels]
+
+
+def get_mosaic_indices(nb_slices, nb_rows, nb_columns):
+    """
+    Compute the indices of the axial slices displayed in a mosaic
+
+    Parameters
+    ----------
+    nb_slices : int
+        Number of axial slices of the image.
+    nb_rows : int
+        Number of rows.
+    nb_columns : int
+        Number of columns.
+
+    Returns
+    -------
+    indices : list of int
+        Indices of the slices, in display order.
+    """
+    # offset remove the first and last slices
+    offset = int(nb_slices * 0.05)
+    skip = int(np.ceil((nb_slices - 2 * offset) / (nb_columns * nb_rows)))
+    return list(range(0, nb_slices - 2 * offset, skip))
+
+
+def load_mosaic_slices(filename, nb_rows, nb_columns):
+    """
+    Load only the axial slices displayed in a mosaic
+
+    The slices are read one at a time through the array proxy of the image,
+    so the rest of the volume is never decoded.
+
+    Parameters
+    ----------
+    filename : string
+        Image filename.
+    nb_rows : int
+        Number of rows.
+    nb_columns : int
+        Number of columns.
+
+    Returns
+    -------
+    data : array 3D or 4D
+        Selected slices stacked along the third axis.
+    """
+    img = nib.load(filename, keep_file_open=True)
+    indices = get_mosaic_indices(img.shape[2], nb_rows, nb_columns)
+    return load_slices(img, indices)
+
+
+def load_slices(img, indices):
+    """
+    Load axial slices of an image through its array proxy
+
+    Parameters
+    ----------
+    img : string or nibabel image
+        Image filename or image loaded with keep_file_open=True.
+    indices : list of int
+        Indices of the slices to load.
+
+    Returns
+    -------
+    data : array 3D or 4D
+        Slices stacked along the third axis, without NaN.
+    """
+    if isinstance(img, (str, os.PathLike)):
+        img = nib.load(img, keep_file_open=True)
+    data = np.stack(
+        [np.asarray(img.dataobj[:, :, idx], dtype=np.float64) for idx in indices],
+        axis=2,
+    )
+    return np.nan_to_num(data)
+
 
 def screenshot_mosaic_wrapper(
     filename,
@@ -63,31 +244,23 @@ def screenshot_mosaic_wrapper(
     imgs_comb : array 2D
         mosaic in array 2D
     """
-    data = nib.load(filename).get_fdata()
-    data = np.nan_to_num(data)
+    data = load_mosaic_slices(filename, nb_rows, nb_columns)
 
     output_prefix = output_prefix.replace(" ", "_") + "_"
 
     if is_labels:
-        lut = {}
-        unique = np.unique(data.astype(np.int8))
-        lut[0] = np.array((0, 0, 0), dtype=np.int8)
-        for curr_label in unique[1:]:
-            color = list(colors.values())[curr_label]
-            lut[curr_label] = np.array(
-                (
-                    color[0] * 255,
-                    color[1] * 255,
-                    color[2] * 255,
-                ),
-                dtype=np.int8,
-            )
-        tmp = np.zeros(data.shape + (3,))
-        for label in unique:
-            tmp[data == label] = lut[label]
-        data = tmp
+        data = labels_to_rgb(data)
 
-    imgs_comb = screenshot_mosaic(data, pad, nb_rows, nb_columns, min_val, max_val)
+    imgs_comb = screenshot_mosaic(
+        data,
+        pad,
+        nb_rows,
+        nb_columns,
+        min_val,
+        max_val,
+        sampled=True,
+        cache_key=get_intensity_cache_key(filename, "axial", nb_rows, nb_columns),
+    )
     if return_path:
         image_name = os.path.basename(str(filename)).split(".")[0]
         name = os.path.join(directory, output_prefix + image_name + ".png")
@@ -97,6 +270,88 @@ def screenshot_mosaic_wrapper(
         return imgs_comb
 
 
+def screenshot_mosaic_planes(
+    filename,
+    output_prefix="",
+    directory=".",
+    pad=20,
+    nb_rows=1,
+    nb_columns=15,
+    return_path=True,
+    min_val=None,
+    max_val=None,
+    is_labels=False,
+    plane_names=("axial", "coronal", "sagittal"),
+):
+    """
+    Compute axial, coronal and sagittal mosaics from an image
+
+    The image is loaded once and the intensity window is computed once on
+    the whole volume and shared by all the planes.
+
+    Parameters
+    ----------
+    filename : string
+        Image filename.
+    output_prefix : string
+        Image_prefix.
+    directory : string
+        Directory to save the mosaics.
+    pad : int
+        Padding value between each images.
+    nb_rows : int
+        Number of rows.
+    nb_columns : int
+        Number of columns.
+    return_path : bool
+        Return paths of the mosaics.
+    min_val : float
+        Minimum value for the colormap.
+    max_val : float
+        Maximum value for the colormap.
+    is_labels : bool
+        Display the image with the labels colormap.
+    plane_names : list of string
+        Planes to compute, among "axial", "coronal" and "sagittal".
+
+    Returns
+    -------
+    mosaics : dict
+        Path (or image if return_path is False) of the mosaic of each plane.
+    """
+    data = np.nan_to_num(nib.load(filename).get_fdata())
+    if is_labels:
+        lut = get_labels_lut(int(max(data.max(), 0)) + 1)
+    else:
+        min_val, max_val = compute_intensity_window(
+            data, min_val, max_val, get_intensity_cache_key(filename)
+        )
+
+    output_prefix = output_prefix.replace(" ", "_") + "_"
+    image_name = os.path.basename(str(filename)).split(".")[0]
+
+    mosaics = {}
+    for plane in plane_names:
+        # Slices of the plane along the third axis, displayed upright by rot90
+        view = np.moveaxis(data, planes[plane], 2)
+        indices = get_mosaic_indices(view.shape[2], nb_rows, nb_columns)
+        if is_labels:
+            view = labels_to_rgb(view[:, :, indices], lut)
+        else:
+            view = window_intensities(view[:, :, indices], min_val, max_val)
+        mosaic = assemble_mosaic(view, pad, nb_rows, nb_columns, range(len(indices)))
+        imgs_comb = mosaic_to_image(mosaic)
+        if return_path:
+            name = os.path.join(
+                directory, output_prefix + image_name + "_" + plane + ".png"
+            )
+            imgs_comb.save(name)
+            mosaics[plane] = name
+        else:
+            mosaics[plane] = imgs_comb
+    return mosaics
+
+
 def screenshot_mosaic_blend(
     image,
     image_blend,
@@ -109,33 +364,129 @@ def screenshot_mosaic_blend(
     min_val=None,
     max_val=None,
 ):
-    mosaic_image = screenshot_mosaic_wrapper(
+    """
+    Compute a mosaic of an image blended with the colors of a label image
+
+    Parameters
+    ----------
+    image : string
+        Image filename.
+    image_blend : string
+        Label image filename, in the same space as the image.
+    output_prefix : string
+        Image_prefix.
+    directory : string
+        Directory to save the mosaic.
+    blend_val : float
+        Opacity of the labels.
+    pad : int
+        Padding value between each images.
+    nb_rows : int
+        Number of rows.
+    nb_columns : int
+        Number of columns.
+    min_val : float
+        Minimum value for the colormap.
+    max_val : float
+        Maximum value for the colormap.
+
+    Returns
+    -------
+    name : string
+        Path of the mosaic
+    """
+    blend = render_blended_mosaic(
         image,
+        image_blend,
+        blend_val=blend_val,
         pad=pad,
         nb_rows=nb_rows,
         nb_columns=nb_columns,
-        return_path=False,
         min_val=min_val,
         max_val=max_val,
     )
-    mosaic_blend = screenshot_mosaic_wrapper(
-        image_blend,
-        pad=pad,
-        nb_rows=nb_rows,
-        nb_columns=nb_columns,
-        return_path=False,
-        is_labels=True,
-    )
 
     output_prefix = output_prefix.replace(" ", "_") + "_"
     image_name = os.path.basename(str(image)).split(".")[0]
-    blend = Image.blend(mosaic_image, mosaic_blend, alpha=blend_val)
     name = os.path.join(directory, output_prefix + image_name + ".png")
     blend.save(name)
     return name
 
 
-def screenshot_mosaic(data, pad, nb_rows, nb_columns, min_val=None, max_val=None):
+def render_blended_mosaic(
+    image,
+    image_blend,
+    blend_val=0.5,
+    pad=20,
+    nb_rows=1,
+    nb_columns=15,
+    min_val=None,
+    max_val=None,
+):
+    """
+    Render a mosaic of an image blended with the colors of a label image
+
+    The slices are selected once and read from both images concurrently.
+    The colors are blended in a single mosaic that is resized once.
+
+    Parameters
+    ----------
+    image : string
+        Image filename.
+    image_blend : string
+        Label image filename, in the same space as the image.
+    blend_val : float
+        Opacity of the labels.
+    pad : int
+        Padding value between each images.
+    nb_rows : int
+        Number of rows.
+    nb_columns : int
+        Number of columns.
+    min_val : float
+        Minimum value for the colormap.
+    max_val : float
+        Maximum value for the colormap.
+
+    Returns
+    -------
+    imgs_comb : PIL.Image
+        Blended mosaic.
+    """
+    img = nib.load(image, keep_file_open=True)
+    indices = get_mosaic_indices(img.shape[2], nb_rows, nb_columns)
+    with ThreadPoolExecutor(2) as executor:
+        future_labels = executor.submit(load_slices, image_blend, indices)
+        data = load_slices(img, indices)
+        labels = future_labels.result()
+
+    range_row = range(len(indices))
+    min_val, max_val = compute_intensity_window(
+        data,
+        min_val,
+        max_val,
+        get_intensity_cache_key(image, "axial", nb_rows, nb_columns),
+    )
+    mosaic = assemble_mosaic(
+        window_intensities(data, min_val, max_val), pad, nb_rows, nb_columns, range_row
+    )
+    mosaic_labels = assemble_mosaic(
+        labels_to_rgb(labels), pad, nb_rows, nb_columns, range_row
+    )
+    blend = mosaic[..., None] * (1 - blend_val) + mosaic_labels * blend_val
+    return mosaic_to_image(np.clip(np.rint(blend), 0, 255).astype(np.uint8))
+
+
+def screenshot_mosaic(
+    data,
+    pad,
+    nb_rows,
+    nb_columns,
+    min_val=None,
+    max_val=None,
+    sampled=False,
+    cache_key=None,
+):
     """
     Compute a mosaic from an image
 
@@ -157,7 +508,10 @@ def screenshot_mosaic(data, pad, nb_rows, nb_columns, min_val=None, max_val=None
         Maximum value for the colormap.
     offset : int
         Offset index for the mosaic.
-
+    sampled : bool
+        Data only contains the slices to display (see load_mosaic_slices).
+    cache_key : tuple
+        Key of the intensity statistics of data (see get_intensity_cache_key).
 
     Returns
     -------
@@ -166,57 +520,225 @@ def screenshot_mosaic(data, pad, nb_rows, nb_columns, min_val=None, max_val=None
     imgs_comb : array 2D
         mosaic in array 2D
     """
-    # offset remove the first and last slices
-    offset = int(data.shape[2] * 0.05)
-    skip = int(np.ceil((data.shape[2] - 2 * offset) / (nb_columns * nb_rows)))
-    range_row = range(0, data.shape[2] - 2 * offset, skip)
-    shape = (
-        (data[:, :, 0].shape[1] + pad) * nb_rows + pad * nb_rows,
-        (data[:, :, 0].shape[0] + pad) * nb_columns + nb_columns * pad,
-    )
-    padding = ((int(pad / 2), int(pad / 2)), (int(pad / 2), int(pad / 2)))
-    axis_padding = ((50, 50), (50, 50))
+    if sampled:
+        range_row = range(data.shape[2])
+    else:
+        range_row = get_mosaic_indices(data.shape[2], nb_rows, nb_columns)
     if data.ndim < 4:
-        if min_val is None:
-            min_val = np.min(data[data > 0])
-        if max_val is None:
-            max_val = np.percentile(data[data > 0], 99)
-        if max_val - min_val < 20 and max_val.is_integer():
-            min_val = data.min()
-            max_val = np.percentile(data[data > 0], 99.99)
-        data = np.interp(data, xp=[min_val, max_val], fp=[0, 255]).astype(
-            dtype=np.uint8
-        )
+        min_val, max_val = compute_intensity_window(data, min_val, max_val, cache_key)
+        data = window_intensities(data[:, :, list(range_row)], min_val, max_val)
+        range_row = range(data.shape[2])
+
+    mosaic = assemble_mosaic(data, pad, nb_rows, nb_columns, range_row)
+    return mosaic_to_image(mosaic)
+
+
+def get_intensity_cache_key(filename, *sampling):
+    """
+    Compute the key of the intensity statistics of an image
+
+    The fingerprint is the size and modification time of the file rather
+    than a hash of its content (see compute_file_fingerprint): hashing would
+    read the whole image on every lookup, which costs more than the
+    statistics it saves. A file rewritten with the same size within the
+    timestamp resolution of the file system keeps its cached statistics.
+
+    Parameters
+    ----------
+    filename : string
+        Image filename.
+    sampling : tuple
+        Description of the voxels used for the statistics, e.g. the plane,
+        number of rows and number of columns of the mosaic.
+
+    Returns
+    -------
+    key : tuple
+        Path, fingerprint and sampling of the image, or None if the file does
+        not exist.
+    """
+    if not os.path.isfile(filename):
+        return None
+    return (
+        os.path.abspath(filename),
+        compute_file_fingerprint(filename, method="mtime"),
+    ) + sampling
+
+
+def get_intensity_stats(data, cache_key=None, max_samples=1000000):
+    """
+    Compute the intensity statistics used for the intensity window
+
+    The positive values are extracted once. The percentiles are computed in
+    a single call on a strided sample of at most max_samples values. If no
+    value is positive, the minimum and maximum of the image are used instead.
+
+    The cache is kept in memory for the lifetime of the process and is not
+    saved to disk.
+
+    Parameters
+    ----------
+    data : array 3D
+        Image data.
+    cache_key : tuple
+        Key of the statistics of data (see get_intensity_cache_key). The
+        statistics are cached if not None.
+    max_samples : int
+        Maximum number of values used for the percentiles.
+
+    Returns
+    -------
+    stats : dict
+        "min", "positive_min", "p99" and "p99.99" of the intensities.
+    """
+    if cache_key is not None and cache_key in _intensity_stats_cache:
+        return _intensity_stats_cache[cache_key]
+
+    positive = data[data > 0]
+    if positive.size == 0:
+        # Blank or all-negative image: use the full range of the intensities
+        stats = {
+            "min": data.min(),
+            "positive_min": data.min(),
+            "p99": data.max(),
+            "p99.99": data.max(),
+        }
     else:
-        # Image is RGB
-        shape += (3,)
-        padding += ((0, 0),)
-        axis_padding += ((0, 0),)
+        step = int(np.ceil(positive.size / max_samples)) or 1
+        p99, p9999 = np.percentile(positive[::step], [99, 99.99])
+        stats = {
+            "min": data.min(),
+            "positive_min": np.min(positive),
+            "p99": p99,
+            "p99.99": p9999,
+        }
+
+    if cache_key is not None:
+        if len(_intensity_stats_cache) >= _intensity_stats_cache_size:
+            _intensity_stats_cache.pop(next(iter(_intensity_stats_cache)))
+        _intensity_stats_cache[cache_key] = stats
+    return stats
+
+
+def compute_intensity_window(data, min_val=None, max_val=None, cache_key=None):
+    """
+    Compute the intensity window of an image
+
+    Parameters
+    ----------
+    data : array 3D
+        Image data.
+    min_val : float
+        Minimum value for the colormap. Minimum positive value if None.
+    max_val : float
+        Maximum value for the colormap. 99th percentile of the positive
+        values if None.
+    cache_key : tuple
+        Key of the intensity statistics of data (see get_intensity_cache_key).
+
+    Returns
+    -------
+    min_val : float
+        Minimum value for the colormap.
+    max_val : float
+        Maximum value for the colormap.
+    """
+    if min_val is not None and max_val is not None and max_val - min_val >= 20:
+        return min_val, max_val
+
+    stats = get_intensity_stats(data, cache_key)
+    if min_val is None:
+        min_val = stats["positive_min"]
+    if max_val is None:
+        max_val = stats["p99"]
+    if max_val - min_val < 20 and max_val.is_integer():
+        min_val = stats["min"]
+        max_val = stats["p99.99"]
+    return min_val, max_val
 
-    mosaic = np.zeros(shape, dtype=np.uint8)
 
+def window_intensities(data, min_val, max_val):
+    """
+    Map the intensities of an image to [0, 255]
+
+    Parameters
+    ----------
+    data : array 3D
+        Image data.
+    min_val : float
+        Value mapped to 0.
+    max_val : float
+        Value mapped to 255.
+
+    Returns
+    -------
+    data : array 3D
+        uint8 windowed data.
+    """
+    return np.interp(data, xp=[min_val, max_val], fp=[0, 255]).astype(dtype=np.uint8)
+
+
+def assemble_mosaic(data, pad, nb_rows, nb_columns, range_row):
+    """
+    Assemble the axial slices of an image in a mosaic
+
+    The rotated slices are written directly in a canvas that already
+    includes the padding between the slices and the axis padding.
+
+    Parameters
+    ----------
+    data : array 3D or 4D
+        uint8 data, 4D if RGB.
+    pad : int
+        Padding value between each images.
+    nb_rows : int
+        Number of rows.
+    nb_columns : int
+        Number of columns.
+    range_row : list of int
+        Indices of the slices, in display order.
+
+    Returns
+    -------
+    mosaic : array 2D or 3D
+        uint8 mosaic, including the axis padding.
+    """
+    axis_pad = 50
+    height, width = data.shape[1], data.shape[0]
+    shape = (
+        (height + pad) * nb_rows + pad * nb_rows + 2 * axis_pad,
+        (width + pad) * nb_columns + nb_columns * pad + 2 * axis_pad,
+    ) + data.shape[3:]
+    # Size of a slice and of its padding
+    tile_height = height + 2 * int(pad / 2) + pad
+    tile_width = width + 2 * int(pad / 2) + pad
+
+    mosaic = np.zeros(shape, dtype=np.uint8)
     for i, idx in enumerate(range_row):
         corner = i % nb_columns
         row = int(i / nb_columns)
-        curr_img = np.rot90(data[:, :, idx])
-        curr_img = np.pad(curr_img, padding, "constant").astype(dtype=np.uint8)
-        curr_shape = curr_img.shape
-        mosaic[
-            curr_shape[0] * row
-            + row * pad : row * curr_shape[0]
-            + curr_shape[0]
-            + row * pad,
-            curr_shape[1] * corner
-            + corner * pad : corner * curr_shape[1]
-            + curr_shape[1]
-            + corner * pad,
-        ] = curr_img
-
-    mosaic = np.pad(mosaic, axis_padding, "constant").astype(dtype=np.uint8)
-
-    img = np.uint8(np.clip(mosaic, 0, 255))
-    imgs_comb = Image.fromarray(img)
-    if mosaic[:, :].shape[1] > 1920:
+        top = axis_pad + row * tile_height + int(pad / 2)
+        left = axis_pad + corner * tile_width + int(pad / 2)
+        mosaic[top : top + height, left : left + width] = np.rot90(data[:, :, idx])
+    return mosaic
+
+
+def mosaic_to_image(mosaic):
+    """
+    Convert a mosaic to an RGB image at most 1920 pixels wide
+
+    Parameters
+    ----------
+    mosaic : array 2D or 3D
+        uint8 mosaic.
+
+    Returns
+    -------
+    imgs_comb : PIL.Image
+        RGB image of the mosaic.
+    """
+    imgs_comb = Image.fromarray(mosaic)
+    if mosaic.shape[1] > 1920:
         basewidth = 1920
         wpercent = basewidth / float(imgs_comb.size[0])
         hsize = int((float(imgs_comb.size[1]) * float(wpercent)))
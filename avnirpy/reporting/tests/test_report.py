@@ -1,6 +1,12 @@
 import pytest
 from unittest import mock
-from avnirpy.reporting.report import Report, StrokeReport
+from avnirpy.reporting.report import (
+    Report,
+    ReportRenderer,
+    StrokeReport,
+    TEMPLATES,
+    asset_url,
+)
 import tempfile
 import shutil
 from jinja2 import Environment, PackageLoader
@@ -35,8 +41,51 @@ def test_report_to_pdf(mock_rmtree, mock_write_pdf, report):
     report.html_content = "<html><body>Test</body></html>"
     with tempfile.NamedTemporaryFile(suffix=".pdf") as temp_pdf:
         report.to_pdf(temp_pdf.name)
-        mock_write_pdf.assert_called_once_with(temp_pdf.name)
-        mock_rmtree.assert_called_once_with(report.temp_dir)
+        mock_write_pdf.assert_called_once_with(
+            temp_pdf.name, font_config=report.renderer.font_config
+        )
+        mock_rmtree.assert_not_called()
+
+
+@mock.patch("weasyprint.HTML.write_pdf", side_effect=RuntimeError)
+@mock.patch("shutil.rmtree")
+def test_report_to_pdf_removes_temp_dir(mock_rmtree, mock_write_pdf, report):
+    report.html_content = "<html><body>Test</body></html>"
+    temp_dir = report.temp_dir
+    with pytest.raises(RuntimeError):
+        report.to_pdf("report.pdf")
+    mock_rmtree.assert_called_once_with(temp_dir)
+
+
+def test_asset_url():
+    assert asset_url("/tmp/screenshot.png") == "file:///tmp/screenshot.png"
+    assert asset_url("data:image/png;base64,AAAA") == "data:image/png;base64,AAAA"
+    assert asset_url("https://example.com/logo.png") == "https://example.com/logo.png"
+
+
+def test_reports_share_renderer(report, stroke_report):
+    assert report.renderer is stroke_report.renderer
+    assert report.env is stroke_report.env
+
+
+def test_renderer_compiles_templates():
+    renderer = ReportRenderer()
+    assert not renderer.env.auto_reload
+    assert len(renderer.env.cache) == len(TEMPLATES)
+
+
+@mock.patch("weasyprint.default_url_fetcher")
+def test_renderer_url_fetcher(mock_fetcher):
+    mock_fetcher.return_value = {"string": b"logo", "mime_type": "image/png"}
+    renderer = ReportRenderer()
+
+    for _ in range(2):
+        result = renderer.url_fetcher("https://example.com/logo.png")
+        assert result == {"string": b"logo", "mime_type": "image/png"}
+    renderer.url_fetcher("file:///tmp/screenshot.png")
+    renderer.url_fetcher("file:///tmp/screenshot.png")
+
+    assert mock_fetcher.call_count == 3
 
 
 def test_stroke_report_initialization(stroke_report):
@@ -1,3 +1,5 @@
+import base64
+import io
 import os
 import numpy as np
 import nibabel as nib
@@ -6,9 +8,21 @@ from unittest import mock
 import pytest
 
 from avnirpy.reporting.screenshot import (
+    colors,
+    assemble_mosaic,
     screenshot_mosaic_wrapper,
     screenshot_mosaic_blend,
     screenshot_mosaic,
+    screenshot_mosaic_planes,
+    compute_intensity_window,
+    get_intensity_cache_key,
+    get_intensity_stats,
+    get_labels_lut,
+    get_mosaic_indices,
+    image_to_data_uri,
+    labels_to_rgb,
+    load_mosaic_slices,
+    render_blended_mosaic,
 )
 
 # Mock data for testing
@@ -20,6 +34,8 @@ def mock_nib_load():
     with mock.patch("nibabel.load") as mock_load:
         mock_img = mock.Mock()
         mock_img.get_fdata.return_value = mock_data
+        mock_img.dataobj = mock_data
+        mock_img.shape = mock_data.shape
         mock_load.return_value = mock_img
         yield mock_load
 
@@ -55,6 +71,108 @@ def test_screenshot_mosaic_blend(mock_nib_load, mock_image_save):
     mock_image_save.assert_called_once()
 
 
+def _former_labels_to_rgb(data):
+    """Label colors of the former screenshot_mosaic_wrapper."""
+    palette = list(colors.values())
+    rgb = np.zeros(data.shape + (3,))
+    for label in np.unique(data)[1:]:
+        rgb[data == label] = np.array(palette[label]) * 255
+    return rgb
+
+
+def _former_screenshot_mosaic(
+    data, pad, nb_rows, nb_columns, min_val=None, max_val=None
+):
+    """Former screenshot_mosaic, with a given intensity window."""
+    offset = int(data.shape[2] * 0.05)
+    skip = int(np.ceil((data.shape[2] - 2 * offset) / (nb_columns * nb_rows)))
+    range_row = range(0, data.shape[2] - 2 * offset, skip)
+    shape = (
+        (data.shape[1] + pad) * nb_rows + pad * nb_rows,
+        (data.shape[0] + pad) * nb_columns + nb_columns * pad,
+    )
+    padding = ((pad // 2, pad // 2), (pad // 2, pad // 2))
+    axis_padding = ((50, 50), (50, 50))
+    if data.ndim < 4:
+        data = np.interp(data, xp=[min_val, max_val], fp=[0, 255]).astype(np.uint8)
+    else:
+        shape += (3,)
+        padding += ((0, 0),)
+        axis_padding += ((0, 0),)
+
+    mosaic = np.zeros(shape, dtype=np.uint8)
+    for i, idx in enumerate(range_row):
+        corner = i % nb_columns
+        row = i // nb_columns
+        curr_img = np.pad(np.rot90(data[:, :, idx]), padding).astype(np.uint8)
+        height, width = curr_img.shape[:2]
+        top = row * (height + pad)
+        left = corner * (width + pad)
+        mosaic[top : top + height, left : left + width] = curr_img
+    mosaic = np.pad(mosaic, axis_padding)
+
+    imgs_comb = Image.fromarray(mosaic)
+    if mosaic.shape[1] > 1920:
+        hsize = int(float(imgs_comb.size[1]) * (1920 / float(imgs_comb.size[0])))
+        imgs_comb = imgs_comb.resize((1920, hsize), Image.LANCZOS)
+    return imgs_comb.convert("RGB")
+
+
+@pytest.mark.parametrize("width, resized", [(10, False), (100, True)])
+def test_render_blended_mosaic(tmp_path, width, resized):
+    rng = np.random.default_rng(0)
+    volume = rng.normal(100, 30, size=(width, 12, 30))
+    labels = np.zeros(volume.shape, dtype=np.uint8)
+    labels[2:6, 3:8] = 1
+    labels[5:9, 6:10, 5:20] = 2
+    image = str(tmp_path / "image.nii.gz")
+    image_blend = str(tmp_path / "labels.nii.gz")
+    nib.save(nib.Nifti1Image(volume, np.eye(4)), image)
+    nib.save(nib.Nifti1Image(labels, np.eye(4)), image_blend)
+
+    # The intensity window is given: the former implementation computed it on all the
+    # slices rather than on the displayed ones
+    result = render_blended_mosaic(
+        image, image_blend, blend_val=0.3, nb_rows=2, min_val=40, max_val=160
+    )
+
+    # Former implementation: two mosaics blended with Image.blend
+    expected = Image.blend(
+        _former_screenshot_mosaic(volume, 20, 2, 15, 40, 160),
+        _former_screenshot_mosaic(_former_labels_to_rgb(labels), 20, 2, 15),
+        alpha=0.3,
+    )
+    assert result.size == expected.size
+    assert (result.size[0] == 1920) == resized
+    difference = np.abs(np.asarray(result, dtype=int) - np.asarray(expected, dtype=int))
+    if resized:
+        # The mosaic is resized after the blending instead of before
+        assert difference.mean() < 1
+    else:
+        assert difference.max() <= 1
+
+
+def test_screenshot_mosaic_planes(mock_nib_load, mock_image_save):
+    result = screenshot_mosaic_planes("test_image.nii", "test_prefix", ".")
+    assert result == {
+        plane: os.path.join(".", "test_prefix_test_image_" + plane + ".png")
+        for plane in ["axial", "coronal", "sagittal"]
+    }
+    assert mock_image_save.call_count == 3
+    mock_nib_load.assert_called_once()
+
+
+def test_screenshot_mosaic_planes_shape(mock_nib_load):
+    labels = np.random.randint(3, size=(10, 12, 14))
+    mock_nib_load.return_value.get_fdata.return_value = labels
+    result = screenshot_mosaic_planes(
+        "test_image.nii", pad=0, nb_columns=2, return_path=False, is_labels=True
+    )
+    assert result["axial"].size == (2 * 10 + 100, 12 + 100)
+    assert result["coronal"].size == (2 * 10 + 100, 14 + 100)
+    assert result["sagittal"].size == (2 * 12 + 100, 14 + 100)
+
+
 def test_screenshot_mosaic():
     data = mock_data
     skip = 1
@@ -73,3 +191,156 @@ def test_screenshot_anatomy_mosaic():
     max_val = 200
     result = screenshot_mosaic(data, skip, pad, nb_columns, min_val, max_val)
     assert isinstance(result, Image.Image)
+
+
+def test_get_mosaic_indices():
+    indices = get_mosaic_indices(100, 1, 15)
+    assert indices == list(range(0, 90, 6))
+    assert len(get_mosaic_indices(100, 2, 15)) <= 30
+
+
+def test_load_mosaic_slices(tmp_path):
+    data = np.random.rand(10, 12, 100)
+    data[0, 0, 0] = np.nan
+    filename = str(tmp_path / "test_image.nii.gz")
+    nib.save(nib.Nifti1Image(data, np.eye(4)), filename)
+
+    result = load_mosaic_slices(filename, 1, 15)
+
+    indices = get_mosaic_indices(100, 1, 15)
+    np.testing.assert_allclose(result, np.nan_to_num(data[:, :, indices]))
+
+
+def test_screenshot_mosaic_sampled():
+    indices = get_mosaic_indices(100, 1, 15)
+    result = screenshot_mosaic(mock_data, 20, 1, 15, 1.0, 4.0)
+    result_sampled = screenshot_mosaic(
+        mock_data[:, :, indices], 20, 1, 15, 1.0, 4.0, sampled=True
+    )
+    np.testing.assert_array_equal(np.asarray(result), np.asarray(result_sampled))
+
+
+@pytest.mark.parametrize(
+    "pad, nb_rows, nb_columns, nb_slices",
+    [(20, 1, 3, 3), (5, 1, 3, 3), (5, 2, 3, 6), (7, 2, 3, 4)],
+)
+def test_assemble_mosaic(pad, nb_rows, nb_columns, nb_slices):
+    width, height = 4, 6
+    data = np.zeros((width, height, nb_slices), dtype=np.uint8)
+    data[:, :] = np.arange(1, nb_slices + 1)
+    data[0, 0] = 255
+
+    mosaic = assemble_mosaic(data, pad, nb_rows, nb_columns, range(nb_slices))
+
+    assert mosaic.shape == (
+        (height + 2 * pad) * nb_rows + 100,
+        (width + 2 * pad) * nb_columns + 100,
+    )
+    tile_height = height + 2 * (pad // 2) + pad
+    tile_width = width + 2 * (pad // 2) + pad
+    expected = np.zeros_like(mosaic)
+    for i in range(nb_slices):
+        top = 50 + (i // nb_columns) * tile_height + pad // 2
+        left = 50 + (i % nb_columns) * tile_width + pad // 2
+        tile = mosaic[top : top + height, left : left + width]
+        # Rotated slice: the first voxel is displayed at the bottom left
+        assert tile[-1, 0] == 255
+        assert np.count_nonzero(tile == i + 1) == width * height - 1
+        expected[top : top + height, left : left + width] = tile
+    # Nothing else is drawn, including in the tiles without a slice
+    np.testing.assert_array_equal(mosaic, expected)
+
+
+def test_get_labels_lut():
+    lut = get_labels_lut(12)
+
+    assert lut.shape == (12, 3)
+    assert lut.dtype == np.uint8
+    np.testing.assert_array_equal(lut[0], [0, 0, 0])
+    np.testing.assert_array_equal(lut[1], [255, 0, 0])
+    np.testing.assert_array_equal(lut[3], [160, 32, 240])
+    np.testing.assert_array_equal(lut[11], lut[1])
+
+
+def test_labels_to_rgb():
+    data = np.array([[0.0, 1.0], [3.0, 12.0]])
+
+    rgb = labels_to_rgb(data)
+
+    lut = get_labels_lut(13)
+    assert rgb.shape == (2, 2, 3)
+    assert rgb.dtype == np.uint8
+    for label in [0, 1, 3, 12]:
+        np.testing.assert_array_equal(rgb[data == label][0], lut[label])
+
+
+@pytest.mark.parametrize("value", [2.7, -1.0, np.nan])
+def test_labels_to_rgb_invalid_labels(value):
+    data = np.array([[0.0, 1.0], [3.0, value]])
+
+    with pytest.raises(ValueError, match="Labels must be"):
+        labels_to_rgb(data)
+
+
+def test_get_intensity_stats():
+    data = np.random.rand(20, 20, 20) * 1000
+
+    stats = get_intensity_stats(data)
+
+    assert stats["min"] == data.min()
+    assert stats["positive_min"] == np.min(data[data > 0])
+    assert stats["p99"] == pytest.approx(np.percentile(data[data > 0], 99))
+    assert stats["p99.99"] == pytest.approx(np.percentile(data[data > 0], 99.99))
+
+
+def test_get_intensity_stats_strided_sample():
+    data = np.arange(1, 100001, dtype=float).reshape(100, 100, 10)
+
+    stats = get_intensity_stats(data, max_samples=1000)
+
+    assert stats["positive_min"] == 1
+    assert stats["p99"] == pytest.approx(99000, rel=0.01)
+
+
+@pytest.mark.parametrize("fill", [0, -1000])
+def test_get_intensity_stats_no_positive_value(fill):
+    data = np.full((5, 5, 5), fill, dtype=np.int16)
+    data[0, 0, 0] = fill - 10
+
+    stats = get_intensity_stats(data)
+    min_val, max_val = compute_intensity_window(data)
+
+    assert stats["min"] == stats["positive_min"] == fill - 10
+    assert stats["p99"] == stats["p99.99"] == fill
+    assert (min_val, max_val) == (fill - 10, fill)
+
+
+def test_get_intensity_stats_cache(tmp_path):
+    filename = tmp_path / "test_image.nii"
+    filename.write_bytes(b"abc")
+    cache_key = get_intensity_cache_key(str(filename), "axial")
+
+    stats = get_intensity_stats(np.random.rand(5, 5, 5), cache_key)
+
+    assert get_intensity_stats(np.random.rand(5, 5, 5), cache_key) is stats
+    assert get_intensity_cache_key("missing.nii") is None
+
+
+def test_compute_intensity_window():
+    data = np.random.randint(1000, size=(20, 20, 20)).astype(float)
+
+    assert compute_intensity_window(data, 60, 200) == (60, 200)
+    min_val, max_val = compute_intensity_window(data)
+    assert min_val == np.min(data[data > 0])
+    assert max_val == pytest.approx(np.percentile(data[data > 0], 99))
+
+
+def test_image_to_data_uri():
+    image = Image.fromarray(np.random.randint(256, size=(8, 8, 3), dtype=np.uint8))
+
+    uri = image_to_data_uri(image, compress_level=1)
+
+    assert uri.startswith("data:image/png;base64,")
+    png = base64.b64decode(uri.split(",", 1)[1])
+    decoded = Image.open(io.BytesIO(png))
+    np.testing.assert_array_equal(np.asarray(decoded), np.asarray(image))
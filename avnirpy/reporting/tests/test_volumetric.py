@@ -0,0 +1,98 @@
+import json
+
+import pandas as pd
+import pytest
+
+from avnirpy.reporting.volumetric import (
+    DEFAULT_HEADER,
+    compute_diff_perc,
+    load_report_config,
+    read_manifest,
+)
+
+
+def test_load_report_config(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(
+        json.dumps({"title": "Report", "label_name": {"1": "Lesion", "2": "Edema"}})
+    )
+
+    config = load_report_config(str(config_file))
+
+    assert config["title"] == "Report"
+    assert config["label_name"] == {1: "Lesion", 2: "Edema"}
+    assert config["header"] == DEFAULT_HEADER
+    assert config["logo"].startswith("https://")
+
+
+def test_read_manifest_csv(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "input_labels,input_volume,input_volumetry,date_time,output_report,"
+        "patient_id,min_clip_value\n"
+        "labels.nii.gz,volume.nii.gz,volumetry.json,20240101120000,report.pdf,007,\n"
+        "labels.nii.gz,volume.nii.gz,volumetry.json,20240102120000,report2.pdf,,10\n"
+    )
+
+    reports = read_manifest(str(manifest))
+
+    assert reports[0] == {
+        "input_labels": "labels.nii.gz",
+        "input_volume": "volume.nii.gz",
+        "input_volumetry": "volumetry.json",
+        "date_time": "20240101120000",
+        "output_report": "report.pdf",
+        "patient_id": "007",
+    }
+    assert "patient_id" not in reports[1]
+    assert reports[1]["min_clip_value"] == 10.0
+
+
+def test_read_manifest_json(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {
+                    "input_labels": "labels.nii.gz",
+                    "input_volume": "volume.nii.gz",
+                    "input_volumetry": "volumetry.json",
+                    "date_time": 20240101120000,
+                    "output_report": "report.pdf",
+                    "previous_timepoint": None,
+                    "comment": "ignored",
+                }
+            ]
+        )
+    )
+
+    reports = read_manifest(str(manifest))
+
+    assert len(reports) == 1
+    assert reports[0]["date_time"] == "20240101120000"
+    assert "previous_timepoint" not in reports[0]
+    assert "comment" not in reports[0]
+
+
+def test_read_manifest_missing_column(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([{"input_labels": "labels.nii.gz"}]))
+
+    with pytest.raises(ValueError, match="input_volume"):
+        read_manifest(str(manifest))
+
+
+def test_read_manifest_invalid_format(tmp_path):
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path / "manifest.txt"))
+
+
+def test_compute_diff_perc():
+    current_df = pd.DataFrame({"label_name": ["Lesion"], "volume": [15.0]})
+    previous_df = pd.DataFrame({"label_name": ["Lesion"], "volume": [10.0]})
+
+    compute_diff_perc(current_df, previous_df, "volume", "Lesion")
+
+    assert current_df["last_volume"].iloc[0] == 10.0
+    assert current_df["diff_volume"].iloc[0] == 5.0
+    assert current_df["diff_perc_volume"].iloc[0] == 50.0
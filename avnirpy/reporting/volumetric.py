@@ -0,0 +1,326 @@
+from datetime import datetime
+import io
+import json
+import os
+
+DEFAULT_LOGO = (
+    "https://www.chumontreal.qc.ca/sites/default/files/logos/"
+    "logo_crchum_versionlongue_sans_fond.png"
+)
+DEFAULT_HEADER = "CHUM Research Center"
+
+MANIFEST_REQUIRED_COLUMNS = [
+    "input_labels",
+    "input_volume",
+    "input_volumetry",
+    "date_time",
+    "output_report",
+]
+MANIFEST_OPTIONAL_COLUMNS = [
+    "patient_name",
+    "patient_id",
+    "previous_timepoint",
+    "output_longitudinal",
+    "min_clip_value",
+    "max_clip_value",
+    "other_screenshots",
+]
+
+
+def load_report_config(config_file):
+    """
+    Loads the configuration of the volumetric reports.
+
+    Args:
+        config_file (str): Path to the .json config file.
+
+    Returns:
+        dict: The "title", "label_name" (keyed by integer label ID), "logo" and
+        "header" of the reports.
+    """
+    with open(config_file, "r") as f:
+        config = json.load(f)
+
+    return {
+        "title": config["title"],
+        "label_name": {int(k): v for k, v in config["label_name"].items()},
+        "logo": config.get("logo", DEFAULT_LOGO),
+        "header": config.get("header", DEFAULT_HEADER),
+    }
+
+
+def read_manifest(manifest_file):
+    """
+    Reads a manifest of volumetric reports to generate.
+
+    The manifest is a .csv file with one report per row, or a .json file with a list
+    of reports. Each report has the columns of MANIFEST_REQUIRED_COLUMNS and,
+    optionally, the columns of MANIFEST_OPTIONAL_COLUMNS. Empty values are ignored.
+
+    Args:
+        manifest_file (str): Path to the .csv or .json manifest.
+
+    Returns:
+        List[dict]: The arguments of create_volumetric_report for each report.
+
+    Raises:
+        ValueError: If the manifest is not a .csv or .json file, or if a required
+            column is missing.
+    """
+    import pandas as pd
+
+    extension = os.path.splitext(manifest_file)[1]
+    if extension == ".csv":
+        entries = pd.read_csv(manifest_file, dtype=str, keep_default_na=False)
+        entries = entries.to_dict("records")
+    elif extension == ".json":
+        with open(manifest_file, "r") as f:
+            entries = json.load(f)
+    else:
+        raise ValueError("Invalid manifest format. Must be .csv or .json.")
+
+    reports = []
+    for i, entry in enumerate(entries):
+        report = {
+            column: entry[column]
+            for column in MANIFEST_REQUIRED_COLUMNS + MANIFEST_OPTIONAL_COLUMNS
+            if entry.get(column) not in [None, ""]
+        }
+        missing = [
+            column for column in MANIFEST_REQUIRED_COLUMNS if column not in report
+        ]
+        if missing:
+            raise ValueError(
+                f"Entry {i} of the manifest is missing: {', '.join(missing)}."
+            )
+        report["date_time"] = str(report["date_time"])
+        for column in ["min_clip_value", "max_clip_value"]:
+            if column in report:
+                report[column] = float(report[column])
+        reports.append(report)
+    return reports
+
+
+def compute_diff_perc(current_df, previous_df, column, label):
+    previous = (
+        previous_df.loc[previous_df["label_name"] == label, column].values[0]
+        if label in previous_df["label_name"].values
+        else None
+    )
+    current = current_df.loc[current_df["label_name"] == label, column].values[0]
+    current_df.loc[current_df["label_name"] == label, f"last_{column}"] = previous
+    current_df.loc[current_df["label_name"] == label, f"diff_{column}"] = (
+        current - previous
+    )
+    current_df.loc[current_df["label_name"] == label, f"diff_perc_{column}"] = (
+        (current - previous) / previous * 100
+    )
+
+
+def plot_timepoints(
+    label_data,
+    label,
+    compress_level=6,
+    date_format="%d-%m-%y %H:%M",
+    timepoint_ticks=True,
+):
+    """
+    Plots the evolution of the volume of a label over time.
+
+    Args:
+        label_data (pd.DataFrame): The volumetry of the label at each timepoint,
+            sorted by date.
+        label (str): The name of the label.
+        compress_level (int, optional): PNG compression level, from 0 to 9.
+            Defaults to 6.
+        date_format (str, optional): Format of the dates of the x axis.
+            Defaults to "%d-%m-%y %H:%M".
+        timepoint_ticks (bool, optional): Put the x ticks at each timepoint and
+            between the first and last ones, instead of letting matplotlib place
+            them. Defaults to True.
+
+    Returns:
+        str: The plot, as a PNG data URI.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    from avnirpy.reporting.screenshot import colors, png_to_data_uri
+
+    plt.figure(figsize=(14, 9))
+    sns.set_theme(style="dark")
+    sns.set_context("talk", font_scale=2)
+    sns.lineplot(
+        data=label_data,
+        x="date",
+        y="volume",
+        marker="o",
+        linewidth=4.5,
+        markersize=12,
+        label=f"{label}",
+        color=[*colors][int(label_data["label_id"].values[0])],
+    )
+    plt.title(f"{label} - Volume Evolution Over Time", fontsize=36, fontweight="bold")
+    if timepoint_ticks:
+        # Set x-ticks at each data point and one in the middle
+        xticks = list(label_data["date"])
+        if len(xticks) > 1:
+            # Calculate the middle point between first and last
+            middle = xticks[0] + (xticks[-1] - xticks[0]) / 2
+            xticks_with_middle = xticks + [middle]
+            xticks_with_middle = sorted(xticks_with_middle)
+            plt.gca().set_xticks(xticks_with_middle)
+        else:
+            plt.gca().set_xticks(xticks)
+    plt.gca().xaxis.set_major_formatter(
+        plt.matplotlib.dates.DateFormatter(date_format)
+    )
+    plt.xlabel("Date Hour", fontsize=32, fontweight="bold")
+    plt.ylabel("Volume (ml)", fontsize=32, fontweight="bold")
+    plt.xticks(fontsize=30, rotation=45)
+    plt.yticks(fontsize=30)
+    plt.legend(fontsize=30, frameon=True, shadow=True)
+    plt.grid(True, linestyle="--", alpha=0.5)
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png", pil_kwargs={"compress_level": compress_level})
+    plt.close()
+    return png_to_data_uri(buffer.getvalue())
+
+
+def create_volumetric_report(
+    input_labels,
+    input_volume,
+    input_volumetry,
+    date_time,
+    config,
+    output_report,
+    patient_name="Not available",
+    patient_id="Not available",
+    previous_timepoint=None,
+    output_longitudinal=None,
+    min_clip_value=None,
+    max_clip_value=None,
+    other_screenshots=None,
+    png_compression=6,
+):
+    """
+    Generates a volumetric report in PDF format.
+
+    The screenshot and plots are encoded in memory and embedded in the report as
+    data URIs, nothing is written to disk but the outputs.
+
+    The data and rendering modules (pandas, screenshots, plots and PDF) are imported
+    on the first call, so a process that only reads arguments does not pay for them.
+
+    Args:
+        input_labels (str): Path to the .nii.gz label image.
+        input_volume (str): Path to the .nii.gz volume image.
+        input_volumetry (str): Path to the .json volumetry file.
+        date_time (str): Date and time of the report. Format: YYYYMMDDHHMMSS.
+        config (dict): The configuration returned by load_report_config.
+        output_report (str): Path to the .pdf report.
+        patient_name (str, optional): Patient name. Defaults to "Not available".
+        patient_id (str, optional): Patient ID. Defaults to "Not available".
+        previous_timepoint (str, optional): Path to the .json longitudinal data of
+            the previous timepoints. Defaults to None.
+        output_longitudinal (str, optional): Path to the .json longitudinal data
+            including this timepoint. Defaults to None.
+        min_clip_value (float, optional): Minimum clip value for the volume.
+            Defaults to None.
+        max_clip_value (float, optional): Maximum clip value for the volume.
+            Defaults to None.
+        other_screenshots (str, optional): Path to the .json containing info about
+            other screenshots data. Defaults to None.
+        png_compression (int, optional): PNG compression level of the screenshot and
+            plots, from 0 (fastest) to 9 (smallest). Defaults to 6.
+    """
+    import pandas as pd
+
+    from avnirpy.reporting.report import VolumetryReport
+    from avnirpy.reporting.screenshot import image_to_data_uri, render_blended_mosaic
+
+    label_name = config["label_name"]
+
+    current_df = pd.read_json(input_volumetry, precise_float=True)
+    current_df.sort_values(by="volume", ascending=False, inplace=True)
+    current_df = current_df.round(15)
+    current_df["date"] = datetime.strptime(date_time, "%Y%m%d%H%M%S")
+    current_df["label_name"] = current_df["label_id"].map(label_name)
+
+    report = VolumetryReport(
+        patient_name,
+        patient_id,
+        datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+        config["title"],
+        config["logo"],
+        config["header"],
+    )
+
+    timepoint_graphs = None
+    if previous_timepoint:
+        labels = current_df["label_name"].unique()
+        timepoint_df = pd.read_json(previous_timepoint, precise_float=True)
+
+        # Process timepoint data
+        timepoint_df["label_name"] = timepoint_df["label_id"].map(label_name)
+
+        # Get previous timepoint data
+        previous_df = timepoint_df.loc[
+            timepoint_df.groupby("label_name")["date"].idxmax()
+        ]
+
+        # Calculate differences
+        for label in labels:
+            compute_diff_perc(current_df, previous_df, "volume", label)
+            if "volume_icv" in current_df.columns:
+                compute_diff_perc(current_df, previous_df, "volume_icv", label)
+
+        # Generate timepoint graphs
+        all_timepoint_df = pd.concat([timepoint_df, current_df], ignore_index=True)
+        timepoint_graphs = []
+        for label in labels:
+            label_data = all_timepoint_df[
+                all_timepoint_df["label_name"] == label
+            ].sort_values(by="date")
+            timepoint_graphs.append(plot_timepoints(label_data, label, png_compression))
+    else:
+        all_timepoint_df = current_df.copy()
+
+    screenshot = image_to_data_uri(
+        render_blended_mosaic(
+            input_volume,
+            input_labels,
+            nb_rows=3,
+            nb_columns=3,
+            min_val=min_clip_value,
+            max_val=max_clip_value,
+        ),
+        png_compression,
+    )
+
+    other_screenshots_data = None
+    if other_screenshots:
+        with open(other_screenshots, "r") as f:
+            other_screenshots_data = json.load(f)
+
+    report.render(
+        current_df.to_dict("records"),
+        screenshot,
+        timepoint_graphs,
+        other_screenshots_data,
+    )
+    report.to_pdf(output_report)
+    if output_longitudinal:
+        all_timepoint_df.drop(
+            columns=[
+                "label_name",
+                "last_volume",
+                "diff_volume",
+                "diff_perc_volume",
+                "last_volume_icv",
+                "diff_volume_icv",
+                "diff_perc_volume_icv",
+            ],
+            errors="ignore",
+        ).to_json(output_longitudinal, orient="records", indent=4, double_precision=15)
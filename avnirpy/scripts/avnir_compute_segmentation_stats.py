@@ -10,6 +10,19 @@ It calculates various statistical measures for each segmentation pair using the
 library and outputs the results in a CSV file. Optionally, it can 
 also compute statistics for individual labels in a multi-label segmentation scenario.
 
+Overlap and count-based measures (e.g. fbeta, iou, numb_tp) of every label are derived
+from a single joint histogram of the reference and predicted labels. MetricsReloaded is
+only used for the remaining measures (e.g. boundary_iou, cldice). The "all" label
+compares the foreground (all non-zero labels) of both segmentations.
+
+Distance-based measures (hd, hd_perc, masd, assd, nsd) are in mm, using the voxel size
+of the ground truth. The label borders and distance transforms are computed once per
+label and shared by all of them. They are computed on the bounding box of the union
+of the label in both segmentations, enlarged by --crop_margin voxels, rather than on
+the full image. So are boundary_iou and cldice, which do not depend on the voxels far
+from the labels. The other MetricsReloaded measures use the full image, as their true
+negatives would change with the crop.
+
 Example:
 
     avnir_compute_segmentation_stats \\
@@ -17,27 +30,282 @@ Example:
     /path/to/predictions \\
     /path/to/output.csv \\
     --multilabel --verbose
+
+Rows are appended to the report as soon as each segmentation has been evaluated, and
+the summaries are computed from the written report. The segmentations that cannot be
+evaluated (e.g. non-integer labels or different shapes) are reported and left out of
+the report, and the script then exits with a non-zero status.
+
+Use --backend process to evaluate the segmentations in separate processes. Only the
+file names are sent to the workers, which load the images themselves.
+
+The fingerprints of the evaluated files are saved next to the report, in
+<output>_state.json, which is updated as soon as the rows of each segmentation are
+written. With --incremental, the rows of the segmentations whose ground truth and
+prediction did not change since the previous run, and which are in the existing
+report, are kept and only the other segmentations are evaluated. All segmentations
+are evaluated again if --measures, --multilabel, --crop_margin or --fingerprint
+changed. An interrupted .csv report is resumed by appending the missing rows. The
+rows of an interrupted .parquet report cannot be read, so all its segmentations are
+evaluated again.
 """
 
 import argparse
+from functools import partial
+import json
 import logging
 import os
 
-from MetricsReloaded.metrics.pairwise_measures import BinaryPairwiseMeasures as BPM
-import pandas as pd
-import numpy as np
-
-from avnirpy.io.image import load_nifti
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from avnirpy.io.utils import (
     assert_inputs_exist,
     assert_outputs_exist,
     add_version_arg,
     add_overwrite_arg,
     add_verbose_arg,
+    compute_file_fingerprint,
 )
 
 
+def get_available_measures():
+    """List the measures that can be computed.
+
+    Returns:
+        List[str]: Names of the MetricsReloaded binary pairwise measures.
+    """
+    from MetricsReloaded.metrics.pairwise_measures import (
+        BinaryPairwiseMeasures as BPM,
+    )
+
+    return list(BPM(None, None).measures_dict)
+
+
+def compute_mask_measures(
+    prediction_mask, reference_mask, distance_measures, other_measures, spacing
+):
+    """Compute the measures that need the masks rather than the confusion counts.
+
+    Args:
+        prediction_mask (np.ndarray): Binary mask of the prediction.
+        reference_mask (np.ndarray): Binary mask of the ground truth.
+        distance_measures (List[str]): Measures computed from the label borders.
+        other_measures (List[str]): Measures computed with MetricsReloaded.
+        spacing (Tuple[float, ...]): Voxel size of the images.
+
+    Returns:
+        dict: Value of each measure.
+    """
+    from MetricsReloaded.metrics.pairwise_measures import (
+        BinaryPairwiseMeasures as BPM,
+    )
+
+    from avnirpy.segmentation.metrics import (
+        SurfaceDistances,
+        compute_distance_measures,
+    )
+
+    dict_seg = {}
+    if distance_measures:
+        surface = SurfaceDistances(reference_mask, prediction_mask, spacing)
+        dict_seg.update(compute_distance_measures(surface, distance_measures))
+    if other_measures:
+        bpm = BPM(
+            prediction_mask.astype(int),
+            reference_mask.astype(int),
+            measures=other_measures,
+            pixdim=spacing,
+        )
+        dict_seg.update(bpm.to_dict_meas())
+    return dict_seg
+
+
+def process_segmentation(
+    filename, ground_truth, predictions, measures, multilabel, crop_margin=1
+):
+    """Compute the statistics of a predicted segmentation against its ground truth.
+
+    Args:
+        filename (str): Name of the segmentation in both directories.
+        ground_truth (str): Directory containing the ground truth segmentations.
+        predictions (str): Directory containing the predicted segmentations.
+        measures (List[str]): Measures to compute. If None, all measures are computed.
+        multilabel (bool): Also compute the statistics of each label.
+        crop_margin (int, optional): Margin, in voxels, of the bounding box used for the
+            distance-based measures. Defaults to 1.
+
+    Returns:
+        List[dict]: Statistics of the segmentation, one dictionary per label.
+    """
+    from avnirpy.io.image import load_nifti
+    from avnirpy.segmentation.metrics import (
+        CROP_INVARIANT_MEASURES,
+        compute_overlap_measures,
+        confusion_counts,
+        foreground_confusion_counts,
+        joint_histogram,
+        label_bounding_boxes,
+        merge_bounding_boxes,
+        split_measures,
+    )
+
+    if not os.path.exists(os.path.join(ground_truth, filename)):
+        logging.warning(f"Segmentation {filename} not found in both directories.")
+        return []
+
+    prediction, _, _ = load_nifti(os.path.join(predictions, filename), keep_dtype=True)
+    reference, header, _ = load_nifti(
+        os.path.join(ground_truth, filename), keep_dtype=True
+    )
+    spacing = tuple(float(zoom) for zoom in header.get_zooms()[: reference.ndim])
+
+    if measures is None:
+        measures = get_available_measures()
+    overlap_measures, distance_measures, other_measures = split_measures(measures)
+    cropped_measures = [m for m in other_measures if m in CROP_INVARIANT_MEASURES]
+    full_measures = [m for m in other_measures if m not in CROP_INVARIANT_MEASURES]
+    labels, histogram = joint_histogram(reference, prediction)
+
+    values = compute_overlap_measures(
+        foreground_confusion_counts(labels, histogram), overlap_measures
+    )
+    dict_seg = {measure: values[measure].item() for measure in overlap_measures}
+    if distance_measures or cropped_measures:
+        boxes = label_bounding_boxes(reference, prediction, crop_margin)
+        crop = merge_bounding_boxes(boxes.values(), reference.ndim)
+        dict_seg.update(
+            compute_mask_measures(
+                prediction[crop] > 0,
+                reference[crop] > 0,
+                distance_measures,
+                cropped_measures,
+                spacing,
+            )
+        )
+    if full_measures:
+        dict_seg.update(
+            compute_mask_measures(
+                prediction > 0, reference > 0, [], full_measures, spacing
+            )
+        )
+    dict_seg = {measure: dict_seg[measure] for measure in measures}
+    dict_seg["image"] = filename
+    dict_seg["label"] = "all"
+    results = [dict_seg]
+
+    if multilabel:
+        labels, counts = confusion_counts(labels, histogram)
+        values = compute_overlap_measures(counts, overlap_measures)
+        for i, label in enumerate(labels):
+            dict_seg = {
+                measure: values[measure][i].item() for measure in overlap_measures
+            }
+            if distance_measures or cropped_measures:
+                crop = boxes.get(label, (slice(None),) * reference.ndim)
+                dict_seg.update(
+                    compute_mask_measures(
+                        prediction[crop] == label,
+                        reference[crop] == label,
+                        distance_measures,
+                        cropped_measures,
+                        spacing,
+                    )
+                )
+            if full_measures:
+                dict_seg.update(
+                    compute_mask_measures(
+                        prediction == label,
+                        reference == label,
+                        [],
+                        full_measures,
+                        spacing,
+                    )
+                )
+            dict_seg = {measure: dict_seg[measure] for measure in measures}
+            dict_seg["image"] = filename
+            dict_seg["label"] = label.item()
+            results.append(dict_seg)
+
+    del prediction, reference
+    return results
+
+
+def compute_fingerprints(filename, ground_truth, predictions, method):
+    """Compute the fingerprints of a predicted segmentation and of its ground truth.
+
+    Args:
+        filename (str): Name of the segmentation in both directories.
+        ground_truth (str): Directory containing the ground truth segmentations.
+        predictions (str): Directory containing the predicted segmentations.
+        method (str): Fingerprint method, "mtime" or "hash".
+
+    Returns:
+        dict: Fingerprints of the "prediction" and of the "ground_truth", or None if
+        the ground truth does not exist.
+    """
+    if not os.path.exists(os.path.join(ground_truth, filename)):
+        return None
+    return {
+        "prediction": compute_file_fingerprint(
+            os.path.join(predictions, filename), method
+        ),
+        "ground_truth": compute_file_fingerprint(
+            os.path.join(ground_truth, filename), method
+        ),
+    }
+
+
+def load_previous_results(state_file, results_files, settings):
+    """Load the state and the results of a previous run with the same settings.
+
+    Args:
+        state_file (str): Path to the state saved by the previous run.
+        results_files (List[str]): Paths to the results written by the previous run.
+        settings (dict): Settings of the current run.
+
+    Returns:
+        dict: Fingerprints of each evaluated segmentation, keyed by file name.
+        List[List[dict]]: Rows of each results file.
+    """
+    from avnirpy.io.results import read_results
+
+    if not os.path.isfile(state_file) or not all(
+        os.path.isfile(results_file) for results_file in results_files
+    ):
+        return {}, [[] for _ in results_files]
+
+    with open(state_file) as f:
+        state = json.load(f)
+    if state.get("settings") != settings:
+        logging.info("Settings changed, all segmentations are evaluated again.")
+        return {}, [[] for _ in results_files]
+
+    try:
+        rows = [
+            read_results(results_file).to_dict("records")
+            for results_file in results_files
+        ]
+    except Exception:
+        logging.warning("Previous results unreadable, all segmentations are evaluated.")
+        return {}, [[] for _ in results_files]
+    return state["files"], rows
+
+
+def save_state(state_file, settings, files):
+    """Save the fingerprints of the segmentations whose rows are written.
+
+    The state is replaced atomically, so that an interrupted run never leaves a
+    partial state.
+
+    Args:
+        state_file (str): Path to the state.
+        settings (dict): Settings of the run.
+        files (dict): Fingerprints of each evaluated segmentation, keyed by file name.
+    """
+    with open(state_file + ".tmp", "w") as f:
+        json.dump({"settings": settings, "files": files}, f, indent=4)
+    os.replace(state_file + ".tmp", state_file)
+
+
 def _build_arg_parser():
     """Build argparser.
 
@@ -54,7 +322,12 @@ def _build_arg_parser():
         "predictions",
         help="Directory containing the predicted segmentations.",
     )
-    parser.add_argument("output", help="Path to the .csv statistical report.")
+    parser.add_argument(
+        "output",
+        help="Path to the .csv statistical report. Use a .parquet extension to write\n"
+        "the report in Parquet format (requires pyarrow). The rows of the label\n"
+        '"all" compare the foreground (all non-zero labels) of both segmentations.',
+    )
 
     parser.add_argument(
         "--multilabel", action="store_true", help="Use multi-label mode."
@@ -64,12 +337,43 @@ def _build_arg_parser():
         "--measures",
         nargs="+",
         default=None,
-        help="List of measures to compute. If None, all measures are computed.",
-        choices=BPM(None, None).measures_dict.keys(),
+        help="List of measures to compute. If None, all measures are computed.\n"
+        "Any MetricsReloaded binary pairwise measure is accepted, e.g. fbeta,\n"
+        "iou, hd, hd_perc, masd, assd, nsd, boundary_iou or cldice.",
+    )
+
+    parser.add_argument(
+        "--crop_margin",
+        type=int,
+        default=1,
+        help="Margin, in voxels, around the bounding box of each label used for the\n"
+        "distance-based measures. Must be at least 1.",
+    )
+
+    parser.add_argument(
+        "--nb_threads", type=int, default=1, help="Number of workers to use."
     )
 
     parser.add_argument(
-        "--nb_threads", type=int, default=1, help="Number of threads to use."
+        "--backend",
+        default="thread",
+        choices=["thread", "process"],
+        help="Run the workers in a pool of threads or of processes.",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only evaluate the segmentations that changed since the previous run\n"
+        "and keep the other rows of the existing report.",
+    )
+
+    parser.add_argument(
+        "--fingerprint",
+        default="mtime",
+        choices=["mtime", "hash"],
+        help="Detect changed files from their size and modification time, or from\n"
+        "the hash of their content. [%(default)s]",
     )
 
     add_overwrite_arg(parser)
@@ -87,71 +391,130 @@ def main():
     assert_inputs_exist(
         parser, [args.ground_truth, args.predictions], is_directory=True
     )
-    assert_outputs_exist(parser, args, args.output)
+    if not args.incremental:
+        assert_outputs_exist(parser, args, args.output)
 
-    if not args.output.endswith(".csv"):
+    if args.crop_margin < 1:
+        parser.error("--crop_margin must be at least 1.")
+
+    if os.path.splitext(args.output)[1] not in [".csv", ".parquet"]:
         args.output = args.output + ".csv"
+    output, extension = os.path.splitext(args.output)
 
-    data = []
-
-    def process_segmentation(i):
-        if not os.path.exists(os.path.join(args.ground_truth, i)):
-            logging.warning(f"Segmentation {i} not found in both directories.")
-            return []
-
-        prediction, _, _ = load_nifti(os.path.join(args.predictions, i))
-        reference, _, _ = load_nifti(os.path.join(args.ground_truth, i))
-
-        bpm = BPM(prediction, reference, measures=args.measures)
-        dict_seg = bpm.to_dict_meas()
-        dict_seg["image"] = i
-        dict_seg["label"] = "all"
-        results = [dict_seg]
-
-        if args.multilabel:
-            labels = np.unique(reference)
-            for label in labels:
-                if label == 0:
-                    continue
-                prediction_label = (prediction == label).astype(int)
-                reference_label = (reference == label).astype(int)
-                bpm = BPM(prediction_label, reference_label, measures=args.measures)
-                dict_seg = bpm.to_dict_meas()
-                dict_seg["image"] = i
-                dict_seg["label"] = label
-                results.append(dict_seg)
-
-        del bpm, prediction, reference
-        return results
-
-    with ThreadPoolExecutor(args.nb_threads) as executor:
-        all_results = executor.map(process_segmentation, os.listdir(args.predictions))
-        for result in all_results:
-            data.extend(result)
-
-    df = pd.DataFrame(data)
-    df = df[
-        ["image", "label"]
-        + [col for col in df.columns if col not in ["image", "label"]]
-    ]
-    if args.multilabel:
-        df_labels = df[df["label"] != "all"]
-        df_labels.to_csv(
-            args.output.replace(".csv", "_multilabel.csv"),
-            index=False,
+    from avnirpy.io.results import ResultsWriter, read_results
+
+    available_measures = get_available_measures()
+    invalid_measures = [m for m in args.measures or [] if m not in available_measures]
+    if invalid_measures:
+        parser.error(
+            f"Invalid measures: {', '.join(invalid_measures)}. "
+            f"Choose from: {', '.join(available_measures)}."
         )
-        df_labels.describe().to_csv(
-            args.output.replace(".csv", "_multilabel_summary.csv"), index=True
+    measures = args.measures or available_measures
+    columns = ["image", "label"] + measures
+    if args.multilabel:
+        results_files = {
+            "all": f"{output}_all{extension}",
+            "multilabel": f"{output}_multilabel{extension}",
+        }
+    else:
+        results_files = {"all": args.output}
+    state_file = f"{output}_state.json"
+    settings = {
+        "measures": measures,
+        "multilabel": args.multilabel,
+        "crop_margin": args.crop_margin,
+        "fingerprint": args.fingerprint,
+    }
+
+    previous_files, previous_rows = {}, [[] for _ in results_files]
+    if args.incremental:
+        previous_files, previous_rows = load_previous_results(
+            state_file, list(results_files.values()), settings
         )
+    # Until the rows are written again, no segmentation is up to date
+    if os.path.isfile(state_file):
+        os.remove(state_file)
 
-        df_all = df[df["label"] == "all"]
-        df_all.to_csv(args.output.replace(".csv", "_all.csv"), index=False)
-        df_all.describe().to_csv(
-            args.output.replace(".csv", "_all_summary.csv"), index=True
+    # Every evaluated segmentation has a row in the "all" report
+    reported = {row["image"] for row in previous_rows[0]}
+    files = {}
+    filenames = []
+    for filename in os.listdir(args.predictions):
+        fingerprints = compute_fingerprints(
+            filename, args.ground_truth, args.predictions, args.fingerprint
         )
-    else:
-        df.to_csv(args.output, index=False)
-        df.describe().to_csv(args.output.replace(".csv", "_summary.csv"), index=True)
+        if fingerprints is not None:
+            files[filename] = fingerprints
+        if (
+            fingerprints is None
+            or fingerprints != previous_files.get(filename)
+            or filename not in reported
+        ):
+            filenames.append(filename)
+    up_to_date = set(files) - set(filenames)
+    logging.info(f"{len(up_to_date)} segmentations are up to date.")
+
+    kept_rows = [
+        [row for row in rows if row["image"] in up_to_date] for rows in previous_rows
+    ]
+    # Resume the report in place if none of its rows is outdated
+    append = (
+        bool(previous_files)
+        and extension == ".csv"
+        and all(len(kept) == len(rows) for kept, rows in zip(kept_rows, previous_rows))
+    )
+    writers = {
+        key: ResultsWriter(results_file, columns, append=append)
+        for key, results_file in results_files.items()
+    }
+    if not append:
+        for writer, rows in zip(writers.values(), kept_rows):
+            writer.write(rows)
+    done = {filename: files[filename] for filename in up_to_date}
+    save_state(state_file, settings, done)
+
+    executor_class = (
+        ProcessPoolExecutor if args.backend == "process" else ThreadPoolExecutor
+    )
+    worker = partial(
+        process_segmentation,
+        ground_truth=args.ground_truth,
+        predictions=args.predictions,
+        measures=measures,
+        multilabel=args.multilabel,
+        crop_margin=args.crop_margin,
+    )
+    with executor_class(args.nb_threads) as executor:
+        futures = {
+            executor.submit(worker, filename): filename for filename in filenames
+        }
+        nb_errors = 0
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                # Left out of the state, so evaluated again by an incremental run
+                logging.error(
+                    f"Could not evaluate {futures[future]}: {type(e).__name__}: {e}"
+                )
+                nb_errors += 1
+                continue
+            writers["all"].write([r for r in results if r["label"] == "all"])
+            if args.multilabel:
+                writers["multilabel"].write([r for r in results if r["label"] != "all"])
+            if futures[future] in files:
+                done[futures[future]] = files[futures[future]]
+                save_state(state_file, settings, done)
+
+    # Summaries are computed from the persisted results
+    for writer in writers.values():
+        writer.close()
+        summary = os.path.splitext(writer.filename)[0] + "_summary.csv"
+        read_results(writer.filename).describe().to_csv(summary, index=True)
+
+    if nb_errors:
+        parser.exit(1, f"{nb_errors} segmentation(s) could not be evaluated.\n")
 
 
 if __name__ == "__main__":
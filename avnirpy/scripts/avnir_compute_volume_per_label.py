@@ -8,9 +8,6 @@ in a JSON file. Optionally, it can also compute the normalized volume if a brain
 import argparse
 import json
 
-import numpy as np
-
-from avnirpy.io.image import load_image
 from avnirpy.io.utils import (
     add_overwrite_arg,
     assert_inputs_exist,
@@ -44,34 +41,25 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
+    import numpy as np
+    from avnirpy.io.image import load_image
+    from avnirpy.segmentation.volumetry import compute_volumes_per_label
+
     assert_inputs_exist(parser, args.input_labels, args.brain_mask)
     assert_outputs_exist(parser, args, args.output_json)
 
-    label_data, label_header, _ = load_image(args.input_labels)
+    label_data, label_header, _ = load_image(args.input_labels, keep_dtype=True)
     zooms = label_header.get_zooms()
 
+    brain_mask_data = None
     if args.brain_mask:
-        brain_mask_data, mask_header, _ = load_image(args.brain_mask)
+        brain_mask_data, mask_header, _ = load_image(args.brain_mask, keep_dtype=True)
         if zooms != mask_header.get_zooms() or not np.allclose(
             label_header.get_best_affine(), mask_header.get_best_affine(), atol=1.0e-5
         ):
             raise ValueError("Label and brain mask images are in a different space.")
 
-    labels_id = np.unique(label_data[label_data != 0])
-
-    volumes = []
-    for label_id in labels_id:
-        volumes.append(
-            {
-                "label_id": label_id,
-                "volume": np.sum(label_data == label_id) * np.prod(zooms) / 1000,
-                "volume_icv": (
-                    (np.sum(label_data == label_id) / np.sum(brain_mask_data)) * 100
-                    if args.brain_mask
-                    else None
-                ),
-            }
-        )
+    volumes = compute_volumes_per_label(label_data, zooms, brain_mask_data)
 
     with open(args.output_json, "w") as file:
         json.dump(volumes, file, indent=4)
@@ -9,10 +9,6 @@ It then generates a stroke report in PDF format, including patient information i
 
 import argparse
 from datetime import datetime
-import json
-import seaborn as sns
-import matplotlib.pyplot as plt
-import pandas as pd
 
 from avnirpy.io.utils import (
     add_overwrite_arg,
@@ -20,27 +16,6 @@ from avnirpy.io.utils import (
     assert_outputs_exist,
     add_version_arg,
 )
-from avnirpy.reporting.report import StrokeReport
-from avnirpy.reporting.screenshot import (
-    screenshot_mosaic_blend,
-)
-from avnirpy.reporting.screenshot import colors
-
-
-def compute_diff_perc(current_df, previous_df, column, label):
-    previous = (
-        previous_df.loc[previous_df["label_name"] == label, column].values[0]
-        if label in previous_df["label_name"].values
-        else None
-    )
-    current = current_df.loc[current_df["label_name"] == label, column].values[0]
-    current_df.loc[current_df["label_name"] == label, f"last_{column}"] = previous
-    current_df.loc[current_df["label_name"] == label, f"diff_{column}"] = (
-        current - previous
-    )
-    current_df.loc[current_df["label_name"] == label, f"diff_perc_{column}"] = (
-        (current - previous) / previous * 100
-    )
 
 
 def _build_arg_parser():
@@ -71,6 +46,16 @@ def _build_arg_parser():
         "--output_longitudinal", help="Path to the .json longitudinal data."
     )
 
+    parser.add_argument(
+        "--png_compression",
+        type=int,
+        default=6,
+        choices=range(10),
+        metavar="{0-9}",
+        help="PNG compression level of the images of the report, from 0 (fastest)\n"
+        "to 9 (smallest). [%(default)s]",
+    )
+
     add_overwrite_arg(parser)
     add_version_arg(parser)
     return parser
@@ -80,6 +65,11 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
+    import pandas as pd
+    from avnirpy.reporting.report import StrokeReport
+    from avnirpy.reporting.screenshot import image_to_data_uri, render_blended_mosaic
+    from avnirpy.reporting.volumetric import compute_diff_perc, plot_timepoints
+
     assert_inputs_exist(
         parser, [args.input_labels, args.input_volume, args.input_volumetry]
     )
@@ -122,52 +112,31 @@ def main():
             label_data = all_timepoint_df[
                 all_timepoint_df["label_name"] == label
             ].sort_values(by="date")
-            plt.figure(figsize=(14, 9))
-            sns.set_theme(style="dark")
-            sns.set_context("talk", font_scale=2)
-            sns.lineplot(
-                data=label_data,
-                x="date",
-                y="volume",
-                marker="o",
-                linewidth=4.5,
-                markersize=12,
-                label=f"{label}",
-                color=[*colors][int(label_data["label_id"].values[0])],
-            )
-            plt.title(
-                f"{label} - Volume Evolution Over Time", fontsize=36, fontweight="bold"
-            )
-            plt.gca().xaxis.set_major_formatter(
-                plt.matplotlib.dates.DateFormatter("%d-%m %H:%M")
+            timepoint_graphs.append(
+                plot_timepoints(
+                    label_data,
+                    label,
+                    args.png_compression,
+                    date_format="%d-%m %H:%M",
+                    timepoint_ticks=False,
+                )
             )
-            plt.xlabel("Date Hour", fontsize=32, fontweight="bold")
-            plt.ylabel("Volume (ml)", fontsize=32, fontweight="bold")
-            plt.xticks(fontsize=30, rotation=45)
-            plt.yticks(fontsize=30)
-            plt.legend(fontsize=30, frameon=True, shadow=True)
-            plt.grid(True, linestyle="--", alpha=0.5)
-            plt.tight_layout()
-
-            mosaic_plot_path = f"{report.temp_dir}/label_{label}_mosaic_evolution.png"
-            plt.savefig(mosaic_plot_path)
-            timepoint_graphs.append(mosaic_plot_path)
-            plt.close()
     else:
         all_timepoint_df = current_df.copy()
 
-    screenshot_path = screenshot_mosaic_blend(
-        args.input_volume,
-        args.input_labels,
-        min_val=0,
-        max_val=140,
-        nb_rows=3,
-        nb_columns=3,
-        output_prefix="labels",
-        directory=report.temp_dir,
+    screenshot = image_to_data_uri(
+        render_blended_mosaic(
+            args.input_volume,
+            args.input_labels,
+            min_val=0,
+            max_val=140,
+            nb_rows=3,
+            nb_columns=3,
+        ),
+        args.png_compression,
     )
 
-    report.render(current_df.to_dict("records"), screenshot_path, timepoint_graphs)
+    report.render(current_df.to_dict("records"), screenshot, timepoint_graphs)
     report.to_pdf(args.output_report)
     if args.output_longitudinal:
         all_timepoint_df.drop(
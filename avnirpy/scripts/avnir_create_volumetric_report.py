@@ -5,14 +5,11 @@ This script generates a stroke report in PDF format.
 
 The script takes in three input files: a label image, a volume image, and a volumetry file.
 It then generates a stroke report in PDF format, including patient information if provided.
+
+To generate many reports in a single process, see avnir_create_volumetric_report_batch.
 """
 
 import argparse
-from datetime import datetime
-import json
-import seaborn as sns
-import matplotlib.pyplot as plt
-import pandas as pd
 
 from avnirpy.io.utils import (
     add_overwrite_arg,
@@ -20,27 +17,10 @@ from avnirpy.io.utils import (
     assert_outputs_exist,
     add_version_arg,
 )
-from avnirpy.reporting.report import VolumetryReport
-from avnirpy.reporting.screenshot import (
-    screenshot_mosaic_blend,
+from avnirpy.reporting.volumetric import (
+    create_volumetric_report,
+    load_report_config,
 )
-from avnirpy.reporting.screenshot import colors
-
-
-def compute_diff_perc(current_df, previous_df, column, label):
-    previous = (
-        previous_df.loc[previous_df["label_name"] == label, column].values[0]
-        if label in previous_df["label_name"].values
-        else None
-    )
-    current = current_df.loc[current_df["label_name"] == label, column].values[0]
-    current_df.loc[current_df["label_name"] == label, f"last_{column}"] = previous
-    current_df.loc[current_df["label_name"] == label, f"diff_{column}"] = (
-        current - previous
-    )
-    current_df.loc[current_df["label_name"] == label, f"diff_perc_{column}"] = (
-        (current - previous) / previous * 100
-    )
 
 
 def _build_arg_parser():
@@ -90,6 +70,16 @@ def _build_arg_parser():
         "The file should be in the following format: {'section_name': <full_image_path>, ...}",
     )
 
+    parser.add_argument(
+        "--png_compression",
+        type=int,
+        default=6,
+        choices=range(10),
+        metavar="{0-9}",
+        help="PNG compression level of the images of the report, from 0 (fastest)\n"
+        "to 9 (smallest). [%(default)s]",
+    )
+
     add_overwrite_arg(parser)
     add_version_arg(parser)
     return parser
@@ -104,139 +94,24 @@ def main():
     )
     assert_outputs_exist(parser, args, args.output_report)
 
-    # Load the configuration file
-    with open(args.config, "r") as config_file:
-        config = json.load(config_file)
-
-        # Use the configuration as needed
-        title = config["title"]
-        label_name = config["label_name"]
-        label_name = {int(k): v for k, v in label_name.items()}
-        logo = config.get(
-            "logo",
-            "https://www.chumontreal.qc.ca/sites/default/files/logos/logo_crchum_versionlongue_sans_fond.png",
-        )
-        header = config.get("header", "CHUM Research Center")
-
-    current_df = pd.read_json(args.input_volumetry, precise_float=True)
-    current_df.sort_values(by="volume", ascending=False, inplace=True)
-    current_df = current_df.round(15)
-    current_df["date"] = datetime.strptime(args.date_time, "%Y%m%d%H%M%S")
-    current_df["label_name"] = current_df["label_id"].map(label_name)
-
-    report = VolumetryReport(
-        args.patient_name,
-        args.patient_id,
-        datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-        title,
-        logo,
-        header,
-    )
-
-    timepoint_graphs = None
-    if args.previous_timepoint:
-        labels = current_df["label_name"].unique()
-        timepoint_df = pd.read_json(args.previous_timepoint, precise_float=True)
-
-        # Process timepoint data
-        timepoint_df["label_name"] = timepoint_df["label_id"].map(label_name)
-
-        # Get previous timepoint data
-        previous_df = timepoint_df.loc[
-            timepoint_df.groupby("label_name")["date"].idxmax()
-        ]
-
-        # Calculate differences
-        for label in labels:
-            compute_diff_perc(current_df, previous_df, "volume", label)
-            if "volume_icv" in current_df.columns:
-                compute_diff_perc(current_df, previous_df, "volume_icv", label)
-
-        # Generate timepoint graphs
-        all_timepoint_df = pd.concat([timepoint_df, current_df], ignore_index=True)
-        timepoint_graphs = []
-        for label in labels:
-            label_data = all_timepoint_df[
-                all_timepoint_df["label_name"] == label
-            ].sort_values(by="date")
-            plt.figure(figsize=(14, 9))
-            sns.set_theme(style="dark")
-            sns.set_context("talk", font_scale=2)
-            sns.lineplot(
-                data=label_data,
-                x="date",
-                y="volume",
-                marker="o",
-                linewidth=4.5,
-                markersize=12,
-                label=f"{label}",
-                color=[*colors][int(label_data["label_id"].values[0])],
-            )
-            plt.title(
-                f"{label} - Volume Evolution Over Time", fontsize=36, fontweight="bold"
-            )
-            # Set x-ticks at each data point and one in the middle
-            xticks = list(label_data["date"])
-            if len(xticks) > 1:
-                # Calculate the middle point between first and last
-                middle = xticks[0] + (xticks[-1] - xticks[0]) / 2
-                xticks_with_middle = xticks + [middle]
-                xticks_with_middle = sorted(xticks_with_middle)
-                plt.gca().set_xticks(xticks_with_middle)
-            else:
-                plt.gca().set_xticks(xticks)
-            plt.gca().xaxis.set_major_formatter(
-                plt.matplotlib.dates.DateFormatter("%d-%m-%y %H:%M")
-            )
-            plt.xlabel("Date Hour", fontsize=32, fontweight="bold")
-            plt.ylabel("Volume (ml)", fontsize=32, fontweight="bold")
-            plt.xticks(fontsize=30, rotation=45)
-            plt.yticks(fontsize=30)
-            plt.legend(fontsize=30, frameon=True, shadow=True)
-            plt.grid(True, linestyle="--", alpha=0.5)
-            plt.tight_layout()
-
-            mosaic_plot_path = f"{report.temp_dir}/label_{label}_mosaic_evolution.png"
-            plt.savefig(mosaic_plot_path)
-            timepoint_graphs.append(mosaic_plot_path)
-            plt.close()
-    else:
-        all_timepoint_df = current_df.copy()
-
-    screenshot_path = screenshot_mosaic_blend(
-        args.input_volume,
+    config = load_report_config(args.config)
+    create_volumetric_report(
         args.input_labels,
-        nb_rows=3,
-        nb_columns=3,
-        output_prefix="labels",
-        directory=report.temp_dir,
-        min_val=args.min_clip_value,
-        max_val=args.max_clip_value,
+        args.input_volume,
+        args.input_volumetry,
+        args.date_time,
+        config,
+        args.output_report,
+        patient_name=args.patient_name,
+        patient_id=args.patient_id,
+        previous_timepoint=args.previous_timepoint,
+        output_longitudinal=args.output_longitudinal,
+        min_clip_value=args.min_clip_value,
+        max_clip_value=args.max_clip_value,
+        other_screenshots=args.other_screenshots,
+        png_compression=args.png_compression,
     )
 
-    if args.other_screenshots:
-        with open(args.other_screenshots, "r") as f:
-            other_screenshots = json.load(f)
 
-    report.render(
-        current_df.to_dict("records"),
-        screenshot_path,
-        timepoint_graphs,
-        other_screenshots,
-    )
-    report.to_pdf(args.output_report)
-    if args.output_longitudinal:
-        all_timepoint_df.drop(
-            columns=[
-                "label_name",
-                "last_volume",
-                "diff_volume",
-                "diff_perc_volume",
-                "last_volume_icv",
-                "diff_volume_icv",
-                "diff_perc_volume_icv",
-            ],
-            errors="ignore",
-        ).to_json(
-            args.output_longitudinal, orient="records", indent=4, double_precision=15
-        )
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+This script generates volumetric reports in PDF format for many patients.
+
+The reports are listed in a manifest, a .csv file with one report per row or a .json
+file with a list of reports. Each report has the following columns:
+
+    input_labels, input_volume, input_volumetry, date_time, output_report
+
+and optionally:
+
+    patient_name, patient_id, previous_timepoint, output_longitudinal,
+    min_clip_value, max_clip_value, other_screenshots
+
+which are the arguments of avnir_create_volumetric_report. The configuration is
+shared by all the reports. The reports are generated in a pool of processes, which
+load the rendering modules and templates once and reuse them for all their reports.
+
+Example:
+
+    avnir_create_volumetric_report_batch \\
+    manifest.csv \\
+    config.json \\
+    --nb_processes 8
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import logging
+import traceback
+
+from avnirpy.io.utils import (
+    add_overwrite_arg,
+    add_verbose_arg,
+    assert_inputs_exist,
+    assert_outputs_exist,
+    add_version_arg,
+)
+from avnirpy.reporting.volumetric import (
+    create_volumetric_report,
+    load_report_config,
+    read_manifest,
+)
+
+
+def create_report(report, config, png_compression=6):
+    """Generate a report of the manifest.
+
+    Args:
+        report (dict): Arguments of create_volumetric_report.
+        config (dict): Configuration of the reports.
+        png_compression (int, optional): PNG compression level of the images.
+            Defaults to 6.
+
+    Returns:
+        str: The traceback of the error, or None if the report was generated.
+    """
+    try:
+        create_volumetric_report(
+            config=config, png_compression=png_compression, **report
+        )
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def _build_arg_parser():
+    """Build argparser.
+
+    Returns:
+        parser (ArgumentParser): Parser built.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("manifest", help="Path to the .csv or .json manifest.")
+    parser.add_argument("config", help="Path to the .json config file.")
+
+    parser.add_argument(
+        "--nb_processes",
+        type=int,
+        default=1,
+        help="Number of processes used to generate the reports.",
+    )
+
+    parser.add_argument(
+        "--png_compression",
+        type=int,
+        default=6,
+        choices=range(10),
+        metavar="{0-9}",
+        help="PNG compression level of the images of the report, from 0 (fastest)\n"
+        "to 9 (smallest). [%(default)s]",
+    )
+
+    add_overwrite_arg(parser)
+    add_verbose_arg(parser)
+    add_version_arg(parser)
+    return parser
+
+
+def main():
+    parser = _build_arg_parser()
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.getLevelName(args.verbose))
+
+    assert_inputs_exist(parser, [args.manifest, args.config])
+    try:
+        reports = read_manifest(args.manifest)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for report in reports:
+        assert_inputs_exist(
+            parser,
+            [report["input_labels"], report["input_volume"], report["input_volumetry"]],
+            [
+                report[column]
+                for column in ["previous_timepoint", "other_screenshots"]
+                if column in report
+            ],
+        )
+        assert_outputs_exist(
+            parser,
+            args,
+            report["output_report"],
+            report.get("output_longitudinal"),
+        )
+
+    config = load_report_config(args.config)
+    worker = partial(create_report, config=config, png_compression=args.png_compression)
+    if args.nb_processes > 1:
+        with ProcessPoolExecutor(args.nb_processes) as executor:
+            errors = list(executor.map(worker, reports))
+    else:
+        errors = list(map(worker, reports))
+
+    for report, error in zip(reports, errors):
+        if error is not None:
+            logging.error(f"Report {report['output_report']} failed:\n{error}")
+        else:
+            logging.info(f"Report {report['output_report']} generated.")
+
+    nb_errors = sum(error is not None for error in errors)
+    if nb_errors:
+        parser.exit(1, f"{nb_errors} of {len(reports)} reports failed.\n")
+
+
+if __name__ == "__main__":
+    main()
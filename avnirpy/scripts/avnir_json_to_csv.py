@@ -6,7 +6,6 @@ Convert a JSON file to a CSV file using pandas.
 
 import argparse
 import logging
-import pandas as pd
 import json
 from avnirpy.io.utils import add_version_arg
 
@@ -38,6 +37,8 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
+    import pandas as pd
+
     assert_inputs_exist(parser, [args.input_json])
     assert_outputs_exist(parser, args, [args.output_csv])
 
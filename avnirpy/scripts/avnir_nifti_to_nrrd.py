@@ -6,9 +6,6 @@ Convert nifti image to nrrd image.
 
 import argparse
 
-import nibabel as nib
-
-from avnirpy.io.image import load_nifti, write_nrrd
 from avnirpy.io.utils import (
     add_overwrite_arg,
     assert_inputs_exist,
@@ -39,11 +36,12 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
+    from avnirpy.io.image import load_nifti, write_nrrd
+
     assert_inputs_exist(parser, args.input)
     assert_outputs_exist(parser, args, args.output)
 
-    nib.load(args.input)
-    data, _, affine = load_nifti(args.input)
+    data, _, affine = load_nifti(args.input, keep_dtype=True)
     write_nrrd(args.output, data, affine)
 
 
@@ -6,9 +6,6 @@ Convert nrrd image to nifti image.
 
 import argparse
 
-import nibabel as nib
-
-from avnirpy.io.image import load_nrrd
 from avnirpy.io.utils import (
     add_overwrite_arg,
     assert_inputs_exist,
@@ -39,10 +36,13 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
+    import nibabel as nib
+    from avnirpy.io.image import load_nrrd
+
     assert_inputs_exist(parser, args.input)
     assert_outputs_exist(parser, args, args.output)
 
-    data, niiheader, nrrdhearder, affine = load_nrrd(args.input)
+    data, niiheader, nrrdhearder, affine = load_nrrd(args.input, keep_dtype=True)
     img_nifti = nib.nifti1.Nifti1Image(data, affine=affine, header=niiheader)
     nib.save(img_nifti, args.output)
 
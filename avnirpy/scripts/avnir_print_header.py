@@ -8,14 +8,13 @@ import argparse
 import json
 import os
 
-import numpy as np
-
-from avnirpy.io.image import load_nrrd, load_nifti
 from avnirpy.io.utils import assert_inputs_exist, add_version_arg
 
 
 class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
+        import numpy as np
+
         if isinstance(obj, np.ndarray):
             return obj.tolist()
         return super().default(obj)
@@ -45,12 +44,14 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
+    from avnirpy.io.image import load_nifti_header, load_nrrd_header
+
     assert_inputs_exist(parser, args.input)
     if os.path.splitext(os.path.basename(args.input))[1] == ".nrrd":
-        _, _, hdr, _ = load_nrrd(args.input)
+        _, hdr, _ = load_nrrd_header(args.input)
         print(json.dumps(hdr, sort_keys=True, indent=4, cls=NumpyEncoder))
     elif has_nii_gz_extension(args.input):
-        _, hdr, _ = load_nifti(args.input)
+        hdr, _ = load_nifti_header(args.input)
         print(hdr)
     else:
         print("File extension not supported. Please use .nrrd or .nii.gz.")
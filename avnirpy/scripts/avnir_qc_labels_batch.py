@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+"""
+Quality control of many labels in NRRD format from 3DSlicer.
+
+The cases are given as a directory or as a manifest:
+
+    - A directory is searched recursively for 3DSlicer segmentations (*.seg.nrrd).
+      Each segmentation is paired with the volume of the same name (Case.seg.nrrd
+      with Case.nrrd), or with the only other .nrrd file of its folder. The corrected
+      images are written in --output_directory, following the input tree.
+    - A manifest is a .csv file with one case per row, or a .json file with a list
+      of cases. Each case has the columns:
+
+          input_labels, input_volume, output_labels, output_volume
+
+      The output columns are not needed with --check_only.
+
+The config is read once and the cases are checked and corrected in a pool of
+processes, as done by avnir_qc_labels. The QC report of all the cases is written
+to a .json or .csv file, with the failed checks of each case in "messages" and the
+traceback of the cases that could not be processed in "error".
+
+With --check_only, only the headers of the images are read and only the QC report is
+produced, which is enough to triage a large delivery of segmentations.
+
+Example:
+
+    avnir_qc_labels_batch \\
+    export/ \\
+    qc_labels_config.yaml \\
+    qc_report.csv \\
+    --output_directory corrected/ \\
+    --nb_processes 8
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import glob
+import json
+import logging
+import os
+import traceback
+
+from avnirpy.io.utils import (
+    add_overwrite_arg,
+    add_verbose_arg,
+    assert_inputs_exist,
+    assert_outputs_exist,
+    add_version_arg,
+)
+
+MANIFEST_COLUMNS = ["input_labels", "input_volume", "output_labels", "output_volume"]
+
+
+def find_cases(directory, output_directory=None):
+    """Find the 3DSlicer segmentations of a directory and their volume.
+
+    Args:
+        directory (str): Directory searched recursively.
+        output_directory (str, optional): Directory of the corrected images. The
+            outputs are None if not given. Defaults to None.
+
+    Returns:
+        List[dict]: The cases, with the columns of MANIFEST_COLUMNS. The input volume
+        is None if it could not be found. A volume shared by several segmentations
+        is only written by the first one, see deduplicate_output_volumes.
+    """
+    cases = []
+    pattern = os.path.join(directory, "**", "*.seg.nrrd")
+    for input_labels in sorted(glob.glob(pattern, recursive=True)):
+        folder = os.path.dirname(input_labels)
+        input_volume = input_labels[: -len(".seg.nrrd")] + ".nrrd"
+        if not os.path.isfile(input_volume):
+            volumes = [
+                filename
+                for filename in glob.glob(os.path.join(folder, "*.nrrd"))
+                if not filename.endswith(".seg.nrrd")
+            ]
+            input_volume = volumes[0] if len(volumes) == 1 else None
+
+        case = dict.fromkeys(MANIFEST_COLUMNS)
+        case.update({"input_labels": input_labels, "input_volume": input_volume})
+        if output_directory:
+            output_folder = os.path.join(
+                output_directory, os.path.relpath(folder, directory)
+            )
+            case["output_labels"] = os.path.join(
+                output_folder, os.path.basename(input_labels)
+            )
+            if input_volume:
+                case["output_volume"] = os.path.join(
+                    output_folder, os.path.basename(input_volume)
+                )
+        cases.append(case)
+    return deduplicate_output_volumes(cases)
+
+
+def deduplicate_output_volumes(cases):
+    """Let only the first case of each output volume write it.
+
+    The cases are processed concurrently, so several segmentations of a volume (e.g.
+    in the same folder) would otherwise write the same file at the same time.
+
+    Args:
+        cases (List[dict]): The cases, with the columns of MANIFEST_COLUMNS.
+
+    Returns:
+        List[dict]: The cases, with the output volume set to None in the cases
+        after the first one writing it.
+    """
+    written = set()
+    for case in cases:
+        if case["output_volume"] in written:
+            case["output_volume"] = None
+        elif case["output_volume"]:
+            written.add(case["output_volume"])
+    return cases
+
+
+def read_manifest(manifest_file, check_only=False):
+    """Read a manifest of cases.
+
+    Args:
+        manifest_file (str): Path to the .csv or .json manifest.
+        check_only (bool, optional): Do not require the output columns, which are
+            set to None. Defaults to False.
+
+    Returns:
+        List[dict]: The cases, with the columns of MANIFEST_COLUMNS. See
+        deduplicate_output_volumes for the volumes shared by several cases.
+
+    Raises:
+        ValueError: If the manifest is not a .csv or .json file, or if a column is
+            missing.
+    """
+    import csv
+
+    extension = os.path.splitext(manifest_file)[1]
+    if extension == ".csv":
+        with open(manifest_file, "r", newline="") as f:
+            entries = list(csv.DictReader(f))
+    elif extension == ".json":
+        with open(manifest_file, "r") as f:
+            entries = json.load(f)
+    else:
+        raise ValueError("Invalid manifest format. Must be .csv or .json.")
+
+    required = MANIFEST_COLUMNS[:2] if check_only else MANIFEST_COLUMNS
+    cases = []
+    for i, entry in enumerate(entries):
+        missing = [column for column in required if not entry.get(column)]
+        if missing:
+            raise ValueError(
+                f"Entry {i} of the manifest is missing: {', '.join(missing)}."
+            )
+        cases.append(
+            {
+                column: entry[column] if column in required else None
+                for column in MANIFEST_COLUMNS
+            }
+        )
+    return deduplicate_output_volumes(cases)
+
+
+def qc_case(case, labels_in_config, link=False):
+    """Check and correct a case.
+
+    Args:
+        case (dict): The paths of the case, with the columns of MANIFEST_COLUMNS.
+        labels_in_config (dict): The label values of the config.
+        link (bool, optional): Hard link the images that need no correction.
+            Defaults to False.
+
+    Returns:
+        dict: The paths and the QC report of the case.
+    """
+    from avnirpy.segmentation.qc import QC_KEYS, qc_labels
+
+    row = {"input_labels": case["input_labels"], "input_volume": case["input_volume"]}
+    try:
+        if case["input_volume"] is None:
+            raise FileNotFoundError(
+                f"No volume found for {case['input_labels']}. Name it "
+                "<name>.nrrd or keep it alone in the folder of the segmentation."
+            )
+        for output in [case["output_labels"], case["output_volume"]]:
+            if output:
+                os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        report = qc_labels(
+            case["input_labels"],
+            case["input_volume"],
+            labels_in_config,
+            case["output_labels"],
+            case["output_volume"],
+            link,
+        )
+    except Exception:
+        row.update({key: None for key in QC_KEYS})
+        row.update({"messages": [], "error": traceback.format_exc()})
+        return row
+
+    row.update(report)
+    row["error"] = None
+    return row
+
+
+def _build_arg_parser():
+    """Build argparser.
+
+    Returns:
+        parser (ArgumentParser): Parser built.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "input", help="Directory of 3DSlicer exports, or .csv or .json manifest."
+    )
+    parser.add_argument("config", help="Path to the .yaml config file use in 3DSlicer.")
+    parser.add_argument(
+        "output_report", help="Path to the .json or .csv file of the QC report."
+    )
+    parser.add_argument(
+        "--output_directory",
+        help="Directory of the corrected images. Required when the input is a\n"
+        "directory, unless --check_only is used.",
+    )
+    parser.add_argument(
+        "--check_only",
+        action="store_true",
+        help="Only check the headers of the images, without correcting them.",
+    )
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="Hard link the images that need no correction instead of copying them.\n"
+        "The input and output then share their content on disk.",
+    )
+
+    parser.add_argument(
+        "--nb_processes",
+        type=int,
+        default=1,
+        help="Number of processes used to check the cases.",
+    )
+
+    add_overwrite_arg(parser)
+    add_verbose_arg(parser)
+    add_version_arg(parser)
+    return parser
+
+
+def main():
+    parser = _build_arg_parser()
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.getLevelName(args.verbose))
+
+    if os.path.splitext(args.output_report)[1] not in [".json", ".csv"]:
+        parser.error("Invalid report format. Must be .json or .csv.")
+    assert_inputs_exist(parser, [args.config])
+    assert_outputs_exist(parser, args, args.output_report)
+
+    if args.check_only and args.output_directory:
+        parser.error("The corrected images are not written with --check_only.")
+
+    if os.path.isdir(args.input):
+        if not args.output_directory and not args.check_only:
+            parser.error("--output_directory is required when the input is a folder.")
+        cases = find_cases(args.input, args.output_directory)
+    else:
+        assert_inputs_exist(parser, args.input)
+        try:
+            cases = read_manifest(args.input, args.check_only)
+        except ValueError as e:
+            parser.error(str(e))
+        for case in cases:
+            assert_inputs_exist(parser, [case["input_labels"], case["input_volume"]])
+    for case in cases:
+        # The output folders are created when the cases are processed
+        assert_outputs_exist(
+            parser,
+            args,
+            [
+                case[column]
+                for column in ["output_labels", "output_volume"]
+                if case[column]
+            ],
+            check_dir_exists=False,
+        )
+
+    from avnirpy.segmentation.qc import QC_KEYS, load_qc_config
+
+    worker = partial(
+        qc_case, labels_in_config=load_qc_config(args.config), link=args.link
+    )
+    if args.nb_processes > 1:
+        with ProcessPoolExecutor(args.nb_processes) as executor:
+            rows = list(executor.map(worker, cases))
+    else:
+        rows = list(map(worker, cases))
+
+    for row in rows:
+        if row["error"] is not None:
+            logging.error(f"Case {row['input_labels']} failed:\n{row['error']}")
+        else:
+            logging.info(f"Case {row['input_labels']}: global_qc={row['global_qc']}")
+
+    if args.output_report.endswith(".json"):
+        with open(args.output_report, "w") as f:
+            json.dump(rows, f, indent=4)
+    else:
+        from avnirpy.io.results import ResultsWriter
+
+        columns = ["input_labels", "input_volume", *QC_KEYS, "messages", "error"]
+        with ResultsWriter(args.output_report, columns) as writer:
+            writer.write(
+                [{**row, "messages": " | ".join(row["messages"])} for row in rows]
+            )
+
+    nb_errors = sum(row["error"] is not None for row in rows)
+    if nb_errors:
+        parser.exit(1, f"{nb_errors} of {len(rows)} cases failed.\n")
+
+
+if __name__ == "__main__":
+    main()
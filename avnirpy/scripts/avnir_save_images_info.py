@@ -2,27 +2,159 @@
 
 """
 Save images information in a .csv file.
+
+Inputs can be image files, directories (searched recursively for .nrrd and .nii.gz
+images) or glob patterns. Only the image headers are read, and rows are written to
+the .csv file as soon as each header has been read, in the order in which they are
+read. The images whose header cannot be read are reported and left out of the .csv
+file, and the script then exits with a non-zero status.
+
+Example:
+
+    avnir_save_images_info /path/to/archive "/path/to/other/**/*.nrrd" output.csv \\
+    --nb_processes 8
 """
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import glob
+import logging
 import os
 
-import pandas as pd
-
-from avnirpy.io.image import load_nrrd, load_nifti
 from avnirpy.io.utils import (
-    assert_inputs_exist,
     assert_outputs_exist,
     add_version_arg,
     add_overwrite_arg,
 )
 
+COLUMNS = [
+    "Image",
+    "voxel_size x",
+    "voxel_size y",
+    "voxel_size z",
+    "shape x",
+    "shape y",
+    "shape z",
+]
+
 
 def has_nii_gz_extension(filename):
     base, ext = os.path.splitext(filename)
     return ext == ".gz" and os.path.splitext(base)[1] == ".nii"
 
 
+def is_supported_image(filename):
+    return os.path.splitext(filename)[1] == ".nrrd" or has_nii_gz_extension(filename)
+
+
+def find_images(inputs):
+    """Expand the inputs into a list of images.
+
+    Args:
+        inputs (List[str]): Image files, directories or glob patterns.
+
+    Returns:
+        List[str]: Image files. Directories are searched recursively for
+        supported images.
+
+    Raises:
+        FileNotFoundError: If an input does not match any file or directory.
+    """
+    images = []
+    for pattern in inputs:
+        paths = [pattern] if os.path.exists(pattern) else []
+        paths = paths or sorted(glob.glob(pattern, recursive=True))
+        if not paths:
+            raise FileNotFoundError(f"Input {pattern} does not exist.")
+
+        for path in paths:
+            if not os.path.isdir(path):
+                images.append(path)
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                images.extend(
+                    os.path.join(root, f)
+                    for f in sorted(files)
+                    if is_supported_image(f)
+                )
+    return images
+
+
+def get_image_info(image):
+    """Read the voxel size and shape of an image from its header.
+
+    Args:
+        image (str): Path to the .nrrd or .nii.gz image.
+
+    Returns:
+        dict: Row of the report, None if the file extension is not supported.
+    """
+    from avnirpy.io.image import load_nifti_header, load_nrrd_header
+
+    if os.path.splitext(os.path.basename(image))[1] == ".nrrd":
+        hdr, _, _ = load_nrrd_header(image)
+    elif has_nii_gz_extension(image):
+        hdr, _ = load_nifti_header(image)
+    else:
+        return None
+
+    return {
+        "Image": image,
+        "voxel_size x": hdr["pixdim"][1],
+        "voxel_size y": hdr["pixdim"][2],
+        "voxel_size z": hdr["pixdim"][3],
+        "shape x": hdr["dim"][1],
+        "shape y": hdr["dim"][2],
+        "shape z": hdr["dim"][3],
+    }
+
+
+def try_get_image_info(image):
+    """Read the voxel size and shape of an image, without raising on a bad header.
+
+    Args:
+        image (str): Path to the .nrrd or .nii.gz image.
+
+    Returns:
+        str: The image.
+        dict: Row of the report, see get_image_info, or None.
+        str: The error raised while reading the header, or None.
+    """
+    try:
+        return image, get_image_info(image), None
+    except Exception as e:
+        return image, None, f"{type(e).__name__}: {e}"
+
+
+def write_rows(writer, results):
+    """Write the rows to the report as soon as they are available.
+
+    Args:
+        writer (csv.DictWriter): Writer of the .csv report.
+        results (Iterable[Tuple[str, dict, str]]): Images, rows of the report and
+            reading errors, see try_get_image_info.
+
+    Returns:
+        int: Number of images whose header could not be read.
+    """
+    nb_errors = 0
+    for image, row, error in results:
+        if error is not None:
+            logging.error(f"Could not read the header of {image}: {error}")
+            nb_errors += 1
+            continue
+        if row is None:
+            logging.warning(
+                f"File extension not supported for {image}. "
+                "Please use .nrrd or .nii.gz."
+            )
+            continue
+        writer.writerow(row)
+    return nb_errors
+
+
 def _build_arg_parser():
     """Build argparser.
 
@@ -32,9 +164,20 @@ def _build_arg_parser():
     parser = argparse.ArgumentParser(
         description=__doc__, formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument("input", nargs="+", help="Path to the .nrrd or .nii.gz image.")
+    parser.add_argument(
+        "input",
+        nargs="+",
+        help="Path to the .nrrd or .nii.gz image, directory or glob pattern.",
+    )
     parser.add_argument("output", help="Path to the .csv report.")
 
+    parser.add_argument(
+        "--nb_processes",
+        type=int,
+        default=1,
+        help="Number of processes used to read the headers.",
+    )
+
     add_overwrite_arg(parser)
     add_version_arg(parser)
 
@@ -45,39 +188,39 @@ def main():
     parser = _build_arg_parser()
     args = parser.parse_args()
 
-    assert_inputs_exist(parser, args.input)
+    import pandas as pd
+
     assert_outputs_exist(parser, args, args.output)
 
     if not args.output.endswith(".csv"):
         args.output = args.output + ".csv"
 
-    data = []
-    for image in args.input:
-        if os.path.splitext(os.path.basename(image))[1] == ".nrrd":
-            _, hdr, _, _ = load_nrrd(image)
-        elif has_nii_gz_extension(image):
-            _, hdr, _ = load_nifti(image)
+    try:
+        images = find_images(args.input)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+    with open(args.output, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+
+        if args.nb_processes > 1:
+            with ProcessPoolExecutor(args.nb_processes) as executor:
+                futures = [
+                    executor.submit(try_get_image_info, image) for image in images
+                ]
+                nb_errors = write_rows(
+                    writer, (future.result() for future in as_completed(futures))
+                )
         else:
-            print(
-                f"File extension not supported for {image}. Please use .nrrd or .nii.gz."
-            )
+            nb_errors = write_rows(writer, map(try_get_image_info, images))
 
-        data.append(
-            {
-                "Image": image,
-                "voxel_size x": hdr["pixdim"][1],
-                "voxel_size y": hdr["pixdim"][2],
-                "voxel_size z": hdr["pixdim"][3],
-                "shape x": hdr["dim"][1],
-                "shape y": hdr["dim"][2],
-                "shape z": hdr["dim"][3],
-            }
-        )
-
-    df = pd.DataFrame(data)
-    df.to_csv(args.output, index=False)
+    df = pd.read_csv(args.output)
     df.describe().to_csv(args.output.replace(".csv", "_summary.csv"), index=False)
 
+    if nb_errors:
+        parser.exit(1, f"{nb_errors} image(s) could not be read.\n")
+
 
 if __name__ == "__main__":
     main()
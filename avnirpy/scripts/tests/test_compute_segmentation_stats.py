@@ -0,0 +1,237 @@
+import json
+import sys
+
+import nibabel as nib
+import numpy as np
+import pandas as pd
+import pytest
+
+from avnirpy.scripts import avnir_compute_segmentation_stats as script
+
+
+@pytest.fixture
+def metrics_reloaded():
+    """The MetricsReloaded binary pairwise measures."""
+    pairwise_measures = pytest.importorskip("MetricsReloaded.metrics.pairwise_measures")
+    return pairwise_measures.BinaryPairwiseMeasures
+
+
+def _save(filename, data):
+    nib.save(nib.Nifti1Image(data, np.eye(4)), str(filename))
+
+
+@pytest.fixture
+def segmentations(tmp_path):
+    ground_truth = tmp_path / "ground_truth"
+    predictions = tmp_path / "predictions"
+    ground_truth.mkdir()
+    predictions.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(3):
+        reference = np.zeros((12, 12, 12), dtype=np.uint8)
+        reference[2 + i : 7, 3:8, 3:8] = 1
+        reference[8:10, 8:10, 2:9] = 2
+        prediction = reference.copy()
+        prediction[rng.random(reference.shape) < 0.05] = 0
+        _save(ground_truth / f"case{i}.nii.gz", reference)
+        _save(predictions / f"case{i}.nii.gz", prediction)
+    return ground_truth, predictions
+
+
+@pytest.fixture
+def run(monkeypatch, metrics_reloaded, segmentations, tmp_path):
+    """Run the script on the segmentations and count the evaluated cases."""
+    ground_truth, predictions = segmentations
+    evaluated = []
+    process_segmentation = script.process_segmentation
+
+    def counted_process_segmentation(filename, *args, **kwargs):
+        evaluated.append(filename)
+        return process_segmentation(filename, *args, **kwargs)
+
+    monkeypatch.setattr(script, "process_segmentation", counted_process_segmentation)
+
+    def run(*options, output="stats.csv"):
+        evaluated.clear()
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            [
+                "avnir_compute_segmentation_stats",
+                str(ground_truth),
+                str(predictions),
+                str(tmp_path / output),
+                *options,
+            ],
+        )
+        script.main()
+        return sorted(evaluated)
+
+    return run
+
+
+def test_incremental_rerun(run, tmp_path):
+    options = ["--measures", "fbeta", "hd", "--incremental"]
+
+    first = run(*options)
+    results = pd.read_csv(tmp_path / "stats.csv")
+    second = run(*options)
+
+    assert first == ["case0.nii.gz", "case1.nii.gz", "case2.nii.gz"]
+    assert second == []
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "stats.csv").sort_values("image", ignore_index=True),
+        results.sort_values("image", ignore_index=True),
+    )
+
+
+@pytest.mark.parametrize("fingerprint", ["mtime", "hash"])
+def test_incremental_changed_file(run, segmentations, tmp_path, fingerprint):
+    _, predictions = segmentations
+    options = ["--measures", "fbeta", "--incremental", "--fingerprint", fingerprint]
+    run(*options)
+
+    _save(predictions / "case1.nii.gz", np.zeros((12, 12, 12), dtype=np.uint8))
+    evaluated = run(*options)
+
+    results = pd.read_csv(tmp_path / "stats.csv").set_index("image")
+    assert evaluated == ["case1.nii.gz"]
+    assert len(results) == 3
+    assert results.loc["case1.nii.gz", "fbeta"] == 0
+
+
+def test_incremental_changed_settings(run):
+    run("--measures", "fbeta", "--incremental")
+
+    evaluated = run("--measures", "fbeta", "iou", "--incremental")
+
+    assert evaluated == ["case0.nii.gz", "case1.nii.gz", "case2.nii.gz"]
+
+
+def test_incremental_interrupted_run(run, tmp_path):
+    options = ["--measures", "fbeta", "--incremental", "--multilabel"]
+    run(*options)
+    results = pd.read_csv(tmp_path / "stats_all.csv")
+    # Simulate a run killed after writing the rows of a single segmentation
+    results.iloc[:1].to_csv(tmp_path / "stats_all.csv", index=False)
+
+    evaluated = run(*options)
+
+    assert len(evaluated) == 2
+    assert sorted(pd.read_csv(tmp_path / "stats_all.csv")["image"]) == [
+        "case0.nii.gz",
+        "case1.nii.gz",
+        "case2.nii.gz",
+    ]
+    multilabel = pd.read_csv(tmp_path / "stats_multilabel.csv")
+    assert len(multilabel) == 6
+    assert not multilabel.duplicated(["image", "label"]).any()
+    assert run(*options) == []
+
+
+def test_incremental_parquet(run, tmp_path):
+    pytest.importorskip("pyarrow")
+    options = ["--measures", "fbeta", "--incremental"]
+    run(*options, output="stats.parquet")
+
+    assert run(*options, output="stats.parquet") == []
+    assert len(pd.read_parquet(tmp_path / "stats.parquet")) == 3
+
+
+def test_incremental_resume_appends(run, tmp_path):
+    options = ["--measures", "fbeta", "--incremental"]
+    run(*options)
+    results = pd.read_csv(tmp_path / "stats.csv")
+    results.iloc[:1].to_csv(tmp_path / "stats.csv", index=False)
+    first_row = (tmp_path / "stats.csv").read_text()
+
+    evaluated = run(*options)
+
+    resumed = (tmp_path / "stats.csv").read_text()
+    assert len(evaluated) == 2
+    assert resumed.startswith(first_row)
+    assert len(pd.read_csv(tmp_path / "stats.csv")) == 3
+
+
+def test_invalid_segmentation(run, segmentations, tmp_path, caplog):
+    _, predictions = segmentations
+    _save(predictions / "case1.nii.gz", np.full((12, 12, 12), 0.5, dtype=np.float32))
+    options = ["--measures", "fbeta", "--incremental"]
+
+    with pytest.raises(SystemExit) as exit_info:
+        run(*options)
+
+    assert exit_info.value.code == 1
+    assert "Could not evaluate case1.nii.gz" in caplog.text
+    assert sorted(pd.read_csv(tmp_path / "stats.csv")["image"]) == [
+        "case0.nii.gz",
+        "case2.nii.gz",
+    ]
+    # The invalid segmentation is left out of the state, to be evaluated again
+    state = json.loads((tmp_path / "stats_state.json").read_text())
+    assert sorted(state["files"]) == ["case0.nii.gz", "case2.nii.gz"]
+
+
+def test_process_segmentation_full_image_measures(metrics_reloaded, segmentations):
+    ground_truth, predictions = segmentations
+    reference = np.asanyarray(nib.load(ground_truth / "case0.nii.gz").dataobj)
+    prediction = np.asanyarray(nib.load(predictions / "case0.nii.gz").dataobj)
+
+    results = script.process_segmentation(
+        "case0.nii.gz",
+        str(ground_truth),
+        str(predictions),
+        ["cohens_kappa", "boundary_iou"],
+        multilabel=True,
+    )
+
+    for row in results:
+        label = row["label"]
+        pred = prediction > 0 if label == "all" else prediction == label
+        ref = reference > 0 if label == "all" else reference == label
+        full = metrics_reloaded(
+            pred.astype(int), ref.astype(int), measures=["cohens_kappa"]
+        ).to_dict_meas()["cohens_kappa"]
+        assert row["cohens_kappa"] == pytest.approx(full)
+
+    # The true negatives of the bounding box give another value
+    crop = (slice(1, 8), slice(2, 9), slice(2, 9))
+    cropped = metrics_reloaded(
+        (prediction[crop] == 1).astype(int),
+        (reference[crop] == 1).astype(int),
+        measures=["cohens_kappa"],
+    ).to_dict_meas()["cohens_kappa"]
+    assert results[1]["cohens_kappa"] != pytest.approx(cropped)
+
+
+def test_backends(monkeypatch, metrics_reloaded, segmentations, tmp_path):
+    ground_truth, predictions = segmentations
+    results = {}
+    for backend in ["thread", "process"]:
+        output = tmp_path / f"stats_{backend}.csv"
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            [
+                "avnir_compute_segmentation_stats",
+                str(ground_truth),
+                str(predictions),
+                str(output),
+                "--measures",
+                "fbeta",
+                "hd",
+                "cohens_kappa",
+                "--multilabel",
+                "--nb_threads",
+                "2",
+                "--backend",
+                backend,
+            ],
+        )
+        script.main()
+        results[backend] = pd.read_csv(
+            tmp_path / f"stats_{backend}_multilabel.csv"
+        ).sort_values(["image", "label"], ignore_index=True)
+
+    assert len(results["thread"]) == 6
+    pd.testing.assert_frame_equal(results["thread"], results["process"])
@@ -0,0 +1,46 @@
+import sys
+
+import numpy as np
+
+from avnirpy.io.image import write_nrrd
+from avnirpy.scripts import avnir_qc_labels as script
+
+
+def test_main_console_report(monkeypatch, tmp_path, capsys):
+    header = {
+        "Segment0_ID": "Segment_0",
+        "Segment0_Name": "ICH",
+        "Segment0_LabelValue": "1",
+        "Segment0_Extent": "0 2 0 2 0 2",
+        "Segment1_ID": "Segment_1",
+        "Segment1_Name": "IVH",
+        "Segment1_LabelValue": "2",
+        "Segment1_Extent": "0 2 0 2 0 2",
+    }
+    label_data = np.zeros((3, 3, 3), dtype=np.uint8)
+    label_data[0] = 1
+    label_data[1] = 2
+    write_nrrd(str(tmp_path / "labels.seg.nrrd"), label_data, np.eye(4), header)
+    write_nrrd(str(tmp_path / "volume.nrrd"), np.zeros((3, 3, 3)), np.eye(4), {})
+    config = tmp_path / "config.yaml"
+    config.write_text("labels:\n  - name: ICH\n    value: 1\n")
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "avnir_qc_labels",
+            str(tmp_path / "labels.seg.nrrd"),
+            str(tmp_path / "volume.nrrd"),
+            str(config),
+            "--check_only",
+            "-v",
+        ],
+    )
+
+    script.main()
+
+    # Same keys as the console report of previous versions
+    assert capsys.readouterr().out.strip().endswith(
+        "QC report: global=False, extent=True, space=True, labels=False, "
+        "qc_nb_labels=False"
+    )
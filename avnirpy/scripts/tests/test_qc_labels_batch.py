@@ -0,0 +1,244 @@
+import json
+import os
+import sys
+
+import nrrd
+import numpy as np
+import pandas as pd
+import pytest
+
+from avnirpy.io.image import write_nrrd
+from avnirpy.scripts import avnir_qc_labels_batch as script
+
+
+def _write_case(folder, labels_name, volume_names, segments=(("ICH", 1),)):
+    folder.mkdir(parents=True, exist_ok=True)
+    label_data = np.zeros((3, 3, 3), dtype=np.uint8)
+    header = {}
+    for i, (name, value) in enumerate(segments):
+        label_data[i] = value
+        header[f"Segment{i}_ID"] = f"Segment_{i}"
+        header[f"Segment{i}_Name"] = name
+        header[f"Segment{i}_LabelValue"] = str(value)
+        header[f"Segment{i}_Extent"] = "0 2 0 2 0 2"
+    write_nrrd(str(folder / labels_name), label_data, np.eye(4), header)
+    for volume_name in volume_names:
+        write_nrrd(str(folder / volume_name), np.full((3, 3, 3), 40.0), np.eye(4), {})
+
+
+@pytest.fixture
+def export(tmp_path):
+    export = tmp_path / "export"
+    _write_case(export / "case1", "Case1.seg.nrrd", ["Case1.nrrd", "Other.nrrd"])
+    _write_case(export / "case2", "labels.seg.nrrd", ["ct.nrrd"], [("ivh_2", 1)])
+    return export
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        "labels:\n  - name: ICH\n    value: 1\n  - name: IVH\n    value: 2\n"
+    )
+    return config
+
+
+def test_find_cases(export, tmp_path):
+    cases = script.find_cases(str(export), str(tmp_path / "corrected"))
+
+    assert cases == [
+        {
+            "input_labels": str(export / "case1" / "Case1.seg.nrrd"),
+            "input_volume": str(export / "case1" / "Case1.nrrd"),
+            "output_labels": str(tmp_path / "corrected" / "case1" / "Case1.seg.nrrd"),
+            "output_volume": str(tmp_path / "corrected" / "case1" / "Case1.nrrd"),
+        },
+        {
+            "input_labels": str(export / "case2" / "labels.seg.nrrd"),
+            "input_volume": str(export / "case2" / "ct.nrrd"),
+            "output_labels": str(tmp_path / "corrected" / "case2" / "labels.seg.nrrd"),
+            "output_volume": str(tmp_path / "corrected" / "case2" / "ct.nrrd"),
+        },
+    ]
+
+
+def test_find_cases_ambiguous_volume(export):
+    _write_case(export / "case3", "labels.seg.nrrd", ["a.nrrd", "b.nrrd"])
+
+    cases = script.find_cases(str(export))
+
+    assert cases[2]["input_labels"] == str(export / "case3" / "labels.seg.nrrd")
+    assert cases[2]["input_volume"] is None
+    assert all(
+        case["output_labels"] is None and case["output_volume"] is None
+        for case in cases
+    )
+
+
+def test_find_cases_shared_volume(tmp_path):
+    export = tmp_path / "export"
+    _write_case(export / "case", "ich.seg.nrrd", ["ct.nrrd"])
+    _write_case(export / "case", "ivh.seg.nrrd", [], [("IVH", 2)])
+
+    cases = script.find_cases(str(export), str(tmp_path / "corrected"))
+
+    assert [case["input_volume"] for case in cases] == [
+        str(export / "case" / "ct.nrrd")
+    ] * 2
+    assert [case["output_volume"] for case in cases] == [
+        str(tmp_path / "corrected" / "case" / "ct.nrrd"),
+        None,
+    ]
+
+
+def test_main_shared_volume(monkeypatch, config, tmp_path):
+    export = tmp_path / "export"
+    _write_case(export / "case", "ich.seg.nrrd", ["ct.nrrd"])
+    _write_case(export / "case", "ivh.seg.nrrd", [], [("IVH", 2)])
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "avnir_qc_labels_batch",
+            str(export),
+            str(config),
+            str(tmp_path / "report.json"),
+            "--output_directory",
+            str(tmp_path / "corrected"),
+            "--nb_processes",
+            "2",
+        ],
+    )
+
+    script.main()
+
+    rows = json.loads((tmp_path / "report.json").read_text())
+    assert [row["error"] for row in rows] == [None, None]
+    volume, _ = nrrd.read(str(tmp_path / "corrected" / "case" / "ct.nrrd"))
+    assert np.array_equal(volume, np.full((3, 3, 3), 40))
+    for name in ["ich.seg.nrrd", "ivh.seg.nrrd"]:
+        assert os.path.isfile(tmp_path / "corrected" / "case" / name)
+
+
+@pytest.mark.parametrize("extension", [".csv", ".json"])
+def test_read_manifest_missing_column(tmp_path, extension):
+    manifest = tmp_path / f"manifest{extension}"
+    entry = {"input_labels": "a.seg.nrrd", "input_volume": "a.nrrd"}
+    if extension == ".csv":
+        pd.DataFrame([entry]).to_csv(manifest, index=False)
+    else:
+        manifest.write_text(json.dumps([entry]))
+
+    with pytest.raises(ValueError, match="output_labels, output_volume"):
+        script.read_manifest(str(manifest))
+
+
+def test_read_manifest_check_only(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    pd.DataFrame(
+        [
+            {"input_labels": "a.seg.nrrd", "input_volume": "a.nrrd"},
+            {
+                "input_labels": "b.seg.nrrd",
+                "input_volume": "b.nrrd",
+                "output_labels": "out/b.seg.nrrd",
+                "output_volume": "out/b.nrrd",
+            },
+        ]
+    ).to_csv(manifest, index=False)
+
+    cases = script.read_manifest(str(manifest), check_only=True)
+
+    assert cases == [
+        {
+            "input_labels": "a.seg.nrrd",
+            "input_volume": "a.nrrd",
+            "output_labels": None,
+            "output_volume": None,
+        },
+        {
+            "input_labels": "b.seg.nrrd",
+            "input_volume": "b.nrrd",
+            "output_labels": None,
+            "output_volume": None,
+        },
+    ]
+    pd.DataFrame([{"input_labels": "a.seg.nrrd"}]).to_csv(manifest, index=False)
+    with pytest.raises(ValueError, match="input_volume"):
+        script.read_manifest(str(manifest), check_only=True)
+
+
+def test_qc_case_error(export):
+    case = dict.fromkeys(script.MANIFEST_COLUMNS)
+    case["input_labels"] = str(export / "case1" / "Case1.seg.nrrd")
+
+    row = script.qc_case(case, {"ICH": 1})
+
+    assert row["input_labels"] == case["input_labels"]
+    assert row["input_volume"] is None
+    assert row["global_qc"] is None
+    assert row["messages"] == []
+    assert "FileNotFoundError" in row["error"]
+    json.dumps(row)
+
+
+@pytest.mark.parametrize("nb_processes", ["1", "2"])
+def test_main(monkeypatch, export, config, tmp_path, nb_processes):
+    report = tmp_path / "report.csv"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "avnir_qc_labels_batch",
+            str(export),
+            str(config),
+            str(report),
+            "--output_directory",
+            str(tmp_path / "corrected"),
+            "--nb_processes",
+            nb_processes,
+        ],
+    )
+
+    script.main()
+
+    rows = pd.read_csv(report)
+    assert list(rows["input_labels"]) == [
+        str(export / "case1" / "Case1.seg.nrrd"),
+        str(export / "case2" / "labels.seg.nrrd"),
+    ]
+    assert list(rows["global_qc"]) == [True, True]
+    assert rows["error"].isna().all()
+    labels, header = nrrd.read(
+        str(tmp_path / "corrected" / "case2" / "labels.seg.nrrd")
+    )
+    assert header["Segment0_Name"] == "IVH"
+    assert np.array_equal(labels[0], np.full((3, 3), 2))
+    assert os.path.isfile(tmp_path / "corrected" / "case1" / "Case1.nrrd")
+
+
+def test_main_errors(monkeypatch, export, config, tmp_path):
+    _write_case(export / "case3", "labels.seg.nrrd", ["a.nrrd", "b.nrrd"])
+    report = tmp_path / "report.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "avnir_qc_labels_batch",
+            str(export),
+            str(config),
+            str(report),
+            "--check_only",
+            "--nb_processes",
+            "2",
+        ],
+    )
+
+    with pytest.raises(SystemExit) as exit_info:
+        script.main()
+
+    assert exit_info.value.code == 1
+    rows = json.loads(report.read_text())
+    assert [row["global_qc"] for row in rows] == [True, True, None]
+    assert "FileNotFoundError" in rows[2]["error"]
+    assert not (tmp_path / "corrected").exists()
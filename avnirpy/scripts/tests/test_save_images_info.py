@@ -0,0 +1,137 @@
+import csv
+import io
+import sys
+
+import nibabel as nib
+import numpy as np
+import pandas as pd
+import pytest
+
+from avnirpy.io.image import write_nrrd
+from avnirpy.scripts import avnir_save_images_info as script
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = tmp_path / "archive"
+    (archive / "patient1").mkdir(parents=True)
+    (archive / "patient2").mkdir()
+    nib.save(
+        nib.Nifti1Image(np.zeros((4, 5, 6), dtype=np.uint8), np.diag([1, 2, 3, 1])),
+        str(archive / "patient1" / "t1.nii.gz"),
+    )
+    write_nrrd(
+        str(archive / "patient2" / "ct.nrrd"),
+        np.zeros((7, 8, 9), dtype=np.int16),
+        np.eye(4),
+    )
+    (archive / "patient2" / "notes.txt").write_text("not an image")
+    return archive
+
+
+def test_find_images_directory(archive):
+    images = script.find_images([str(archive)])
+
+    assert images == [
+        str(archive / "patient1" / "t1.nii.gz"),
+        str(archive / "patient2" / "ct.nrrd"),
+    ]
+
+
+def test_find_images_glob(archive):
+    images = script.find_images(
+        [str(archive / "**" / "*.nrrd"), str(archive / "patient1" / "t1.nii.gz")]
+    )
+
+    assert images == [
+        str(archive / "patient2" / "ct.nrrd"),
+        str(archive / "patient1" / "t1.nii.gz"),
+    ]
+
+
+def test_find_images_missing(archive):
+    with pytest.raises(FileNotFoundError):
+        script.find_images([str(archive / "*.mha")])
+
+
+def test_try_get_image_info_corrupt(tmp_path):
+    image = tmp_path / "corrupt.nrrd"
+    image.write_bytes(b"not a nrrd header")
+
+    path, row, error = script.try_get_image_info(str(image))
+
+    assert path == str(image)
+    assert row is None
+    assert error
+
+
+def test_write_rows_unsupported_extension(caplog):
+    file = io.StringIO()
+    writer = csv.DictWriter(file, fieldnames=script.COLUMNS)
+
+    nb_errors = script.write_rows(
+        writer, [("image.mha", None, None), ("corrupt.nrrd", None, "Error: bad")]
+    )
+
+    assert nb_errors == 1
+    assert file.getvalue() == ""
+    assert "File extension not supported for image.mha" in caplog.text
+    assert "Could not read the header of corrupt.nrrd" in caplog.text
+
+
+def _run(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["avnir_save_images_info", *args])
+    script.main()
+
+
+def test_main(monkeypatch, archive, tmp_path):
+    _run(monkeypatch, str(archive), str(tmp_path / "info.csv"))
+
+    assert len(pd.read_csv(tmp_path / "info.csv")) == 2
+    assert (tmp_path / "info_summary.csv").is_file()
+
+
+@pytest.mark.parametrize("nb_processes", ["1", "2"])
+def test_main_corrupt_image(monkeypatch, archive, tmp_path, caplog, nb_processes):
+    (archive / "patient2" / "corrupt.nrrd").write_bytes(b"not a nrrd header")
+
+    with pytest.raises(SystemExit) as exit_info:
+        _run(
+            monkeypatch,
+            str(archive),
+            str(tmp_path / "info.csv"),
+            "--nb_processes",
+            nb_processes,
+        )
+
+    assert exit_info.value.code == 1
+    assert "corrupt.nrrd" in caplog.text
+    assert len(pd.read_csv(tmp_path / "info.csv")) == 2
+    assert (tmp_path / "info_summary.csv").is_file()
+
+
+def test_main_processes(monkeypatch, archive, tmp_path):
+    (archive / "patient2" / "corrupt.nrrd").write_bytes(b"not a nrrd header")
+
+    for output, nb_processes in [("serial.csv", "1"), ("parallel.csv", "2")]:
+        with pytest.raises(SystemExit):
+            _run(
+                monkeypatch,
+                str(archive),
+                str(tmp_path / output),
+                "--nb_processes",
+                nb_processes,
+            )
+
+    # The parallel rows are written in the order in which the headers are read
+    serial = pd.read_csv(tmp_path / "serial.csv")
+    parallel = pd.read_csv(tmp_path / "parallel.csv")
+    pd.testing.assert_frame_equal(
+        serial, parallel.sort_values("Image", ignore_index=True)
+    )
+    assert list(serial["Image"]) == [
+        str(archive / "patient1" / "t1.nii.gz"),
+        str(archive / "patient2" / "ct.nrrd"),
+    ]
+    assert list(serial["voxel_size y"]) == [2.0, 1.0]
+    assert list(serial["shape z"]) == [6, 9]
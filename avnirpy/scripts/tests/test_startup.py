@@ -0,0 +1,78 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPTS = sorted(
+    os.path.splitext(os.path.basename(script))[0]
+    for script in glob.glob(
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), "avnir_*.py")
+    )
+)
+
+# Modules that must only be imported once the arguments are parsed
+HEAVY_MODULES = [
+    "MetricsReloaded",
+    "matplotlib",
+    "nibabel",
+    "nrrd",
+    "numpy",
+    "pandas",
+    "scipy",
+    "seaborn",
+    "weasyprint",
+]
+
+# Budget, in seconds, to import and run a script with --help or --version. The timing
+# depends on the load of the machine, so it is only checked when
+# AVNIRPY_STARTUP_BUDGET is set, e.g. AVNIRPY_STARTUP_BUDGET=1.0.
+STARTUP_BUDGET = os.environ.get("AVNIRPY_STARTUP_BUDGET")
+
+RUN_SCRIPT = """
+import importlib, json, sys, time
+
+start = time.perf_counter()
+sys.argv = [{script!r}, {option!r}]
+code = None
+try:
+    importlib.import_module("avnirpy.scripts." + {script!r}).main()
+except SystemExit as e:
+    code = e.code
+duration = time.perf_counter() - start
+heavy = [module for module in {heavy!r} if module in sys.modules]
+print(json.dumps({{"code": code, "duration": duration, "heavy": heavy}}))
+"""
+
+
+def run_script(script, option):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            RUN_SCRIPT.format(script=script, option=option, heavy=HEAVY_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("option", ["--help", "--version"])
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_startup(script, option):
+    result = run_script(script, option)
+
+    assert result["code"] in [0, None]
+    assert result["heavy"] == []
+
+
+@pytest.mark.skipif(STARTUP_BUDGET is None, reason="AVNIRPY_STARTUP_BUDGET not set")
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_startup_duration(script):
+    result = run_script(script, "--help")
+
+    assert result["duration"] < float(STARTUP_BUDGET)
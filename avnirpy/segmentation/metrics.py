@@ -0,0 +1,489 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import ndimage
+
+from avnirpy.segmentation.utils import as_integer_labels
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Divide element-wise, returning NaN where the denominator is 0.
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def _numb_ref(tp, fp, fn, tn, dict_args):
+    return tp + fn
+
+
+def _numb_pred(tp, fp, fn, tn, dict_args):
+    return tp + fp
+
+
+def _numb_tp(tp, fp, fn, tn, dict_args):
+    return tp
+
+
+def _numb_fp(tp, fp, fn, tn, dict_args):
+    return fp
+
+
+def _numb_fn(tp, fp, fn, tn, dict_args):
+    return fn
+
+
+def _accuracy(tp, fp, fn, tn, dict_args):
+    return _divide(tp + tn, tp + fp + fn + tn)
+
+
+def _sensitivity(tp, fp, fn, tn, dict_args):
+    return _divide(tp, tp + fn)
+
+
+def _specificity(tp, fp, fn, tn, dict_args):
+    return _divide(tn, tn + fp)
+
+
+def _ppv(tp, fp, fn, tn, dict_args):
+    return _divide(tp, tp + fp)
+
+
+def _npv(tp, fp, fn, tn, dict_args):
+    return _divide(tn, tn + fn)
+
+
+def _balanced_accuracy(tp, fp, fn, tn, dict_args):
+    return (
+        _sensitivity(tp, fp, fn, tn, dict_args)
+        + _specificity(tp, fp, fn, tn, dict_args)
+    ) / 2
+
+
+def _youden_index(tp, fp, fn, tn, dict_args):
+    return (
+        _sensitivity(tp, fp, fn, tn, dict_args)
+        + _specificity(tp, fp, fn, tn, dict_args)
+        - 1
+    )
+
+
+def _iou(tp, fp, fn, tn, dict_args):
+    return _divide(tp, tp + fp + fn)
+
+
+def _fbeta(tp, fp, fn, tn, dict_args):
+    beta2 = dict_args.get("beta", 1) ** 2
+    tp, fp, fn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn))
+    # Written with the counts so that a prediction without any true positive is 0
+    fbeta = _divide((1 + beta2) * tp, (1 + beta2) * tp + beta2 * fn + fp)
+    # Same convention as MetricsReloaded: an empty reference and an empty prediction
+    # is a perfect match.
+    return np.where(tp + fp + fn == 0, 1.0, fbeta)
+
+
+def _dsc(tp, fp, fn, tn, dict_args):
+    return _fbeta(tp, fp, fn, tn, {"beta": 1})
+
+
+def _mcc(tp, fp, fn, tn, dict_args):
+    tp, fp, fn, tn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn, tn))
+    denominator = np.sqrt((tp + fp) * (tp + fn) * (tn + fp) * (tn + fn))
+    return _divide(tp * tn - fp * fn, denominator)
+
+
+# Measures derived from the confusion counts, named as in MetricsReloaded
+OVERLAP_MEASURES = {
+    "numb_ref": _numb_ref,
+    "numb_pred": _numb_pred,
+    "numb_tp": _numb_tp,
+    "numb_fp": _numb_fp,
+    "numb_fn": _numb_fn,
+    "accuracy": _accuracy,
+    "balanced_accuracy": _balanced_accuracy,
+    "youden_ind": _youden_index,
+    "sensitivity": _sensitivity,
+    "specificity": _specificity,
+    "ppv": _ppv,
+    "npv": _npv,
+    "iou": _iou,
+    "dsc": _dsc,
+    "fbeta": _fbeta,
+    "mcc": _mcc,
+}
+
+
+class SurfaceDistances:
+    """
+    Borders of a reference and a predicted binary mask and the distances between
+    them. They are computed once, on first use, and shared by all distance measures.
+    """
+
+    def __init__(self, reference, prediction, spacing=None, connectivity=1):
+        """
+        Args:
+            reference (np.ndarray): The reference binary mask.
+            prediction (np.ndarray): The predicted binary mask.
+            spacing (Tuple[float, ...], optional): The voxel size. Distances are in
+                voxels if None. Defaults to None.
+            connectivity (int, optional): The connectivity used to extract the borders.
+                Defaults to 1.
+        """
+        self.reference = np.asarray(reference, dtype=bool)
+        self.prediction = np.asarray(prediction, dtype=bool)
+        self.spacing = spacing
+        self.connectivity = connectivity
+        self._borders = None
+        self._distances = None
+
+    @property
+    def is_empty(self):
+        """True if both masks are empty."""
+        return not self.reference.any() and not self.prediction.any()
+
+    def borders(self):
+        """
+        Returns:
+            np.ndarray: The border of the reference mask.
+            np.ndarray: The border of the predicted mask.
+        """
+        if self._borders is None:
+            structure = ndimage.generate_binary_structure(
+                self.reference.ndim, self.connectivity
+            )
+            self._borders = tuple(
+                mask & ~ndimage.binary_erosion(mask, structure)
+                for mask in (self.reference, self.prediction)
+            )
+        return self._borders
+
+    def distances(self):
+        """
+        Returns:
+            np.ndarray: The distance from each reference border voxel to the predicted
+            border.
+            np.ndarray: The distance from each predicted border voxel to the reference
+            border.
+        """
+        if self._distances is None:
+            reference_border, prediction_border = self.borders()
+            if not reference_border.any() or not prediction_border.any():
+                self._distances = (
+                    np.full(np.count_nonzero(reference_border), np.inf),
+                    np.full(np.count_nonzero(prediction_border), np.inf),
+                )
+            else:
+                to_reference = ndimage.distance_transform_edt(
+                    ~reference_border, sampling=self.spacing
+                )
+                to_prediction = ndimage.distance_transform_edt(
+                    ~prediction_border, sampling=self.spacing
+                )
+                self._distances = (
+                    to_prediction[reference_border],
+                    to_reference[prediction_border],
+                )
+        return self._distances
+
+
+def _hd(surface, dict_args):
+    if surface.is_empty:
+        return 0.0
+    reference_distances, prediction_distances = surface.distances()
+    if not reference_distances.size or not prediction_distances.size:
+        return np.nan
+    return max(reference_distances.max(), prediction_distances.max())
+
+
+def _hd_perc(surface, dict_args):
+    if surface.is_empty:
+        return 0.0
+    reference_distances, prediction_distances = surface.distances()
+    if not reference_distances.size or not prediction_distances.size:
+        return np.nan
+    perc = dict_args.get("hd_perc", 95)
+    return max(
+        np.percentile(reference_distances, perc),
+        np.percentile(prediction_distances, perc),
+    )
+
+
+def _masd(surface, dict_args):
+    if surface.is_empty:
+        return 0.0
+    reference_distances, prediction_distances = surface.distances()
+    if not reference_distances.size or not prediction_distances.size:
+        return np.nan
+    return 0.5 * (reference_distances.mean() + prediction_distances.mean())
+
+
+def _assd(surface, dict_args):
+    if surface.is_empty:
+        return 0.0
+    reference_distances, prediction_distances = surface.distances()
+    if not reference_distances.size or not prediction_distances.size:
+        return np.nan
+    return (reference_distances.sum() + prediction_distances.sum()) / (
+        reference_distances.size + prediction_distances.size
+    )
+
+
+def _nsd(surface, dict_args):
+    # Unlike the other distance measures, NSD is not set to its best value when both
+    # masks are empty: there is no border voxel to normalise by, so it is NaN and the
+    # case is left out of the summaries.
+    reference_distances, prediction_distances = surface.distances()
+    tau = dict_args.get("nsd", 1)
+    return _divide(
+        np.count_nonzero(reference_distances <= tau)
+        + np.count_nonzero(prediction_distances <= tau),
+        reference_distances.size + prediction_distances.size,
+    ).item()
+
+
+# Measures derived from the label borders, named as in MetricsReloaded
+DISTANCE_MEASURES = {
+    "hd": _hd,
+    "hd_perc": _hd_perc,
+    "masd": _masd,
+    "assd": _assd,
+    "nsd": _nsd,
+}
+
+
+# MetricsReloaded measures that only depend on the masks around their borders, and so
+# have the same value on the bounding box of the labels as on the full image. The
+# other measures, e.g. cohens_kappa or net_benefit, depend on the true negatives.
+CROP_INVARIANT_MEASURES = ["boundary_iou", "cldice"]
+
+
+def joint_histogram(
+    reference: np.ndarray, prediction: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count the voxels of each (reference label, prediction label) pair in one pass.
+
+    Args:
+        reference (np.ndarray): The reference label array.
+        prediction (np.ndarray): The predicted label array.
+
+    Returns:
+        np.ndarray: The label values indexing both axes of the histogram.
+        np.ndarray: The histogram. Rows are reference labels and columns are
+        prediction labels.
+
+    Raises:
+        ValueError: If the shapes differ or if a label is not an integer.
+    """
+    if reference.shape != prediction.shape:
+        raise ValueError("Reference and prediction must have the same shape.")
+
+    reference = as_integer_labels(reference).ravel()
+    prediction = as_integer_labels(prediction).ravel()
+
+    if reference.size == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros((1, 1), dtype=np.int64)
+
+    min_label = min(reference.min(), prediction.min())
+    nb_labels = int(max(reference.max(), prediction.max())) + 1
+    if min_label < 0 or nb_labels**2 > reference.size:
+        # Sparse or negative label values: index the histogram by rank instead
+        labels, inverse = np.unique(
+            np.concatenate((reference, prediction)), return_inverse=True
+        )
+        nb_labels = len(labels)
+        reference = inverse[: reference.size]
+        prediction = inverse[reference.size :]
+    else:
+        labels = np.arange(nb_labels)
+
+    histogram = np.bincount(
+        reference.astype(np.int64) * nb_labels + prediction,
+        minlength=nb_labels**2,
+    ).reshape((nb_labels, nb_labels))
+    return labels, histogram
+
+
+def confusion_counts(
+    labels: np.ndarray, histogram: np.ndarray
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Derive the confusion counts of every reference label from a joint histogram.
+
+    Args:
+        labels (np.ndarray): The label values indexing the histogram.
+        histogram (np.ndarray): The joint histogram from `joint_histogram`.
+
+    Returns:
+        np.ndarray: The non-zero labels present in the reference.
+        Dict[str, np.ndarray]: The true positive ("tp"), false positive ("fp"), false
+        negative ("fn") and true negative ("tn") counts of each label.
+    """
+    tp = np.diag(histogram)
+    nb_ref = histogram.sum(axis=1)
+    nb_pred = histogram.sum(axis=0)
+    keep = (labels != 0) & (nb_ref > 0)
+
+    tp = tp[keep]
+    fp = nb_pred[keep] - tp
+    fn = nb_ref[keep] - tp
+    tn = histogram.sum() - tp - fp - fn
+    return labels[keep], {"tp": tp, "fp": fp, "fn": fn, "tn": tn}
+
+
+def foreground_confusion_counts(
+    labels: np.ndarray, histogram: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Derive the confusion counts of the foreground (all non-zero labels) from a joint
+    histogram.
+
+    Args:
+        labels (np.ndarray): The label values indexing the histogram.
+        histogram (np.ndarray): The joint histogram from `joint_histogram`.
+
+    Returns:
+        Dict[str, np.ndarray]: The "tp", "fp", "fn" and "tn" counts of the foreground.
+    """
+    foreground = labels != 0
+    tp = histogram[np.ix_(foreground, foreground)].sum()
+    fp = histogram[np.ix_(~foreground, foreground)].sum()
+    fn = histogram[np.ix_(foreground, ~foreground)].sum()
+    tn = histogram[np.ix_(~foreground, ~foreground)].sum()
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn}
+
+
+def compute_overlap_measures(
+    counts: Dict[str, np.ndarray],
+    measures: List[str],
+    dict_args: Optional[dict] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute overlap and count-based measures from confusion counts.
+
+    Args:
+        counts (Dict[str, np.ndarray]): The "tp", "fp", "fn" and "tn" counts.
+        measures (List[str]): The measures to compute. Must be in OVERLAP_MEASURES.
+        dict_args (dict, optional): Measure parameters, as in MetricsReloaded
+            (e.g. {"beta": 2}). Defaults to None.
+
+    Returns:
+        Dict[str, np.ndarray]: The value of each measure, with the shape of the counts.
+    """
+    dict_args = dict_args or {}
+    results = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for measure in measures:
+            results[measure] = OVERLAP_MEASURES[measure](
+                counts["tp"], counts["fp"], counts["fn"], counts["tn"], dict_args
+            )
+    return results
+
+
+def compute_distance_measures(
+    surface: SurfaceDistances,
+    measures: List[str],
+    dict_args: Optional[dict] = None,
+) -> Dict[str, float]:
+    """
+    Compute distance measures from the borders of a pair of masks.
+
+    Args:
+        surface (SurfaceDistances): The borders and distances of the masks.
+        measures (List[str]): The measures to compute. Must be in DISTANCE_MEASURES.
+        dict_args (dict, optional): Measure parameters, as in MetricsReloaded
+            (e.g. {"hd_perc": 95, "nsd": 1}). Defaults to None.
+
+    Returns:
+        Dict[str, float]: The value of each measure.
+    """
+    dict_args = dict_args or {}
+    return {
+        measure: float(DISTANCE_MEASURES[measure](surface, dict_args))
+        for measure in measures
+    }
+
+
+def split_measures(measures: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Split measures between those computed from confusion counts, those computed from
+    the label borders and those that need MetricsReloaded.
+
+    Args:
+        measures (List[str]): The measures to compute.
+
+    Returns:
+        List[str]: The measures in OVERLAP_MEASURES.
+        List[str]: The measures in DISTANCE_MEASURES.
+        List[str]: The other measures.
+    """
+    overlap = [measure for measure in measures if measure in OVERLAP_MEASURES]
+    distance = [measure for measure in measures if measure in DISTANCE_MEASURES]
+    others = [
+        measure
+        for measure in measures
+        if measure not in OVERLAP_MEASURES and measure not in DISTANCE_MEASURES
+    ]
+    return overlap, distance, others
+
+
+def label_bounding_boxes(
+    reference: np.ndarray, prediction: np.ndarray, margin: int = 1
+) -> Dict[int, Tuple[slice, ...]]:
+    """
+    Find the bounding box of the union of each label in the reference and the
+    prediction, in one pass over each image.
+
+    Args:
+        reference (np.ndarray): The reference label array.
+        prediction (np.ndarray): The predicted label array.
+        margin (int, optional): Number of voxels added around each bounding box. Keep
+            at least 1 so that borders are the same as in the full image.
+            Defaults to 1.
+
+    Returns:
+        Dict[int, Tuple[slice, ...]]: The bounding box of each positive label.
+    """
+    boxes = {}
+    for image in (reference, prediction):
+        image = as_integer_labels(image)
+        for label, box in enumerate(ndimage.find_objects(image), start=1):
+            if box is None:
+                continue
+            if label in boxes:
+                box = merge_bounding_boxes([boxes[label], box], image.ndim)
+            boxes[label] = box
+
+    return {
+        label: tuple(
+            slice(max(axis.start - margin, 0), min(axis.stop + margin, size))
+            for axis, size in zip(box, reference.shape)
+        )
+        for label, box in boxes.items()
+    }
+
+
+def merge_bounding_boxes(
+    boxes: List[Tuple[slice, ...]], ndim: int
+) -> Tuple[slice, ...]:
+    """
+    Compute the bounding box of the union of bounding boxes.
+
+    Args:
+        boxes (List[Tuple[slice, ...]]): The bounding boxes.
+        ndim (int): The number of dimensions of the image.
+
+    Returns:
+        Tuple[slice, ...]: The bounding box containing all the boxes. The whole image
+        if there is no box.
+    """
+    boxes = list(boxes)
+    if not boxes:
+        return (slice(None),) * ndim
+    return tuple(
+        slice(min(axis.start for axis in axes), max(axis.stop for axis in axes))
+        for axes in zip(*boxes)
+    )
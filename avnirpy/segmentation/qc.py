@@ -0,0 +1,294 @@
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from avnirpy.io.image import (
+    is_nrrd_unchanged,
+    load_nrrd,
+    load_nrrd_header,
+    write_nrrd,
+)
+from avnirpy.io.segments import SegmentMetadata
+from avnirpy.io.utils import check_images_space, copy_file
+from avnirpy.segmentation.utils import replace_labels_in_file
+
+QC_KEYS = ["global_qc", "extent_qc", "space_qc", "labels_qc", "nb_labels_qc"]
+
+
+def load_qc_config(config_file: str) -> dict:
+    """
+    Load the labels of a 3DSlicer segmentation config.
+
+    Args:
+        config_file (str): Path to the .yaml config file used in 3DSlicer.
+
+    Returns:
+        dict: A dictionary mapping the label name to the label value.
+    """
+    with open(config_file, "r") as file:
+        config = yaml.safe_load(file)
+    return {label["name"]: int(label["value"]) for label in config["labels"]}
+
+
+def check_labels(
+    label_nrrdheader: dict, volume_nrrdheader: dict, labels_in_config: dict
+) -> Tuple[dict, List[str], dict, dict, dict]:
+    """
+    Check a segmentation exported from 3DSlicer against its volume and the config.
+
+    Only the headers are used, their segments are parsed once into a SegmentMetadata.
+    The segments whose name contains the name of a label of the config are renamed
+    after it, and the returned label IDs are keyed by the new names: correct_labels
+    then also gives renamed segments the value of the config, which avnir_qc_labels
+    previously only did for the segments already named as in the config. labels_qc
+    fails if any segment is not found in the config, whereas
+    avnir_qc_labels previously only took the last segment into account.
+
+    Args:
+        label_nrrdheader (dict): The NRRD header of the labels.
+        volume_nrrdheader (dict): The NRRD header of the volume.
+        labels_in_config (dict): A dictionary mapping the label name to the label
+            value, see load_qc_config.
+
+    Returns:
+        dict: The QC report, with a boolean for each key of QC_KEYS.
+        List[str]: The description of each failed check.
+        dict: The NRRD header of the labels with the segments renamed.
+        dict: A dictionary mapping the renamed label name to the label ID in the file.
+        dict: A dictionary mapping the renamed label name to the segment ID.
+    """
+    messages = []
+    segments = SegmentMetadata(label_nrrdheader)
+
+    # Check if the labels and volume are consistent
+    qc_extent = len(segments.extents) <= 1
+    if not qc_extent:
+        messages.append("The extent of each label are different.")
+    qc_space = check_images_space(volume_nrrdheader, label_nrrdheader)
+    if not qc_space:
+        messages.append("The space of the labels and volume images is different.")
+
+    labels_in_file = segments.labels
+    qc_nb_labels = not (len(labels_in_file.keys()) > len(labels_in_config.keys()))
+    if not qc_nb_labels:
+        messages.append(
+            "The number of labels in the labels image file is greater than the number "
+            "of labels in the config file."
+        )
+
+    # Check if all labels in the file are in the config file
+    # If the label in the file does not have the same name as the label in the config
+    # file, the label in the file will be replaced by the label in the config file.
+    qc_labels = True
+    for name_f in labels_in_file.keys():
+        for name_c in labels_in_config.keys():
+            if str(name_c).lower() in str(name_f).lower():
+                if name_c != name_f:
+                    segments.rename(name_f, name_c)
+                break
+        else:
+            qc_labels = False
+            messages.append(f"Label {name_f} not found in the config file.")
+    label_nrrdheader = segments.update_header(label_nrrdheader)
+
+    report = {
+        "global_qc": qc_extent and qc_space and qc_labels and qc_nb_labels,
+        "extent_qc": qc_extent,
+        "space_qc": qc_space,
+        "labels_qc": qc_labels,
+        "nb_labels_qc": qc_nb_labels,
+    }
+    return (
+        report,
+        messages,
+        label_nrrdheader,
+        segments.labels,
+        segments.segment_match,
+    )
+
+
+def correct_labels(
+    label_data: np.ndarray,
+    label_nrrdheader: dict,
+    labels_in_file: dict,
+    labels_in_config: dict,
+    segment_match: dict,
+) -> Tuple[np.ndarray, dict]:
+    """
+    Give the labels of a segmentation the values of the config, stored as uint8.
+
+    Args:
+        label_data (np.ndarray): The label data array.
+        label_nrrdheader (dict): The NRRD header of the labels.
+        labels_in_file (dict): The label IDs in the file, see check_labels.
+        labels_in_config (dict): The label values in the config, see load_qc_config.
+        segment_match (dict): The segment IDs in the file, see check_labels.
+
+    Returns:
+        np.ndarray: The corrected label data.
+        dict: The corrected NRRD header.
+    """
+    label_data, label_nrrdheader = replace_labels_in_file(
+        label_data,
+        label_nrrdheader,
+        labels_in_file,
+        labels_in_config,
+        segment_match,
+    )
+    return label_data.astype(np.uint8), label_nrrdheader
+
+
+def write_labels(
+    input_labels: str,
+    output_labels: str,
+    label_nrrdheader: dict,
+    labels_in_file: dict,
+    labels_in_config: dict,
+    segment_match: dict,
+    input_nrrdheader: dict,
+    affine: np.ndarray,
+    link: bool = False,
+) -> bool:
+    """
+    Write the corrected labels of a segmentation, see correct_labels.
+
+    The file is copied without being decoded if it is already stored as uint8 and
+    needs no correction.
+
+    Args:
+        input_labels (str): Path to the .nrrd label image.
+        output_labels (str): Path to the corrected .nrrd label image.
+        label_nrrdheader (dict): The NRRD header of the labels, see check_labels.
+        labels_in_file (dict): The label IDs in the file, see check_labels.
+        labels_in_config (dict): The label values in the config, see load_qc_config.
+        segment_match (dict): The segment IDs in the file, see check_labels.
+        input_nrrdheader (dict): The NRRD header of the label image, as read from
+            its file.
+        affine (np.ndarray): The affine transformation matrix of the label image.
+        link (bool, optional): Hard link the file instead of copying it, see
+            copy_file. Defaults to False.
+
+    Returns:
+        bool: True if the file was copied.
+    """
+    relabeled = any(
+        name in labels_in_file and label != labels_in_file[name]
+        for name, label in labels_in_config.items()
+    )
+    renamed = any(
+        label_nrrdheader[key] != value
+        for key, value in input_nrrdheader.items()
+        if isinstance(value, str)
+    )
+    if (
+        not relabeled
+        and not renamed
+        and is_nrrd_unchanged(input_nrrdheader, affine, np.uint8)
+    ):
+        copy_file(input_labels, output_labels, link)
+        return True
+
+    label_data, _, _, _ = load_nrrd(input_labels)
+    label_data, label_nrrdheader = correct_labels(
+        label_data,
+        label_nrrdheader,
+        labels_in_file,
+        labels_in_config,
+        segment_match,
+    )
+    write_nrrd(output_labels, label_data, affine, label_nrrdheader)
+    return False
+
+
+def write_volume(
+    input_volume: str,
+    output_volume: str,
+    volume_nrrdheader: dict,
+    affine: np.ndarray,
+    link: bool = False,
+) -> bool:
+    """
+    Write the volume of a segmentation as int16.
+
+    The file is copied without being decoded if it is already stored as int16.
+
+    Args:
+        input_volume (str): Path to the .nrrd volume image.
+        output_volume (str): Path to the .nrrd volume image written.
+        volume_nrrdheader (dict): The NRRD header of the volume, as read from its file.
+        affine (np.ndarray): The affine transformation matrix of the volume.
+        link (bool, optional): Hard link the file instead of copying it, see
+            copy_file. Defaults to False.
+
+    Returns:
+        bool: True if the file was copied.
+    """
+    if is_nrrd_unchanged(volume_nrrdheader, affine, np.int16):
+        copy_file(input_volume, output_volume, link)
+        return True
+
+    volume_data, _, _, _ = load_nrrd(input_volume)
+    write_nrrd(output_volume, volume_data.astype(np.int16), affine, volume_nrrdheader)
+    return False
+
+
+def qc_labels(
+    input_labels: str,
+    input_volume: str,
+    labels_in_config: dict,
+    output_labels: Optional[str] = None,
+    output_volume: Optional[str] = None,
+    link: bool = False,
+) -> dict:
+    """
+    Quality control of a segmentation exported from 3DSlicer and its volume.
+
+    The checks only read the headers. The failed checks are logged as warnings. The
+    labels (uint8) and volume (int16) are written if their output path is given, see
+    write_labels and write_volume.
+
+    Args:
+        input_labels (str): Path to the .nrrd label image.
+        input_volume (str): Path to the .nrrd volume image.
+        labels_in_config (dict): The label values in the config, see load_qc_config.
+        output_labels (str, optional): Path to the corrected .nrrd label image.
+            Defaults to None.
+        output_volume (str, optional): Path to the corrected .nrrd volume image.
+            Defaults to None.
+        link (bool, optional): Hard link the images that need no correction instead
+            of copying them, see copy_file. Defaults to False.
+
+    Returns:
+        dict: The QC report, with a boolean for each key of QC_KEYS and the
+        description of the failed checks in "messages".
+    """
+    _, input_nrrdheader, label_affine = load_nrrd_header(input_labels)
+    _, volume_nrrdheader, volume_affine = load_nrrd_header(input_volume)
+
+    report, messages, label_nrrdheader, labels_in_file, segment_match = check_labels(
+        input_nrrdheader, volume_nrrdheader, labels_in_config
+    )
+    for message in messages:
+        logging.warning(f"{input_labels}: {message}")
+
+    if output_labels:
+        write_labels(
+            input_labels,
+            output_labels,
+            label_nrrdheader,
+            labels_in_file,
+            labels_in_config,
+            segment_match,
+            input_nrrdheader,
+            label_affine,
+            link,
+        )
+    if output_volume:
+        write_volume(
+            input_volume, output_volume, volume_nrrdheader, volume_affine, link
+        )
+
+    report["messages"] = messages
+    return report
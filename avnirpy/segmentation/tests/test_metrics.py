@@ -0,0 +1,302 @@
+import numpy as np
+import pytest
+from avnirpy.segmentation.metrics import (
+    DISTANCE_MEASURES,
+    OVERLAP_MEASURES,
+    SurfaceDistances,
+    compute_distance_measures,
+    compute_overlap_measures,
+    confusion_counts,
+    foreground_confusion_counts,
+    joint_histogram,
+    label_bounding_boxes,
+    merge_bounding_boxes,
+    split_measures,
+)
+
+
+@pytest.fixture
+def segmentations():
+    rng = np.random.default_rng(0)
+    reference = rng.integers(0, 4, size=(10, 10, 10)).astype(np.uint8)
+    prediction = reference.copy()
+    prediction[rng.random(reference.shape) < 0.2] = 2
+    return reference, prediction
+
+
+def test_joint_histogram():
+    reference = np.array([0, 1, 1, 2, 2, 2])
+    prediction = np.array([0, 1, 2, 2, 2, 0])
+
+    labels, histogram = joint_histogram(reference, prediction)
+
+    np.testing.assert_array_equal(labels, [0, 1, 2])
+    np.testing.assert_array_equal(histogram, [[1, 0, 0], [0, 1, 1], [1, 0, 2]])
+
+
+def test_joint_histogram_sparse_labels():
+    reference = np.array([0, 1000, 1000, -1])
+    prediction = np.array([0, 1000, 0, -1])
+
+    labels, histogram = joint_histogram(reference, prediction)
+
+    np.testing.assert_array_equal(labels, [-1, 0, 1000])
+    np.testing.assert_array_equal(histogram, [[1, 0, 0], [0, 1, 0], [0, 1, 1]])
+
+
+def test_joint_histogram_float_labels():
+    reference = np.array([0.0, 1.0, 1.0, 2.0])
+    prediction = np.array([0.0, 1.0, 2.0, 2.0], dtype=np.float32)
+
+    labels, histogram = joint_histogram(reference, prediction)
+
+    np.testing.assert_array_equal(labels, [0, 1, 2])
+    np.testing.assert_array_equal(histogram, [[1, 0, 0], [0, 1, 1], [0, 0, 1]])
+
+
+@pytest.mark.parametrize("value", [0.7, np.nan])
+def test_joint_histogram_non_integer_labels(value):
+    reference = np.array([0.0, 1.0, 1.0, 2.0])
+    prediction = np.array([0.0, 1.0, value, 2.0])
+
+    with pytest.raises(ValueError, match="Labels must be integers"):
+        joint_histogram(reference, prediction)
+    with pytest.raises(ValueError, match="Labels must be integers"):
+        label_bounding_boxes(prediction, reference)
+
+
+def test_joint_histogram_shape_mismatch():
+    with pytest.raises(ValueError):
+        joint_histogram(np.zeros((2, 2)), np.zeros((2, 3)))
+
+
+def test_confusion_counts(segmentations):
+    reference, prediction = segmentations
+    labels, histogram = joint_histogram(reference, prediction)
+
+    labels, counts = confusion_counts(labels, histogram)
+
+    np.testing.assert_array_equal(labels, [1, 2, 3])
+    for i, label in enumerate(labels):
+        assert counts["tp"][i] == np.sum((reference == label) & (prediction == label))
+        assert counts["fp"][i] == np.sum((reference != label) & (prediction == label))
+        assert counts["fn"][i] == np.sum((reference == label) & (prediction != label))
+        assert counts["tn"][i] == np.sum((reference != label) & (prediction != label))
+
+
+def test_foreground_confusion_counts(segmentations):
+    reference, prediction = segmentations
+    labels, histogram = joint_histogram(reference, prediction)
+
+    counts = foreground_confusion_counts(labels, histogram)
+
+    assert counts["tp"] == np.sum((reference > 0) & (prediction > 0))
+    assert counts["fp"] == np.sum((reference == 0) & (prediction > 0))
+    assert counts["fn"] == np.sum((reference > 0) & (prediction == 0))
+    assert counts["tn"] == np.sum((reference == 0) & (prediction == 0))
+
+
+def test_compute_overlap_measures():
+    counts = {
+        "tp": np.array([8, 0, 0, 0]),
+        "fp": np.array([2, 0, 3, 4]),
+        "fn": np.array([2, 0, 0, 5]),
+        "tn": np.array([88, 100, 97, 91]),
+    }
+
+    results = compute_overlap_measures(
+        counts, ["numb_ref", "iou", "fbeta", "dsc", "sensitivity", "mcc"]
+    )
+
+    np.testing.assert_array_equal(results["numb_ref"], [10, 0, 0, 5])
+    np.testing.assert_allclose(results["iou"], [8 / 12, np.nan, 0, 0])
+    np.testing.assert_allclose(results["fbeta"], [0.8, 1, 0, 0])
+    np.testing.assert_allclose(results["dsc"], [0.8, 1, 0, 0])
+    np.testing.assert_allclose(results["sensitivity"], [0.8, np.nan, np.nan, 0])
+    np.testing.assert_allclose(results["mcc"][0], (8 * 88 - 4) / np.sqrt(10**2 * 90**2))
+
+
+def test_compute_overlap_measures_beta():
+    counts = {"tp": np.array(8), "fp": np.array(2), "fn": np.array(0), "tn": 0}
+
+    results = compute_overlap_measures(counts, ["fbeta", "dsc"], {"beta": 2})
+
+    assert results["fbeta"] == pytest.approx(5 * 0.8 / (4 * 0.8 + 1))
+    assert results["dsc"] == pytest.approx(2 * 0.8 / 1.8)
+
+
+def test_split_measures():
+    overlap, distance, others = split_measures(
+        ["hd", "fbeta", "cldice", "nsd", "numb_tp"]
+    )
+
+    assert overlap == ["fbeta", "numb_tp"]
+    assert distance == ["hd", "nsd"]
+    assert others == ["cldice"]
+    assert all(measure in OVERLAP_MEASURES for measure in overlap)
+    assert all(measure in DISTANCE_MEASURES for measure in distance)
+
+
+@pytest.fixture
+def shifted_cubes():
+    reference = np.zeros((12, 12, 12), dtype=bool)
+    prediction = np.zeros((12, 12, 12), dtype=bool)
+    reference[2:7, 2:7, 2:7] = True
+    prediction[4:9, 2:7, 2:7] = True
+    return reference, prediction
+
+
+def _brute_force_distances(reference, prediction, spacing):
+    surface = SurfaceDistances(reference, prediction)
+    reference_border, prediction_border = surface.borders()
+    reference_points = np.argwhere(reference_border) * spacing
+    prediction_points = np.argwhere(prediction_border) * spacing
+    distances = np.linalg.norm(
+        reference_points[:, None] - prediction_points[None], axis=-1
+    )
+    return distances.min(axis=1), distances.min(axis=0)
+
+
+@pytest.mark.parametrize("spacing", [(1.0, 1.0, 1.0), (2.0, 0.5, 3.0)])
+def test_surface_distances(shifted_cubes, spacing):
+    reference, prediction = shifted_cubes
+    expected = _brute_force_distances(reference, prediction, spacing)
+
+    surface = SurfaceDistances(reference, prediction, spacing)
+    distances = surface.distances()
+
+    np.testing.assert_allclose(distances[0], expected[0])
+    np.testing.assert_allclose(distances[1], expected[1])
+    assert surface.distances() is distances
+
+
+def test_compute_distance_measures(shifted_cubes):
+    reference, prediction = shifted_cubes
+    spacing = (2.0, 1.0, 1.0)
+    reference_distances, prediction_distances = _brute_force_distances(
+        reference, prediction, spacing
+    )
+    all_distances = np.concatenate((reference_distances, prediction_distances))
+
+    results = compute_distance_measures(
+        SurfaceDistances(reference, prediction, spacing),
+        ["hd", "hd_perc", "masd", "assd", "nsd"],
+        {"nsd": 2},
+    )
+
+    assert results["hd"] == pytest.approx(4.0)
+    assert results["hd_perc"] == pytest.approx(
+        max(
+            np.percentile(reference_distances, 95),
+            np.percentile(prediction_distances, 95),
+        )
+    )
+    assert results["masd"] == pytest.approx(
+        (reference_distances.mean() + prediction_distances.mean()) / 2
+    )
+    assert results["assd"] == pytest.approx(all_distances.mean())
+    assert results["nsd"] == pytest.approx(np.mean(all_distances <= 2))
+
+
+def test_compute_distance_measures_empty():
+    empty = np.zeros((5, 5, 5), dtype=bool)
+    mask = empty.copy()
+    mask[1:3, 1:3, 1:3] = True
+
+    both_empty = compute_distance_measures(
+        SurfaceDistances(empty, empty), ["hd", "masd", "nsd"]
+    )
+    one_empty = compute_distance_measures(
+        SurfaceDistances(mask, empty), ["hd", "masd", "nsd"]
+    )
+
+    assert both_empty["hd"] == 0 and both_empty["masd"] == 0
+    assert np.isnan(both_empty["nsd"])
+    assert np.isnan(one_empty["hd"]) and np.isnan(one_empty["masd"])
+    assert one_empty["nsd"] == 0
+
+
+def test_label_bounding_boxes():
+    reference = np.zeros((10, 10, 10), dtype=np.uint8)
+    prediction = np.zeros((10, 10, 10), dtype=np.uint8)
+    reference[2:4, 3:5, 4:6] = 1
+    prediction[3:6, 3:4, 4:5] = 1
+    prediction[0, 9, 9] = 3
+
+    boxes = label_bounding_boxes(reference, prediction, margin=1)
+
+    assert boxes == {
+        1: (slice(1, 7), slice(2, 6), slice(3, 7)),
+        3: (slice(0, 2), slice(8, 10), slice(8, 10)),
+    }
+
+
+def test_label_bounding_boxes_no_margin():
+    reference = np.array([[0, 2], [0, 0]])
+    prediction = np.zeros((2, 2))
+
+    boxes = label_bounding_boxes(reference, prediction, margin=0)
+
+    assert boxes == {2: (slice(0, 1), slice(1, 2))}
+
+
+def test_merge_bounding_boxes():
+    boxes = [(slice(1, 3), slice(4, 5)), (slice(2, 6), slice(0, 2))]
+
+    assert merge_bounding_boxes(boxes, 2) == (slice(1, 6), slice(0, 5))
+    assert merge_bounding_boxes([], 2) == (slice(None), slice(None))
+
+
+def _random_masks(seed, shape=(12, 10, 8)):
+    rng = np.random.default_rng(seed)
+    return rng.random(shape) < 0.3, rng.random(shape) < 0.3
+
+
+def _border_slab():
+    reference = np.zeros((8, 8, 8), dtype=bool)
+    prediction = np.zeros((8, 8, 8), dtype=bool)
+    reference[:3] = True
+    prediction[:, :, 5:] = True
+    return reference, prediction
+
+
+def _one_empty():
+    reference, _ = _random_masks(2)
+    return reference, np.zeros_like(reference)
+
+
+def _both_empty():
+    empty = np.zeros((8, 8, 8), dtype=bool)
+    return empty, empty.copy()
+
+
+@pytest.mark.parametrize(
+    "masks",
+    [_random_masks(0), _random_masks(1), _border_slab(), _one_empty(), _both_empty()],
+    ids=["random", "random_2", "volume_border", "one_empty", "both_empty"],
+)
+@pytest.mark.parametrize("spacing", [(1.0, 1.0, 1.0), (0.8, 1.5, 3.0)])
+def test_distance_measures_match_metrics_reloaded(masks, spacing):
+    pairwise_measures = pytest.importorskip("MetricsReloaded.metrics.pairwise_measures")
+    reference, prediction = masks
+    measures = ["hd", "hd_perc", "masd", "assd", "nsd"]
+    if not reference.any() and not prediction.any():
+        # NSD is NaN without any border voxel, see _nsd
+        measures.remove("nsd")
+    dict_args = {"hd_perc": 90, "nsd": 1.5}
+
+    results = compute_distance_measures(
+        SurfaceDistances(reference, prediction, spacing), measures, dict_args
+    )
+    expected = pairwise_measures.BinaryPairwiseMeasures(
+        prediction.astype(int),
+        reference.astype(int),
+        measures=measures,
+        pixdim=spacing,
+        dict_args=dict_args,
+    ).to_dict_meas()
+
+    for measure in measures:
+        np.testing.assert_allclose(
+            results[measure], float(expected[measure]), equal_nan=True, err_msg=measure
+        )
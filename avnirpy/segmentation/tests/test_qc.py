@@ -0,0 +1,230 @@
+import json
+from unittest import mock
+
+import nrrd
+import numpy as np
+import pytest
+from avnirpy.io.image import write_nrrd
+from avnirpy.segmentation.qc import (
+    check_labels,
+    load_qc_config,
+    qc_labels,
+    write_labels,
+    write_volume,
+)
+
+SPACE = {
+    "space directions": np.eye(3),
+    "space origin": np.zeros(3),
+    "space": "left-posterior-superior",
+}
+
+
+def _label_header(segments):
+    header = dict(SPACE)
+    for i, (name, value) in enumerate(segments):
+        header[f"Segment{i}_ID"] = f"Segment_{i}"
+        header[f"Segment{i}_Name"] = name
+        header[f"Segment{i}_LabelValue"] = str(value)
+        header[f"Segment{i}_Extent"] = "0 2 0 2 0 2"
+    return header
+
+
+@pytest.fixture
+def labels_in_config():
+    return {"ICH": 1, "IVH": 2, "PHE": 3}
+
+
+def test_load_qc_config(tmp_path):
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        "labels:\n  - name: ICH\n    value: 1\n  - name: IVH\n    value: '2'\n"
+    )
+
+    assert load_qc_config(str(config_file)) == {"ICH": 1, "IVH": 2}
+
+
+def test_check_labels(labels_in_config):
+    label_header = _label_header([("ich_1", 1), ("IVH", 2)])
+
+    report, messages, label_header, labels_in_file, segment_match = check_labels(
+        label_header, dict(SPACE), labels_in_config
+    )
+
+    assert report == {
+        "global_qc": True,
+        "extent_qc": True,
+        "space_qc": True,
+        "labels_qc": True,
+        "nb_labels_qc": True,
+    }
+    assert messages == []
+    assert label_header["Segment0_Name"] == "ICH"
+    assert labels_in_file == {"ICH": 1, "IVH": 2}
+    assert segment_match == {"ICH": "Segment0", "IVH": "Segment1"}
+
+
+def test_check_labels_failures(labels_in_config):
+    label_header = _label_header([("ICH", 1), ("Unknown", 2)])
+    label_header["Segment1_Extent"] = "0 1 0 1 0 1"
+    volume_header = dict(SPACE, **{"space origin": np.ones(3)})
+
+    report, messages, _, labels_in_file, _ = check_labels(
+        label_header, volume_header, labels_in_config
+    )
+
+    assert report == {
+        "global_qc": False,
+        "extent_qc": False,
+        "space_qc": False,
+        "labels_qc": False,
+        "nb_labels_qc": True,
+    }
+    assert len(messages) == 3
+    assert labels_in_file == {"ICH": 1, "Unknown": 2}
+
+
+def test_check_labels_unknown_first_segment(labels_in_config):
+    # The last segment is in the config, but not the first one
+    label_header = _label_header([("Unknown", 1), ("IVH", 2)])
+
+    report, messages, _, _, _ = check_labels(
+        label_header, dict(SPACE), labels_in_config
+    )
+
+    assert not report["labels_qc"]
+    assert not report["global_qc"]
+    assert messages == ["Label Unknown not found in the config file."]
+
+
+def test_qc_labels(tmp_path, labels_in_config):
+    label_data = np.zeros((3, 3, 3), dtype=np.int32)
+    label_data[0] = 1
+    label_data[1] = 2
+    volume_data = np.full((3, 3, 3), 40.0)
+    nrrd.write(
+        str(tmp_path / "labels.seg.nrrd"),
+        label_data,
+        _label_header([("PHE", 1), ("ICH", 2)]),
+    )
+    nrrd.write(str(tmp_path / "volume.nrrd"), volume_data, dict(SPACE))
+
+    report = qc_labels(
+        str(tmp_path / "labels.seg.nrrd"),
+        str(tmp_path / "volume.nrrd"),
+        labels_in_config,
+        str(tmp_path / "labels_corrected.seg.nrrd"),
+        str(tmp_path / "volume_corrected.nrrd"),
+    )
+
+    assert report["global_qc"]
+    assert report["messages"] == []
+    json.dumps(report)
+    labels, header = nrrd.read(str(tmp_path / "labels_corrected.seg.nrrd"))
+    assert labels.dtype == np.uint8
+    assert np.array_equal(labels[0], np.full((3, 3), 3))
+    assert np.array_equal(labels[1], np.full((3, 3), 1))
+    assert int(header["Segment0_LabelValue"]) == 3
+    assert int(header["Segment1_LabelValue"]) == 1
+    volume, _ = nrrd.read(str(tmp_path / "volume_corrected.nrrd"))
+    assert volume.dtype == np.int16
+
+
+def test_qc_labels_relabels_renamed_segment(tmp_path, labels_in_config):
+    label_data = np.zeros((3, 3, 3), dtype=np.uint8)
+    label_data[0] = 2
+    nrrd.write(
+        str(tmp_path / "labels.seg.nrrd"), label_data, _label_header([("ich_1", 2)])
+    )
+    nrrd.write(str(tmp_path / "volume.nrrd"), np.zeros((3, 3, 3)), dict(SPACE))
+
+    qc_labels(
+        str(tmp_path / "labels.seg.nrrd"),
+        str(tmp_path / "volume.nrrd"),
+        labels_in_config,
+        str(tmp_path / "labels_corrected.seg.nrrd"),
+        str(tmp_path / "volume_corrected.nrrd"),
+    )
+
+    # ich_1 is renamed ICH and gets the value of ICH in the config
+    labels, header = nrrd.read(str(tmp_path / "labels_corrected.seg.nrrd"))
+    assert header["Segment0_Name"] == "ICH"
+    assert int(header["Segment0_LabelValue"]) == 1
+    assert np.array_equal(labels[0], np.ones((3, 3)))
+
+
+@mock.patch("avnirpy.segmentation.qc.load_nrrd")
+def test_qc_labels_check_only(mock_load_nrrd, tmp_path, labels_in_config):
+    nrrd.write(
+        str(tmp_path / "labels.seg.nrrd"),
+        np.zeros((3, 3, 3), dtype=np.uint8),
+        _label_header([("ICH", 2)]),
+    )
+    nrrd.write(str(tmp_path / "volume.nrrd"), np.zeros((3, 3, 3)), dict(SPACE))
+
+    report = qc_labels(
+        str(tmp_path / "labels.seg.nrrd"),
+        str(tmp_path / "volume.nrrd"),
+        labels_in_config,
+    )
+
+    assert report["global_qc"]
+    mock_load_nrrd.assert_not_called()
+
+
+@pytest.mark.parametrize("dtype, copied", [(np.int16, True), (np.float32, False)])
+def test_write_volume(tmp_path, dtype, copied):
+    volume_data = np.arange(27, dtype=dtype).reshape((3, 3, 3))
+    write_nrrd(str(tmp_path / "volume.nrrd"), volume_data, np.eye(4))
+    header = nrrd.read_header(str(tmp_path / "volume.nrrd"))
+
+    with mock.patch("avnirpy.segmentation.qc.load_nrrd_header") as mock_load_header:
+        result = write_volume(
+            str(tmp_path / "volume.nrrd"),
+            str(tmp_path / "output.nrrd"),
+            header,
+            np.eye(4),
+        )
+        mock_load_header.assert_not_called()
+
+    assert result == copied
+    volume, _ = nrrd.read(str(tmp_path / "output.nrrd"))
+    assert volume.dtype == np.int16
+    assert np.array_equal(volume, volume_data)
+
+
+@pytest.mark.parametrize(
+    "segments, copied",
+    [([("ICH", 1)], True), ([("ICH", 2)], False), ([("ich_1", 1)], False)],
+)
+def test_write_labels(tmp_path, labels_in_config, segments, copied):
+    label_data = np.zeros((3, 3, 3), dtype=np.uint8)
+    label_data[0] = segments[0][1]
+    write_nrrd(
+        str(tmp_path / "labels.seg.nrrd"),
+        label_data,
+        np.eye(4),
+        _label_header(segments),
+    )
+    input_header = nrrd.read_header(str(tmp_path / "labels.seg.nrrd"))
+    _, _, header, labels_in_file, segment_match = check_labels(
+        input_header, input_header, labels_in_config
+    )
+
+    with mock.patch("avnirpy.segmentation.qc.load_nrrd_header") as mock_load_header:
+        result = write_labels(
+            str(tmp_path / "labels.seg.nrrd"),
+            str(tmp_path / "output.seg.nrrd"),
+            header,
+            labels_in_file,
+            labels_in_config,
+            segment_match,
+            input_header,
+            np.eye(4),
+        )
+        mock_load_header.assert_not_called()
+
+    assert result == copied
+    labels, output_header = nrrd.read(str(tmp_path / "output.seg.nrrd"))
+    assert np.array_equal(labels[0], np.ones((3, 3)))
+    assert output_header["Segment0_Name"] == "ICH"
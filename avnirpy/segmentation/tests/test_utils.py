@@ -1,6 +1,10 @@
 import numpy as np
 import pytest
-from avnirpy.segmentation.utils import replace_labels_in_file
+from avnirpy.segmentation.utils import (
+    as_integer_labels,
+    remap_labels,
+    replace_labels_in_file,
+)
 
 
 def test_replace_labels_in_file():
@@ -91,3 +95,85 @@ def test_replace_labels_in_file_partial_change():
 
     assert np.array_equal(new_label_data, expected_label_data)
     assert new_label_nrrdhearder == expected_label_nrrdhearder
+
+
+def test_replace_labels_in_file_permutation():
+    label_data = np.array([[0, 1, 2], [2, 3, 1]], dtype=np.uint8)
+    label_nrrdhearder = {
+        "Segment1_LabelValue": 1,
+        "Segment2_LabelValue": 2,
+        "Segment3_LabelValue": 3,
+    }
+    labels_in_file = {"Segment1": 1, "Segment2": 2, "Segment3": 3}
+    labels_in_config = {"Segment1": 2, "Segment2": 3, "Segment3": 1}
+    segment_match = {
+        "Segment1": "Segment1",
+        "Segment2": "Segment2",
+        "Segment3": "Segment3",
+    }
+
+    new_label_data, new_label_nrrdhearder = replace_labels_in_file(
+        label_data, label_nrrdhearder, labels_in_file, labels_in_config, segment_match
+    )
+
+    assert np.array_equal(new_label_data, [[0, 2, 3], [3, 1, 2]])
+    assert new_label_nrrdhearder == {
+        "Segment1_LabelValue": 2,
+        "Segment2_LabelValue": 3,
+        "Segment3_LabelValue": 1,
+    }
+
+
+def test_remap_labels():
+    label_data = np.array([0, 1, 2, 2, 5], dtype=np.uint8)
+
+    new_label_data = remap_labels(label_data, {1: 2, 2: 1, 5: 300})
+
+    assert np.array_equal(new_label_data, [0, 2, 1, 1, 300])
+    assert new_label_data.dtype == np.uint16
+
+
+def test_remap_labels_float():
+    label_data = np.array([0.0, 1.0, 2.0])
+
+    new_label_data = remap_labels(label_data, {2: 4})
+
+    assert np.array_equal(new_label_data, [0, 1, 4])
+    assert new_label_data.dtype == np.float64
+
+
+def test_remap_labels_negative():
+    label_data = np.array([[-1, 0], [1, -1]], dtype=np.int16)
+
+    new_label_data = remap_labels(label_data, {-1: 1, 1: -1})
+
+    assert np.array_equal(new_label_data, [[1, 0], [-1, 1]])
+
+
+@pytest.mark.parametrize("mapping", [{2**31: 1}, {1: 2**31}, {2**40: 3}])
+def test_remap_labels_sparse(mapping):
+    label_data = np.array([0, 1, 2**31, 1], dtype=np.int64)
+
+    # A lookup table indexed by the labels would need gigabytes
+    new_label_data = remap_labels(label_data, mapping)
+
+    expected = [mapping.get(label, label) for label in label_data.tolist()]
+    assert new_label_data.tolist() == expected
+
+
+def test_remap_labels_empty_mapping():
+    label_data = np.array([1, 2, 3])
+
+    assert remap_labels(label_data, {}) is label_data
+
+
+def test_as_integer_labels():
+    labels = np.array([0, 3], dtype=np.uint8)
+    assert as_integer_labels(labels) is labels
+
+    result = as_integer_labels(np.array([0.0, 2.0, -1.0]))
+
+    assert result.dtype == np.int64
+    np.testing.assert_array_equal(result, [0, 2, -1])
+    with pytest.raises(ValueError, match="Labels must be integers"):
+        as_integer_labels(np.array([0.0, 1.5]))
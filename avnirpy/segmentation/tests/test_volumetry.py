@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from avnirpy.segmentation.volumetry import (
+    compute_volumes_per_label,
+    count_voxels_per_label,
+)
+
+
+def test_count_voxels_per_label():
+    label_data = np.array([[0, 1, 1], [3, 3, 3], [0, 0, 7]], dtype=np.uint8)
+
+    labels_id, counts = count_voxels_per_label(label_data)
+
+    np.testing.assert_array_equal(labels_id, [1, 3, 7])
+    np.testing.assert_array_equal(counts, [2, 3, 1])
+
+
+def test_count_voxels_per_label_float():
+    label_data = np.array([[0.0, 2.0], [2.0, 5.0]])
+
+    labels_id, counts = count_voxels_per_label(label_data)
+
+    np.testing.assert_array_equal(labels_id, [2, 5])
+    np.testing.assert_array_equal(counts, [2, 1])
+
+
+@pytest.mark.parametrize("value", [1.5, 0.7, np.nan])
+def test_count_voxels_per_label_non_integer(value):
+    label_data = np.array([[0.0, 1.0], [1.0, value]])
+
+    with pytest.raises(ValueError, match="Labels must be integers"):
+        count_voxels_per_label(label_data)
+
+
+def test_count_voxels_per_label_negative():
+    label_data = np.array([[-1, 0], [2, -1]], dtype=np.int16)
+
+    labels_id, counts = count_voxels_per_label(label_data)
+
+    np.testing.assert_array_equal(labels_id, [-1, 2])
+    np.testing.assert_array_equal(counts, [2, 1])
+
+
+def test_count_voxels_per_label_empty():
+    labels_id, counts = count_voxels_per_label(np.zeros((3, 3, 3)))
+
+    assert labels_id.size == 0
+    assert counts.size == 0
+
+
+def test_compute_volumes_per_label():
+    label_data = np.zeros((10, 10, 10), dtype=np.uint8)
+    label_data[:2] = 1
+    label_data[5:] = 2
+
+    volumes = compute_volumes_per_label(label_data, (1.0, 1.0, 2.0))
+
+    assert volumes == [
+        {"label_id": 1, "volume": 0.4, "volume_icv": None},
+        {"label_id": 2, "volume": 1.0, "volume_icv": None},
+    ]
+
+
+def test_compute_volumes_per_label_brain_mask():
+    label_data = np.zeros((10, 10, 10), dtype=np.uint8)
+    label_data[:2] = 1
+    brain_mask = np.zeros((10, 10, 10))
+    brain_mask[:8] = 1
+
+    volumes = compute_volumes_per_label(label_data, (1.0, 1.0, 1.0), brain_mask)
+
+    assert len(volumes) == 1
+    assert volumes[0]["volume"] == pytest.approx(0.2)
+    assert volumes[0]["volume_icv"] == pytest.approx(25.0)
@@ -1,9 +1,76 @@
 import logging
-from typing import Tuple
+from typing import Dict, Tuple
 
 import numpy as np
 
 
+def as_integer_labels(label_data: np.ndarray) -> np.ndarray:
+    """
+    Cast a label array to integers, rejecting non-integer values instead of truncating
+    them.
+
+    Args:
+        label_data (np.ndarray): The label data array. Float arrays are accepted if all
+            their values are integers.
+
+    Returns:
+        np.ndarray: The label data, cast to int64 if it is not of an integer dtype.
+
+    Raises:
+        ValueError: If a value is not an integer.
+    """
+    label_data = np.asarray(label_data)
+    if np.issubdtype(label_data.dtype, np.integer):
+        return label_data
+    if not np.all(np.mod(label_data, 1) == 0):
+        raise ValueError(
+            "Labels must be integers, found non-integer values in a "
+            f"{label_data.dtype} image."
+        )
+    return label_data.astype(np.int64)
+
+
+def remap_labels(label_data: np.ndarray, mapping: Dict[int, int]) -> np.ndarray:
+    """
+    Replace the labels of an image in a single pass through a lookup table.
+
+    All the labels are replaced at once, so chained or permuted mappings (e.g. 1 -> 2
+    and 2 -> 1) are applied correctly.
+
+    Args:
+        label_data (np.ndarray): The label data array. Its values must be integers.
+        mapping (Dict[int, int]): The new value of each label to replace. The other
+            labels are kept.
+
+    Returns:
+        np.ndarray: The relabeled data, with a dtype able to hold the new labels.
+    """
+    if not mapping:
+        return label_data
+
+    dtype = np.result_type(
+        label_data.dtype, *[np.min_scalar_type(value) for value in mapping.values()]
+    )
+    if label_data.size == 0:
+        return label_data.astype(dtype)
+
+    min_label = min(int(label_data.min()), *mapping)
+    max_label = max(int(label_data.max()), *mapping)
+    if min_label < 0 or max_label >= label_data.size:
+        # A lookup table can only be indexed by non-negative labels, and would be
+        # larger than the image for sparse label values (e.g. 2**31)
+        labels, inverse = np.unique(label_data, return_inverse=True)
+        new_labels = np.array(
+            [mapping.get(label.item(), label) for label in labels], dtype=dtype
+        )
+        return new_labels[inverse].reshape(label_data.shape)
+
+    lut = np.arange(max_label + 1).astype(dtype)
+    for old, new in mapping.items():
+        lut[old] = new
+    return lut[label_data.astype(np.intp, copy=False)]
+
+
 def replace_labels_in_file(
     label_data: np.ndarray,
     label_nrrdhearder: dict,
@@ -20,13 +87,18 @@ def replace_labels_in_file(
         labels_in_file (dict): Dictionary of labels in the file.
         labels_in_config (dict): Dictionary of labels in the config file.
         segment_match (dict): Dictionary mapping segment names to their match in the file.
+
+    Returns:
+        np.ndarray: The relabeled data, see remap_labels.
+        dict: The NRRD header with the new label values.
     """
+    mapping = {}
     for name, label in labels_in_config.items():
         if name in labels_in_file and label != labels_in_file[name]:
-            label_data[label_data == labels_in_file[name]] = label
+            mapping[labels_in_file[name]] = label
             label_nrrdhearder[f"{segment_match[name]}_LabelValue"] = label
             logging.warning(
                 f"Label {name} ({labels_in_file[name]}) has a different value in the config "
                 f"file ({label}). The NRRD file is modified."
             )
-    return label_data, label_nrrdhearder
+    return remap_labels(label_data, mapping), label_nrrdhearder
@@ -0,0 +1,76 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from avnirpy.segmentation.utils import as_integer_labels
+
+
+def count_voxels_per_label(label_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count the number of voxels of each non-zero label in a single histogram pass.
+
+    Args:
+        label_data (np.ndarray): The label data array. Its values must be integers,
+            see as_integer_labels.
+
+    Returns:
+        np.ndarray: The sorted non-zero label IDs present in the image.
+        np.ndarray: The number of voxels of each label.
+
+    Raises:
+        ValueError: If a value is not an integer.
+    """
+    labels = as_integer_labels(label_data)
+
+    if labels.size == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    if labels.min() < 0:
+        # np.bincount only accepts non-negative integers
+        labels_id, counts = np.unique(labels, return_counts=True)
+    else:
+        counts = np.bincount(labels.ravel())
+        labels_id = np.flatnonzero(counts)
+        counts = counts[labels_id]
+
+    is_foreground = labels_id != 0
+    return labels_id[is_foreground], counts[is_foreground]
+
+
+def compute_volumes_per_label(
+    label_data: np.ndarray,
+    zooms: Tuple[float, ...],
+    brain_mask: Optional[np.ndarray] = None,
+) -> List[dict]:
+    """
+    Compute the volume (in ml) of each label and, optionally, its fraction of the
+    intracranial volume.
+
+    Args:
+        label_data (np.ndarray): The label data array.
+        zooms (Tuple[float, ...]): The voxel size in mm.
+        brain_mask (np.ndarray, optional): The brain mask used to normalize the volumes.
+            Defaults to None.
+
+    Returns:
+        List[dict]: One dictionary per label with the keys "label_id", "volume" and
+        "volume_icv". "volume_icv" is None if no brain mask is provided.
+    """
+    labels_id, counts = count_voxels_per_label(label_data)
+    voxel_size = float(np.prod(zooms))
+    brain_volume = np.sum(brain_mask) if brain_mask is not None else None
+
+    volumes = []
+    for label_id, count in zip(labels_id, counts):
+        volumes.append(
+            {
+                "label_id": int(label_id),
+                "volume": int(count) * voxel_size / 1000,
+                "volume_icv": (
+                    float(count / brain_volume * 100)
+                    if brain_volume is not None
+                    else None
+                ),
+            }
+        )
+    return volumes